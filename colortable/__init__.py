@@ -0,0 +1,13 @@
+"""
+Tk-free color table model and file formats.
+
+Everything in this package can be imported on a headless server; the
+desktop editor in ``colortable_editor.py`` is a view over these objects.
+"""
+from .model import ColorStop, ColorTable, hex_to_rgb, pack_rgba, unpack_rgba
+from .formats import Diagnostic, ParseError, dump, dumps, iter_records, load, loads
+
+__all__ = [
+    'ColorStop', 'ColorTable', 'hex_to_rgb', 'pack_rgba', 'unpack_rgba',
+    'Diagnostic', 'ParseError', 'dump', 'dumps', 'iter_records', 'load', 'loads',
+]
@@ -0,0 +1,214 @@
+"""
+Perceptual analysis of color tables and of the changes between two tables.
+
+Tables are sampled densely across their value domain with the same band
+semantics as the editor's preview bar (``lut.colorize_values``; alpha is
+ignored, as in the bar), converted to CIELAB, and every measure is computed
+on whole arrays:
+
+- ΔE per unit: the CIEDE2000 difference between neighbouring samples
+  divided by their value spacing, i.e. how fast the color changes per data
+  unit;
+- banding hotspots: value ranges where the color changes much faster than
+  the table's average, which the eye sees as edges rather than a ramp;
+- lightness monotonicity: whether L* only rises or only falls across the
+  domain, and the values where it reverses.
+
+``diff`` samples two tables at the same values and returns the ΔE between
+them per value.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .colorspace import rgb_to_lab
+from .lut import colorize_values, value_domain
+
+DEFAULT_SAMPLES = 8192
+SAMPLES_PER_STOP = 8        # Large tables get at least this many samples per stop
+HOTSPOT_FACTOR = 4.0        # ΔE per unit above this multiple of the average is a hotspot
+LIGHTNESS_TOLERANCE = 0.5   # L* dips smaller than this do not break monotonicity
+JND = 1.0                   # CIEDE2000 difference that is just noticeable
+
+
+class Analysis(namedtuple('Analysis', 'values lab delta_e_per_unit mean_delta_e hotspots direction monotonic '
+                                       'reversals')):
+    """
+    The result of ``analyze``:
+
+    - values: (N,) sample values; lab: (N, 3) their CIELAB colors.
+    - delta_e_per_unit: (N - 1,) ΔE per unit between neighbouring samples,
+      and mean_delta_e its average over the domain.
+    - hotspots: (start, end, peak ΔE per unit) of every banding hotspot.
+    - direction: 'increasing', 'decreasing' or 'flat' lightness end to end;
+      monotonic: whether L* never turns back by more than
+      LIGHTNESS_TOLERANCE; reversals: the values where it does.
+    """
+    __slots__ = ()
+
+
+class Diff(namedtuple('Diff', 'values delta_e coverage changed')):
+    """
+    The result of ``diff``: the sample values, the CIEDE2000 difference at
+    each (NaN where only one table colors the value), the mask of those
+    values, and (start, end, peak ΔE) of every range that changed
+    noticeably.
+    """
+    __slots__ = ()
+
+
+def delta_e(lab1, lab2):
+    """
+    CIEDE2000 color difference between two arrays of CIELAB colors.
+    """
+    l1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    l2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    c_mean7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) / 2) ** 7
+    g = 0.5 * (1 - np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7)))
+    a1, a2 = a1 * (1 + g), a2 * (1 + g)
+    c1, c2 = np.hypot(a1, b1), np.hypot(a2, b2)
+    h1 = np.degrees(np.arctan2(b1, a1)) % 360
+    h2 = np.degrees(np.arctan2(b2, a2)) % 360
+    chromatic = c1 * c2 != 0
+
+    dh = h2 - h1
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(chromatic, dh, 0.0)
+    d_l, d_c = l2 - l1, c2 - c1
+    d_h = 2 * np.sqrt(c1 * c2) * np.sin(np.radians(dh / 2))
+
+    l_mean = (l1 + l2) / 2
+    c_mean = (c1 + c2) / 2
+    h_sum = h1 + h2
+    h_mean = np.where(np.abs(h1 - h2) <= 180, h_sum / 2, np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2))
+    h_mean = np.where(chromatic, h_mean, h_sum)
+    t = (1 - 0.17 * np.cos(np.radians(h_mean - 30)) + 0.24 * np.cos(np.radians(2 * h_mean))
+         + 0.32 * np.cos(np.radians(3 * h_mean + 6)) - 0.20 * np.cos(np.radians(4 * h_mean - 63)))
+    d_theta = 30 * np.exp(-((h_mean - 275) / 25) ** 2)
+    c_mean7 = c_mean ** 7
+    r_c = 2 * np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7))
+    s_l = 1 + 0.015 * (l_mean - 50) ** 2 / np.sqrt(20 + (l_mean - 50) ** 2)
+    s_c = 1 + 0.045 * c_mean
+    s_h = 1 + 0.015 * c_mean * t
+    r_t = -np.sin(np.radians(2 * d_theta)) * r_c
+    return np.sqrt((d_l / s_l) ** 2 + (d_c / s_c) ** 2 + (d_h / s_h) ** 2 + r_t * (d_c / s_c) * (d_h / s_h))
+
+
+def sample_values(domain, samples):
+    """
+    Return ``samples`` evenly spaced pixel centers across a (min, max)
+    domain, like ``lut.sample_domain``.
+    """
+    low, high = domain
+    return low + (np.arange(samples) + 0.5) / samples * (high - low)
+
+
+def default_samples(*tables):
+    return max([DEFAULT_SAMPLES] + [SAMPLES_PER_STOP * len(table.stops) for table in tables])
+
+
+def to_lab(rgba):
+    return rgb_to_lab(rgba[..., :3] / 255.0)
+
+
+def value_ranges(values, mask, peaks=None):
+    """
+    Return (start, end, peak) for every run of true entries in ``mask``,
+    with the largest ``peaks`` entry of the run (or None).
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    firsts, stops = edges[::2], edges[1::2]
+    if peaks is None:
+        run_peaks = [None] * len(firsts)
+    else:
+        run_peaks = np.maximum.reduceat(peaks, firsts).tolist() if len(firsts) else []
+    starts = values[firsts].tolist()
+    ends = values[np.minimum(stops, len(values) - 1)].tolist()
+    return list(zip(starts, ends, run_peaks))
+
+
+def _columns(values, domain, columns):
+    low, high = domain
+    column = np.clip(((values - low) / (high - low) * columns).astype(np.int64), 0, columns - 1)
+    firsts = np.flatnonzero(np.diff(np.concatenate(([-1], column))))  # Values are sorted
+    return column[firsts], firsts
+
+
+def column_max(values, data, domain, columns):
+    """
+    Reduce per-sample ``data`` to its maximum in each of ``columns`` equal
+    slices of ``domain``, e.g. one per pixel of a plot; NaNs are ignored and
+    columns without samples are NaN.
+    """
+    out = np.full(columns, np.nan)
+    column, firsts = _columns(values, domain, columns)
+    out[column] = np.fmax.reduceat(data, firsts)
+    return out
+
+
+def column_mean(values, data, domain, columns):
+    """
+    Like ``column_max``, but the mean of each column. Averaging smooths the
+    8-bit quantization steps of gradients out of ΔE per unit.
+    """
+    out = np.full(columns, np.nan)
+    column, firsts = _columns(values, domain, columns)
+    out[column] = np.add.reduceat(data, firsts) / np.diff(np.append(firsts, len(data)))
+    return out
+
+
+def analyze(table, samples=None):
+    """
+    Sample a table across its value domain and measure its perceptual
+    uniformity. Returns an Analysis, or None for tables with fewer than two
+    stops.
+    """
+    domain = value_domain(table)
+    if domain is None or domain[0] == domain[1]:
+        return None
+    samples = max(samples or default_samples(table), 2)
+    values = sample_values(domain, samples)
+    lab = to_lab(colorize_values(table, values))
+
+    per_unit = delta_e(lab[:-1], lab[1:]) / np.diff(values)
+    mean = float(per_unit.mean())
+    # A hotspot is a noticeable jump much faster than the table's average rate
+    hot = (per_unit > HOTSPOT_FACTOR * mean) & (per_unit * np.diff(values) >= JND)
+    hotspots = value_ranges(values, hot, per_unit)
+
+    lightness = lab[:, 0]
+    rise = lightness[-1] - lightness[0]
+    if rise > LIGHTNESS_TOLERANCE:
+        direction = 'increasing'
+        dips = np.maximum.accumulate(lightness) - lightness > LIGHTNESS_TOLERANCE
+    elif rise < -LIGHTNESS_TOLERANCE:
+        direction = 'decreasing'
+        dips = lightness - np.minimum.accumulate(lightness) > LIGHTNESS_TOLERANCE
+    else:
+        direction = 'flat'
+        dips = np.abs(lightness - lightness[0]) > LIGHTNESS_TOLERANCE
+    # Each run of dips starts at a reversal
+    starts = np.flatnonzero(dips & ~np.concatenate(([False], dips[:-1])))
+    reversals = values[np.maximum(starts - 1, 0)]
+    return Analysis(values, lab, per_unit, mean, hotspots, direction, not dips.any(), reversals)
+
+
+def diff(table, other, samples=None, domain=None):
+    """
+    Compare two tables value by value over ``domain``, by default the union
+    of their domains. Returns a Diff, or None when neither table has stops.
+    """
+    if domain is None:
+        domains = [d for d in (value_domain(table), value_domain(other)) if d is not None]
+        if not domains:
+            return None
+        domain = min(d[0] for d in domains), max(d[1] for d in domains)
+    values = sample_values(domain, samples or default_samples(table, other))
+    rgba, other_rgba = colorize_values(table, values), colorize_values(other, values)
+    # Values below a table's first stop are transparent; compare only where both color
+    coverage = (rgba[:, 3] > 0) != (other_rgba[:, 3] > 0)
+    difference = delta_e(to_lab(rgba), to_lab(other_rgba))
+    difference[(rgba[:, 3] == 0) & (other_rgba[:, 3] == 0)] = 0.0
+    difference[coverage] = np.nan
+    changed = value_ranges(values, coverage | (difference >= JND), np.nan_to_num(difference, nan=np.inf))
+    return Diff(values, difference, coverage, changed)
@@ -0,0 +1,225 @@
+"""
+Benchmarks of the headless hot paths.
+
+Synthetic tables from 10 to 100k stops, mixing every band type, are run
+through parsing and saving in both dialects, the preview bar sampling,
+hex conversion, LUT compilation, grid colorization, dense sampling with
+OKLab gradient interpolation and the perceptual analysis. Each stage records
+its best wall time over a few repeats and its peak traced memory in a
+separate run, so tracing does not skew the timings.
+
+Startup is measured separately: importing the headless package and the
+editor module in fresh interpreters, noting which heavy dependencies each
+import pulled in.
+
+Results can be saved as a JSON baseline and later runs compared against
+it; ``compare`` reports the stages that got slower than a tolerance.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from .analysis import analyze
+from .formats import dump, dumps, parse_colortable_block, parse_legacy_format
+from .lut import clear_lut_cache, colorize, compile_lut, sample_domain
+from .model import BAND_TYPES, ColorStop, ColorTable, hex_to_rgb
+
+SIZES = (10, 100, 1000, 10000, 100000)
+DIALECTS = ('legacy', 'block')
+ALPHA_MIXES = ('rgb', 'rgba', 'mixed')
+PREVIEW_WIDTH = 1200
+GRID_SHAPE = (1024, 1024)
+PERCEPTUAL_SAMPLES = 1000000
+TOLERANCE = 0.25     # Relative slowdown reported as a regression
+NOISE_FLOOR = 0.001  # Seconds; faster stages are too noisy to compare
+STARTUP_MODULES = ('colortable', 'colortable_editor')
+HEAVY_MODULES = ('numpy', 'PIL', 'pynput', 'pyautogui', 'tkinter')
+
+# Run in a fresh interpreter by measure_startup()
+_STARTUP_SCRIPT = """
+import json, sys, time, tracemalloc
+module, traced = sys.argv[1], sys.argv[2] == '1'
+if traced:
+    tracemalloc.start()
+start = time.perf_counter()
+__import__(module)
+seconds = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1] if traced else 0
+loaded = [name for name in json.loads(sys.argv[3]) if name in sys.modules]
+print(json.dumps({'seconds': seconds, 'peak_bytes': peak, 'loaded': loaded}))
+"""
+
+
+def synthetic_table(stops, alpha='mixed', seed=0):
+    """
+    Build a table of ``stops`` stops cycling through every band type, with
+    opaque ('rgb'), translucent ('rgba') or mixed ('mixed') colors.
+    """
+    rng = random.Random(seed)
+    table = ColorTable(product='BR', units='dBZ', scale='0.5', offset='-32', step='5', rf=0x8000ffff)
+    with table.bulk():
+        for i in range(stops):
+            band_type = BAND_TYPES[i % len(BAND_TYPES)]
+            color_format = alpha if alpha != 'mixed' else ('rgba' if i % 2 else 'rgb')
+            alpha_mask = 0xFF if color_format == 'rgb' else rng.randrange(256)
+            start = (rng.getrandbits(24) << 8) | alpha_mask
+            end = (rng.getrandbits(24) << 8) | alpha_mask if band_type == 'gradient' else None
+            table.add(ColorStop(round(i * 0.5 - 30, 1), band_type, color_format, start, end))
+    return table
+
+
+def _stages(table, dialect, scratch, shared):
+    """
+    Return (name, dialect, setup, function) for the stages of one table.
+    ``setup`` prepares the stage's input outside of the timed call; the
+    dialect independent stages are only included when ``shared`` is true.
+    """
+    text = dumps(table, dialect)
+    lines = text.splitlines()
+    parse = parse_legacy_format if dialect == 'legacy' else parse_colortable_block
+    stages = [
+        ('parse', dialect, None, lambda: parse(lines, [])),
+        ('dumps', dialect, None, lambda: dumps(table, dialect)),
+        ('save', dialect, None, lambda: dump(table, scratch, dialect)),
+    ]
+    if shared:
+        codes = np.random.default_rng(0).integers(0, 256, GRID_SHAPE, dtype=np.uint8)
+        hex_colors = [(stop.start_color, stop.start_alpha) for stop in table.stops]
+        perceptual = table.copy()
+        perceptual.interpolation = 'oklab'
+        stages += [
+            ('hex_to_rgb', 'any', None, lambda: [hex_to_rgb(color, alpha) for color, alpha in hex_colors]),
+            ('preview', 'any', None, lambda: preview_pixels(table, PREVIEW_WIDTH)),
+            ('compile_lut', 'any', clear_lut_cache, lambda: compile_lut(table)),
+            ('colorize', 'any', None, lambda: colorize(table, codes)),
+            ('oklab_samples', 'any', None, lambda: sample_domain(perceptual, PERCEPTUAL_SAMPLES)),
+            ('analyze', 'any', None, lambda: analyze(table)),
+        ]
+    return stages
+
+
+def preview_pixels(table, width, height=40):
+    """
+    The headless part of the editor's preview bar: sample the table and
+    build the PPM pixel data handed to Tk.
+    """
+    _, rgba = sample_domain(table, width)
+    return np.broadcast_to(rgba[:, :3], (height, width, 3)).tobytes()
+
+
+def measure(function, setup=None, repeat=3):
+    """
+    Return the best wall time of ``repeat`` calls and the peak memory
+    allocated by one traced call, in bytes.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def measure_startup(module, repeat=3):
+    """
+    Import ``module`` in fresh interpreters started from the repository
+    root. Returns the best import time, the peak traced memory of one
+    traced import and the heavy modules the import loaded, or None when the
+    module cannot be imported here (e.g. the editor without Tk).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def child(traced):
+        command = [sys.executable, '-c', _STARTUP_SCRIPT, module, '1' if traced else '0', json.dumps(HEAVY_MODULES)]
+        completed = subprocess.run(command, cwd=root, capture_output=True, text=True)
+        if completed.returncode:
+            return None
+        return json.loads(completed.stdout)
+
+    timings = [child(False) for _ in range(repeat)]
+    traced = child(True)
+    if traced is None or None in timings:
+        return None
+    return {
+        'seconds': min(timing['seconds'] for timing in timings),
+        'peak_bytes': traced['peak_bytes'],
+        'loaded': traced['loaded'],
+    }
+
+
+def run(sizes=SIZES, dialects=DIALECTS, alpha_mixes=ALPHA_MIXES, repeat=3, progress=None):
+    """
+    Run the benchmarks. Returns a dictionary with environment details and
+    the results keyed by ``stage/dialect/alpha/stops``; ``progress`` is
+    called with each key and result as it completes.
+    """
+    results = {}
+    for module in STARTUP_MODULES:
+        result = measure_startup(module, repeat)
+        if result is not None:
+            results[f"startup/{module}"] = result
+            if progress:
+                progress(f"startup/{module}", result)
+    fd, scratch = tempfile.mkstemp(suffix='.pal')
+    os.close(fd)
+    try:
+        for stops in sizes:
+            for alpha in alpha_mixes:
+                table = synthetic_table(stops, alpha)
+                for i, dialect in enumerate(dialects):
+                    for stage, label, setup, function in _stages(table, dialect, scratch, i == 0):
+                        key = f"{stage}/{label}/{alpha}/{stops}"
+                        seconds, peak = measure(function, setup, repeat)
+                        results[key] = {'seconds': seconds, 'peak_bytes': peak}
+                        if progress:
+                            progress(key, results[key])
+    finally:
+        os.remove(scratch)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    Compare a report against a baseline report. Returns a list of
+    (key, seconds, baseline_seconds, ratio) for every stage present in both,
+    and the subset of keys that regressed beyond ``tolerance``.
+    """
+    rows, regressions = [], []
+    base = baseline.get('results', {})
+    for key, result in report['results'].items():
+        if key not in base:
+            continue
+        seconds, base_seconds = result['seconds'], base[key]['seconds']
+        ratio = seconds / base_seconds if base_seconds else float('inf')
+        rows.append((key, seconds, base_seconds, ratio))
+        if ratio > 1 + tolerance and seconds - base_seconds > NOISE_FLOOR:
+            regressions.append(key)
+    return rows, regressions
+
+
+def format_result(key, result, file=sys.stdout):
+    loaded = f"  loads {', '.join(result['loaded']) or 'nothing heavy'}" if 'loaded' in result else ""
+    print(f"{key:<32} {result['seconds'] * 1000:>10.2f} ms {result['peak_bytes'] / 1024:>10.1f} KiB{loaded}", file=file)
@@ -0,0 +1,312 @@
+"""
+Persistent cache of parsed color tables.
+
+Each opened file gets one small binary entry holding its parsed table and
+parse diagnostics, keyed by absolute path and validated against the file's
+size, mtime and SHA-256 content hash:
+
+- size and mtime unchanged: the entry is used without reading the file;
+- size or mtime changed but the content hash matches: the entry is used
+  after hashing the file, which is much cheaper than parsing it;
+- otherwise the file is parsed and the entry rewritten.
+
+The cache directory is bounded in size and evicts least recently used
+entries first. Set ``COLORTABLE_CACHE=0`` to disable it and
+``COLORTABLE_CACHE_DIR`` to move it.
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+
+from .formats import Diagnostic, loads
+from .model import BAND_TYPES, COLOR_FORMATS, ColorStop, ColorTable
+
+MAGIC = b'CTC\x03'
+HEADER = struct.Struct('<4sqq32s')  # magic, size, mtime_ns, sha256
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.ctc'
+READ_CHUNK = 1024 * 1024  # Bytes read between progress reports
+
+
+def default_cache_dir():
+    if os.environ.get('COLORTABLE_CACHE_DIR'):
+        return os.environ['COLORTABLE_CACHE_DIR']
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'colortable-editor', 'tables')
+
+
+def cache_enabled():
+    return os.environ.get('COLORTABLE_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _pack_str(text):
+    data = text.encode('utf-8')
+    return struct.pack('<I', len(data)) + data
+
+
+def _unpack_str(buffer, offset):
+    (length,) = struct.unpack_from('<I', buffer, offset)
+    offset += 4
+    return bytes(buffer[offset:offset + length]).decode('utf-8'), offset + length
+
+
+def encode_entry(path, size, mtime_ns, digest, table, diagnostics):
+    """
+    Encode a parsed table as a compact binary cache entry.
+    """
+    stops = table.valid_stops()
+    n = len(stops)
+    parts = [HEADER.pack(MAGIC, size, mtime_ns, digest), _pack_str(path)]
+    parts.extend(_pack_str(value) for value in table.settings().values())
+    parts.append(_pack_str(table.dialect or ''))
+    parts.append(_pack_str(table.interpolation))
+    parts.append(struct.pack('<?I', table.rf is not None, table.rf or 0))
+    parts.append(struct.pack('<I', n))
+    parts.append(struct.pack(f'<{n}d', *(stop.value for stop in stops)))
+    parts.append(bytes(BAND_TYPES.index(stop.type) for stop in stops))
+    parts.append(bytes(COLOR_FORMATS.index(stop.format) for stop in stops))
+    parts.append(bytes(stop.end is not None for stop in stops))
+    parts.append(struct.pack(f'<{n}I', *(stop.start for stop in stops)))
+    parts.append(struct.pack(f'<{n}I', *(stop.end or 0 for stop in stops)))
+    parts.append(_pack_str(json.dumps([list(diagnostic) for diagnostic in diagnostics])))
+    return b''.join(parts)
+
+
+def decode_header(buffer):
+    if len(buffer) < HEADER.size:
+        return None
+    magic, size, mtime_ns, digest = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        return None
+    return size, mtime_ns, digest
+
+
+def decode_entry(buffer):
+    """
+    Decode a cache entry into (path, table, diagnostics).
+    """
+    offset = HEADER.size
+    path, offset = _unpack_str(buffer, offset)
+    settings = {}
+    for name in ('product', 'units', 'scale', 'offset', 'step'):
+        settings[name], offset = _unpack_str(buffer, offset)
+    dialect, offset = _unpack_str(buffer, offset)
+    interpolation, offset = _unpack_str(buffer, offset)
+    has_rf, rf = struct.unpack_from('<?I', buffer, offset)
+    offset += 5
+    (n,) = struct.unpack_from('<I', buffer, offset)
+    offset += 4
+    values = struct.unpack_from(f'<{n}d', buffer, offset)
+    offset += 8 * n
+    types = buffer[offset:offset + n]
+    formats = buffer[offset + n:offset + 2 * n]
+    has_end = buffer[offset + 2 * n:offset + 3 * n]
+    offset += 3 * n
+    starts = struct.unpack_from(f'<{n}I', buffer, offset)
+    offset += 4 * n
+    ends = struct.unpack_from(f'<{n}I', buffer, offset)
+    offset += 4 * n
+    diagnostics_json, offset = _unpack_str(buffer, offset)
+
+    table = ColorTable(**settings, rf=rf if has_rf else None, dialect=dialect or None,
+                       interpolation=interpolation)
+    table.stops = [
+        ColorStop(values[i], BAND_TYPES[types[i]], COLOR_FORMATS[formats[i]], starts[i],
+                  ends[i] if has_end[i] else None)
+        for i in range(n)
+    ]
+    diagnostics = [Diagnostic(*item) for item in json.loads(diagnostics_json)]
+    return path, table, diagnostics
+
+
+class TableCache:
+    """
+    Size-bounded on-disk cache of parsed tables.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, enabled=None):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.enabled = cache_enabled() if enabled is None else enabled
+
+    def entry_path(self, path):
+        name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + ENTRY_SUFFIX)
+
+    def load(self, path, diagnostics=None, progress=None):
+        """
+        Return the parsed table of ``path``, from the cache when the entry is
+        still valid. Parse diagnostics are appended to ``diagnostics`` like
+        ``formats.load`` does, including on cache hits.
+
+        ``progress(phase, done, total)``, when given, is called while the
+        file is read ('read', in bytes) and parsed ('parse', in lines). It
+        may raise to abandon the load, in which case the cache is left as it
+        was.
+        """
+        if not self.enabled:
+            return self._parse(self._read(path, progress), diagnostics, progress)
+
+        abspath = os.path.abspath(path)
+        stat = os.stat(abspath)
+        entry_path = self.entry_path(abspath)
+        entry = self._read_entry(entry_path)
+        header = decode_header(entry) if entry else None
+
+        if header and header[:2] == (stat.st_size, stat.st_mtime_ns):
+            hit = self._decode(entry, abspath, diagnostics)
+            if hit is not None:
+                self._touch(entry_path)
+                return hit
+
+        data = self._read(abspath, progress)
+        digest = hashlib.sha256(data).digest()
+        if header and header[2] == digest:
+            hit = self._decode(entry, abspath, diagnostics)
+            if hit is not None:
+                # Same content, new stat: refresh the header only
+                self._write_entry(entry_path, HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, digest)
+                                  + bytes(entry[HEADER.size:]))
+                return hit
+
+        parsed = []
+        table = self._parse(data, parsed, progress)
+        self._write_entry(entry_path, encode_entry(abspath, stat.st_size, stat.st_mtime_ns, digest, table, parsed))
+        if diagnostics is not None:
+            diagnostics.extend(parsed)
+        return table
+
+    def _read(self, path, progress):
+        with open(path, 'rb') as file:
+            if progress is None:
+                return file.read()
+            total = os.fstat(file.fileno()).st_size
+            chunks, done = [], 0
+            while True:
+                progress('read', done, total)
+                chunk = file.read(READ_CHUNK)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+                done += len(chunk)
+
+    def _parse(self, data, diagnostics, progress=None):
+        text = data.decode('utf-8', errors='replace')
+        if progress is None:
+            return loads(text, diagnostics)
+        return loads(text, diagnostics, lambda done, total: progress('parse', done, total))
+
+    def _decode(self, entry, abspath, diagnostics):
+        try:
+            path, table, cached = decode_entry(entry)
+        except (struct.error, ValueError, IndexError, TypeError):
+            return None  # Corrupt or from an incompatible version
+        if path != abspath:
+            return None
+        if diagnostics is not None:
+            diagnostics.extend(cached)
+        return table
+
+    def _read_entry(self, entry_path):
+        try:
+            with open(entry_path, 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _write_entry(self, entry_path, data):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp_path, entry_path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            return  # The cache is an optimization; never fail an open over it
+        self.evict()
+
+    def _touch(self, entry_path):
+        # Entry mtimes track recency of use for LRU eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """
+        Return (mtime, size, path) for every entry, oldest first.
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(ENTRY_SUFFIX):
+                entry_path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, entry_path in self.entries():
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+
+    def usage(self):
+        """
+        Return the number of entries and their total size in bytes.
+        """
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TableCache()
+    return _default_cache
+
+
+def load_cached(path, diagnostics=None, progress=None):
+    """
+    ``formats.load`` through the default cache.
+    """
+    return default_cache().load(path, diagnostics, progress)
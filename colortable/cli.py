@@ -0,0 +1,308 @@
+"""
+Command line entry points for headless color table work.
+
+Run as ``python -m colortable COMMAND ...`` or ``python colortable_editor.py
+COMMAND ...``; without a command the editor starts the Tk GUI instead.
+"""
+import argparse
+import sys
+
+
+def format_bytes(size):
+    if size is None:
+        return "n/a"
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def cmd_colorize(args):
+    from .colorize import colorize_file
+
+    stats = colorize_file(
+        args.table, args.input, args.output,
+        dtype=args.dtype, shape=args.shape, header_bytes=args.header_bytes,
+        rf_code=args.rf_code, workers=args.workers, chunk_rows=args.chunk_rows,
+        level=args.level
+    )
+    print(f"Colorized {stats['pixels']} pixels in {stats['seconds']:.2f} s "
+          f"({stats['pixels_per_second'] / 1e6:.1f} Mpixel/s)", file=sys.stderr)
+    workers = stats['peak_worker_memory']
+    print(f"Peak memory: {format_bytes(stats['peak_memory'])} main"
+          + (f", {format_bytes(workers)} largest worker" if workers is not None else ""), file=sys.stderr)
+    return 0
+
+
+def cmd_convert(args):
+    from .convert import convert_tree, REPORT_NAME
+
+    summary = convert_tree(args.source, args.to, args.output, workers=args.workers, force=args.force,
+                           in_place=args.in_place)
+    print(f"Converted {summary['converted']}, unchanged {summary['unchanged']}, "
+          f"failed {len(summary['failed'])}, with skipped lines {len(summary['warnings'])}", file=sys.stderr)
+    if summary['failed'] or summary['warnings']:
+        print(f"See {REPORT_NAME} in {args.output or args.source} for details.", file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
+
+def cmd_cache(args):
+    from .cache import default_cache
+
+    cache = default_cache()
+    count, size = cache.usage()
+    if args.action == 'clear':
+        cache.clear()
+        print(f"Removed {count} cached table(s), {format_bytes(size)}", file=sys.stderr)
+    else:
+        state = "enabled" if cache.enabled else "disabled (COLORTABLE_CACHE=0)"
+        print(f"{cache.directory}: {count} table(s), {format_bytes(size)} "
+              f"of {format_bytes(cache.max_bytes)}, {state}")
+    return 0
+
+
+def format_ranges(ranges, units, peak_label):
+    return [f"  {start:g} to {end:g} {units}  {peak_label} {peak:.2f}" for start, end, peak in ranges]
+
+
+def cmd_analyze(args):
+    import numpy as np
+    from .analysis import HOTSPOT_FACTOR, JND, analyze, diff
+    from .formats import load
+
+    table = load(args.table)
+    units = table.units
+    result = analyze(table, args.samples)
+    if result is None:
+        print(f"{args.table}: fewer than two distinct stop values, nothing to analyze")
+    else:
+        stops = table.valid_stops()
+        print(f"{args.table}: {len(stops)} stops from {stops[0].value:g} to {stops[-1].value:g} {units}, "
+              f"{len(result.values)} samples")
+        print(f"Delta E per unit: mean {result.mean_delta_e:.3f}, max {result.delta_e_per_unit.max():.3f}")
+        reversals = ', '.join(f"{value:g}" for value in result.reversals)
+        print(f"Lightness: {result.direction}"
+              + (", monotonic" if result.monotonic else f", reverses at {reversals} {units}"))
+        print(f"Banding hotspots (over {HOTSPOT_FACTOR:g}x the mean): {len(result.hotspots)}")
+        for line in format_ranges(result.hotspots[:args.limit], units, "peak"):
+            print(line)
+
+    status = 0
+    if args.against:
+        changes = diff(table, load(args.against), args.samples)
+        if changes is None:
+            print(f"Against {args.against}: neither table has stops")
+            return 0
+        colored = changes.delta_e[~changes.coverage]
+        worst = float(np.max(colored)) if len(colored) else 0.0
+        at = changes.values[~changes.coverage][np.argmax(colored)] if len(colored) else changes.values[0]
+        print(f"Against {args.against}: max delta E {worst:.2f} at {at:g} {units}, "
+              f"mean {float(np.mean(colored)) if len(colored) else 0.0:.2f}, "
+              f"{int(changes.coverage.sum())} samples colored by only one table")
+        print(f"Changed ranges (delta E >= {JND:g}): {len(changes.changed)}")
+        for line in format_ranges(changes.changed[:args.limit], units, "max delta E"):
+            print(line)
+        if args.max_delta_e is not None and (worst > args.max_delta_e or changes.coverage.any()):
+            status = 1
+    return status
+
+
+def cmd_simplify(args):
+    from .formats import dump, load
+    from .simplify import simplify
+
+    table = load(args.table)
+    result = simplify(table, args.max_delta_e, args.samples)
+    dump(result.table, args.output, args.to)
+    print(f"{args.table}: {result.stops_before} stops -> {result.stops_after} stops "
+          f"(max delta E {result.max_delta_e:.2f}, limit {args.max_delta_e:g}); wrote {args.output}")
+    return 0
+
+
+def cmd_export(args):
+    from .export import export
+    from .formats import load
+
+    table = load(args.table)
+    sampling = export(table, args.outputs, steps=args.steps, dtype=args.dtype, rf_code=args.rf_code,
+                      width=args.width, height=args.height, vertical=args.vertical)
+    print(f"{args.table}: {len(sampling)} segments, {len(sampling.lut)}-entry LUT; "
+          f"wrote {', '.join(args.outputs)}", file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args):
+    from .serve import serve
+
+    def ready(server):
+        where = args.socket or f"http://{args.host}:{args.port}"
+        print(f"Serving tables below {args.root} on {where}; press Ctrl+C to stop", file=sys.stderr)
+
+    metrics = serve(args.root, args.host, args.port, args.socket, ready, cache_size=args.cache_size,
+                    batch_window=args.batch_ms / 1000, threads=args.threads)
+    latency = metrics.get('latency_ms')
+    print(f"Served {metrics['requests']} requests ({metrics['errors']} failed), {metrics['pixels']} pixels in "
+          f"{metrics['batches']} batches"
+          + (f"; latency p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms" if latency else ""),
+          file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args):
+    import json
+    from . import bench
+
+    report = bench.run(args.sizes, args.dialects, args.alpha, repeat=args.repeat,
+                       progress=None if args.baseline else bench.format_result)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        rows, regressions = bench.compare(report, baseline, args.tolerance)
+        for key, seconds, base_seconds, ratio in rows:
+            flag = "  REGRESSION" if key in regressions else ""
+            print(f"{key:<32} {seconds * 1000:>10.2f} ms {base_seconds * 1000:>10.2f} ms {ratio - 1:>+8.1%}{flag}")
+        print(f"{len(regressions)} of {len(rows)} stages slower than the baseline by more than "
+              f"{args.tolerance:.0%}", file=sys.stderr)
+        status = 1 if regressions else 0
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=1, sort_keys=True)
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="colortable-editor", description="Color table tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    colorize = commands.add_parser(
+        'colorize', help="apply a color table to a .npy or raw binary grid",
+        description="Apply a color table to a 2-D grid and write an RGBA PNG, .npy or raw RGBA file. "
+                    "uint8/uint16 grids are raw codes scaled by the table's Scale and Offset; "
+                    "float grids hold data values."
+    )
+    colorize.add_argument('table', help="color table file")
+    colorize.add_argument('input', help=".npy grid, or raw binary grid with --dtype and --shape")
+    colorize.add_argument('output', help="output file: .png, .npy, or anything else for raw RGBA bytes")
+    colorize.add_argument('--dtype', help="dtype of a raw input grid, e.g. uint8, <u2 or float32")
+    colorize.add_argument('--shape', type=int, nargs=2, metavar=('ROWS', 'COLS'), help="shape of a raw input grid")
+    colorize.add_argument('--header-bytes', type=int, default=0, help="bytes to skip at the start of a raw grid")
+    colorize.add_argument('--rf-code', type=int, help="raw code drawn in the table's RF color")
+    colorize.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    colorize.add_argument('--chunk-rows', type=int, help="rows per work unit")
+    colorize.add_argument('--level', type=int, default=6, choices=range(10), metavar='0-9',
+                          help="PNG compression level (default: 6)")
+    colorize.set_defaults(func=cmd_colorize)
+
+    convert = commands.add_parser(
+        'convert', help="convert a tree of palettes between dialects",
+        description="Convert every .pal, .pal3 and .txt palette below SOURCE to the legacy or "
+                    "ColorTable block dialect. Files unchanged since the last run are skipped."
+    )
+    convert.add_argument('source', help="directory to convert")
+    convert.add_argument('--to', required=True, choices=('legacy', 'block'), help="target dialect")
+    target = convert.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="directory to mirror the converted tree into")
+    target.add_argument('--in-place', action='store_true', help="rewrite the source files themselves")
+    convert.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    convert.add_argument('--force', action='store_true', help="convert every file, ignoring the manifest")
+    convert.set_defaults(func=cmd_convert)
+
+    cache = commands.add_parser(
+        'cache', help="show or clear the parsed table cache",
+        description="The editor caches parsed tables on disk so that reopening a file skips parsing. "
+                    "Set COLORTABLE_CACHE=0 to disable the cache and COLORTABLE_CACHE_DIR to move it."
+    )
+    cache.add_argument('action', nargs='?', default='info', choices=('info', 'clear'))
+    cache.set_defaults(func=cmd_cache)
+
+    analyze = commands.add_parser(
+        'analyze', help="measure a table's perceptual uniformity, or compare two tables",
+        description="Sample a table across its value domain and report delta E (CIEDE2000) per unit, banding "
+                    "hotspots and lightness monotonicity. With --against, also report the delta E between the "
+                    "two tables per value."
+    )
+    analyze.add_argument('table', help="color table file")
+    analyze.add_argument('--against', metavar='TABLE', help="other revision of the table to compare with")
+    analyze.add_argument('--samples', type=int, help="samples across the domain (default: 8192, or 8 per stop)")
+    analyze.add_argument('--limit', type=int, default=20, help="ranges listed per section (default: 20)")
+    analyze.add_argument('--max-delta-e', type=float,
+                         help="with --against, exit with status 1 if the tables differ by more than this")
+    analyze.set_defaults(func=cmd_analyze)
+
+    simplify = commands.add_parser(
+        'simplify', help="reduce a table to the fewest bands within a delta E tolerance",
+        description="Fit the fewest solid and gradient bands that reproduce a table within a maximum delta E "
+                    "(CIEDE2000) over its value domain, breaking only at the table's own stop values, and write "
+                    "the result."
+    )
+    simplify.add_argument('table', help="color table file")
+    simplify.add_argument('output', help="file to write the simplified table to")
+    simplify.add_argument('--max-delta-e', type=float, default=1.0,
+                          help="largest delta E allowed anywhere in the domain (default: 1.0)")
+    simplify.add_argument('--samples', type=int, help="extra evenly spaced samples checked (default: 8192)")
+    simplify.add_argument('--to', choices=('legacy', 'block'), help="dialect to write (default: the source's)")
+    simplify.set_defaults(func=cmd_simplify)
+
+    export = commands.add_parser(
+        'export', help="export a table as a .npy LUT, PNG legend, matplotlib spec or GMT .cpt",
+        description="Write a table in every format named by the output extensions: .npy (RGBA LUT indexed by raw "
+                    "code), .png (legend strip), .json (matplotlib ListedColormap and BoundaryNorm spec) or .cpt "
+                    "(GMT palette). All outputs come from one sampling of the table."
+    )
+    export.add_argument('table', help="color table file")
+    export.add_argument('outputs', nargs='+', metavar='output', help="files to write, by extension")
+    export.add_argument('--steps', type=int, default=32, help="segments per gradient band in .json and .cpt "
+                                                             "(default: 32)")
+    export.add_argument('--dtype', choices=('uint8', 'uint16'), default='uint8',
+                        help="raw code type the .npy LUT is indexed by (default: uint8)")
+    export.add_argument('--rf-code', type=int, help="raw code drawn in the table's RF color in the .npy LUT")
+    export.add_argument('--width', type=int, default=512, help="legend length in pixels (default: 512)")
+    export.add_argument('--height', type=int, default=32, help="legend thickness in pixels (default: 32)")
+    export.add_argument('--vertical', action='store_true', help="draw the legend bottom to top")
+    export.set_defaults(func=cmd_export)
+
+    serve = commands.add_parser(
+        'serve', help="run a local colorization service",
+        description="Serve POST /colorize?table=NAME&dtype=DTYPE[&rf_code=CODE] with a raw array body, answering "
+                    "with RGBA bytes, and GET /metrics, on a localhost port or a Unix socket. Tables are looked "
+                    "up below ROOT and kept compiled in an LRU keyed by file hash."
+    )
+    serve.add_argument('root', help="directory holding the color tables")
+    serve.add_argument('--host', default='127.0.0.1', help="loopback address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=8765, help="TCP port (default: 8765)")
+    serve.add_argument('--socket', help="listen on this Unix socket instead of a TCP port")
+    serve.add_argument('--cache-size', type=int, default=64, help="compiled tables kept in memory (default: 64)")
+    serve.add_argument('--batch-ms', type=float, default=2.0,
+                       help="milliseconds a batch waits for more requests (default: 2)")
+    serve.add_argument('--threads', type=int, help="worker threads (default: Python's thread pool default)")
+    serve.set_defaults(func=cmd_serve)
+
+    bench = commands.add_parser(
+        'bench', help="benchmark parsing, saving, preview and colorize",
+        description="Run the headless benchmarks on synthetic tables and print wall time and peak memory per "
+                    "stage. With --baseline, compare against a saved run and exit with status 1 if any stage "
+                    "regressed."
+    )
+    bench.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000],
+                       help="table sizes in stops (default: 10 to 100000)")
+    bench.add_argument('--dialects', nargs='+', choices=('legacy', 'block'), default=['legacy', 'block'])
+    bench.add_argument('--alpha', nargs='+', choices=('rgb', 'rgba', 'mixed'), default=['rgb', 'rgba', 'mixed'],
+                       help="alpha mixes to generate")
+    bench.add_argument('--repeat', type=int, default=3, help="timed runs per stage; the best is kept (default: 3)")
+    bench.add_argument('--baseline', help="JSON report of an earlier run to compare against")
+    bench.add_argument('--tolerance', type=float, default=0.25,
+                       help="relative slowdown counted as a regression (default: 0.25)")
+    bench.add_argument('--save', metavar='FILE', help="write this run's report as JSON, e.g. to use as a baseline")
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return 1
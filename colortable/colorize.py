@@ -0,0 +1,241 @@
+"""
+Streaming colorization of large gridded files.
+
+The input grid is memory-mapped and split into bands of rows that worker
+processes colorize independently, so a grid never has to fit in memory.
+PNG output is deflated by the workers as well: each band is compressed as
+a byte-aligned raw deflate segment and the segments are stitched into a
+single zlib stream, combining their adler32 checksums, as pigz does.
+"""
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .formats import load
+from .lut import colorize, colorize_values
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Target number of pixels per chunk handed to a worker
+CHUNK_PIXELS = 1 << 22
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+ZLIB_HEADER = b'\x78\x9c'
+ADLER_BASE = 65521
+
+
+def open_grid(path, dtype=None, shape=None, header_bytes=0):
+    """
+    Memory-map a 2-D grid from a .npy file, or from a raw binary file when
+    ``dtype`` and ``shape`` are given.
+    """
+    if path.lower().endswith('.npy'):
+        grid = np.load(path, mmap_mode='r')
+    else:
+        if dtype is None or shape is None:
+            raise ValueError("Raw grids need a dtype and a shape")
+        grid = np.memmap(path, dtype=dtype, mode='r', offset=header_bytes, shape=tuple(shape))
+    if grid.ndim != 2:
+        raise ValueError(f"Expected a 2-D grid, got shape {grid.shape}")
+    return grid
+
+
+def colorize_grid(table, grid, rf_code=None):
+    """
+    Color a block of a grid. Unsigned integer grids are raw codes and go
+    through the compiled LUT; floating point grids already hold data values.
+    """
+    if grid.dtype.kind == 'u':
+        return colorize(table, grid, rf_code)
+    if grid.dtype.kind == 'f':
+        return colorize_values(table, grid)
+    raise ValueError(f"Unsupported grid dtype: {grid.dtype}")
+
+
+def adler32_combine(adler1, adler2, len2):
+    """
+    Return the adler32 of two concatenated buffers from their checksums and
+    the length of the second one.
+    """
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + ADLER_BASE - rem
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum1 >= ADLER_BASE:
+        sum1 -= ADLER_BASE
+    if sum2 >= ADLER_BASE << 1:
+        sum2 -= ADLER_BASE << 1
+    if sum2 >= ADLER_BASE:
+        sum2 -= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class PNGStreamWriter:
+    """
+    Write an 8-bit RGBA PNG from independently deflated row bands.
+    """
+
+    def __init__(self, path, width, height):
+        self.file = open(path, 'wb')
+        self.adler = 1
+        self.file.write(PNG_SIGNATURE)
+        self.file.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        self.pending = ZLIB_HEADER
+
+    def write_band(self, deflated, adler, length):
+        self.adler = adler32_combine(self.adler, adler, length)
+        self.file.write(png_chunk(b'IDAT', self.pending + deflated))
+        self.pending = b''
+
+    def close(self):
+        self.file.write(png_chunk(b'IDAT', self.pending + struct.pack('>I', self.adler)))
+        self.file.write(png_chunk(b'IEND', b''))
+        self.file.close()
+
+
+def deflate_rows(rgba, last, level):
+    """
+    Filter rows of an RGBA block for PNG (filter type 0) and deflate them
+    as a raw segment that can be concatenated with its neighbours.
+    """
+    rows = np.zeros((rgba.shape[0], 1 + rgba.shape[1] * 4), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(rgba.shape[0], -1)
+    data = rows.data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return deflated, zlib.adler32(data), rows.nbytes
+
+
+# Per-process state set up by _init_worker
+_job = {}
+
+
+def _init_worker(job):
+    _job.clear()
+    _job.update(job)
+    _job['table'] = load(job['table_path'])
+    _job['grid'] = open_grid(job['input'], job['dtype'], job['shape'], job['header_bytes'])
+
+
+def _run_chunk(row0, row1):
+    job = _job
+    rgba = colorize_grid(job['table'], job['grid'][row0:row1], job['rf_code'])
+    if job['format'] == 'png':
+        return deflate_rows(rgba, row1 == job['grid'].shape[0], job['level'])
+    if job['format'] == 'npy':
+        out = np.load(job['output'], mmap_mode='r+')
+    else:
+        out = np.memmap(job['output'], dtype=np.uint8, mode='r+', shape=job['grid'].shape + (4,))
+    out[row0:row1] = rgba
+    out.flush()
+    del out
+    return None
+
+
+def peak_memory():
+    """
+    Return the peak resident memory of this process and of its finished
+    children in bytes, or None where the platform does not report it.
+    """
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return own, children
+
+
+def colorize_file(table_path, input_path, output_path, dtype=None, shape=None, header_bytes=0,
+                  rf_code=None, workers=None, chunk_rows=None, level=6):
+    """
+    Colorize a gridded file into an RGBA PNG, .npy or raw RGBA file.
+
+    Returns a dictionary with the pixel count, elapsed seconds, throughput
+    and peak memory of the run.
+    """
+    started = time.perf_counter()
+    grid = open_grid(input_path, dtype, shape, header_bytes)
+    height, width = grid.shape
+    if not height or not width:
+        raise ValueError(f"Grid {input_path} is empty")
+    ext = os.path.splitext(output_path)[1].lower()
+    output_format = {'.png': 'png', '.npy': 'npy'}.get(ext, 'raw')
+    if chunk_rows is None:
+        chunk_rows = max(1, CHUNK_PIXELS // max(width, 1))
+    workers = workers or os.cpu_count() or 1
+
+    # Pre-size file outputs so workers can write their rows in place
+    writer = None
+    if output_format == 'png':
+        writer = PNGStreamWriter(output_path, width, height)
+    elif output_format == 'npy':
+        out = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.uint8, shape=(height, width, 4))
+        del out
+    else:
+        with open(output_path, 'wb') as file:
+            file.truncate(height * width * 4)
+
+    job = {
+        'table_path': table_path, 'input': input_path, 'dtype': dtype, 'shape': shape,
+        'header_bytes': header_bytes, 'output': output_path, 'format': output_format,
+        'rf_code': rf_code, 'level': level,
+    }
+    chunks = [(row0, min(row0 + chunk_rows, height)) for row0 in range(0, height, chunk_rows)]
+
+    def handle(result):
+        if writer is not None:
+            writer.write_band(*result)
+
+    completed = False
+    try:
+        if workers == 1:
+            _init_worker(job)
+            for row0, row1 in chunks:
+                handle(_run_chunk(row0, row1))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(job,)) as pool:
+                # Keep a bounded window of chunks in flight and consume them
+                # in order, so finished PNG bands are written immediately
+                window = 2 * workers
+                pending = []
+                for row0, row1 in chunks:
+                    pending.append(pool.submit(_run_chunk, row0, row1))
+                    if len(pending) >= window:
+                        handle(pending.pop(0).result())
+                for future in pending:
+                    handle(future.result())
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+        if not completed:
+            # Do not leave a truncated image behind
+            os.remove(output_path)
+
+    elapsed = time.perf_counter() - started
+    own, children = peak_memory()
+    if workers == 1:
+        children = None  # Everything ran in this process
+    return {
+        'pixels': height * width,
+        'seconds': elapsed,
+        'pixels_per_second': height * width / elapsed if elapsed else float('inf'),
+        'peak_memory': own,
+        'peak_worker_memory': children,
+    }
@@ -0,0 +1,179 @@
+"""
+Vectorized conversions between sRGB and the perceptual color spaces used
+for color parsing and gradient interpolation: CIELAB, OKLab and HSLuv.
+
+Every function takes and returns float arrays whose last axis holds the
+three components, so a whole table or millions of samples convert in one
+call. sRGB components are 0-1 floats; ``to_space`` and ``from_space`` work
+on 0-255 values.
+"""
+import numpy as np
+
+# Linear sRGB <-> CIE XYZ (D65), as used by the HSLuv reference implementation
+RGB_TO_XYZ = np.array([
+    [0.41239079926595, 0.35758433938387, 0.18048078840183],
+    [0.21263900587151, 0.71516867876775, 0.072192315360733],
+    [0.019330818715591, 0.11919477979462, 0.95053215224966],
+])
+XYZ_TO_RGB = np.array([
+    [3.240969941904521, -1.537383177570093, -0.498610760293],
+    [-0.96924363628087, 1.87596750150772, 0.041555057407175],
+    [0.055630079696993, -0.20397695888897, 1.056971514242878],
+])
+WHITE_XYZ = RGB_TO_XYZ.sum(axis=1)  # D65 white point of the matrices above
+
+# OKLab, from Björn Ottosson's reference implementation
+RGB_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+OKLAB_TO_LMS = np.array([
+    [1.0, 0.3963377774, 0.2158037573],
+    [1.0, -0.1055613458, -0.0638541728],
+    [1.0, -0.0894841775, -1.2914855480],
+])
+LMS_TO_RGB = np.array([
+    [4.0767416621, -3.3077115913, 0.2309699292],
+    [-1.2684380046, 2.6097574011, -0.3413193965],
+    [-0.0041960863, -0.7034186147, 1.7076147010],
+])
+
+# CIE constants
+LAB_DELTA = 6 / 29
+KAPPA = 903.2962962
+EPSILON = 0.0088564516
+REF_U = 4 * WHITE_XYZ[0] / (WHITE_XYZ[0] + 15 * WHITE_XYZ[1] + 3 * WHITE_XYZ[2])
+REF_V = 9 * WHITE_XYZ[1] / (WHITE_XYZ[0] + 15 * WHITE_XYZ[1] + 3 * WHITE_XYZ[2])
+
+
+def _dot(matrix, colors):
+    return colors @ matrix.T
+
+
+def srgb_to_linear(rgb):
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(linear):
+    linear = np.clip(linear, 0.0, 1.0)
+    return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+def rgb_to_lab(rgb):
+    xyz = _dot(RGB_TO_XYZ, srgb_to_linear(rgb)) / WHITE_XYZ
+    f = np.where(xyz > LAB_DELTA ** 3, np.cbrt(xyz), xyz / (3 * LAB_DELTA ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def lab_to_rgb(lab):
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f > LAB_DELTA, f ** 3, 3 * LAB_DELTA ** 2 * (f - 4 / 29)) * WHITE_XYZ
+    return linear_to_srgb(_dot(XYZ_TO_RGB, xyz))
+
+
+def rgb_to_oklab(rgb):
+    return _dot(LMS_TO_OKLAB, np.cbrt(_dot(RGB_TO_LMS, srgb_to_linear(rgb))))
+
+
+def oklab_to_rgb(lab):
+    return linear_to_srgb(_dot(LMS_TO_RGB, _dot(OKLAB_TO_LMS, lab) ** 3))
+
+
+def _max_chroma(lightness, hue):
+    """
+    Largest LCh(uv) chroma inside the sRGB gamut for each lightness and hue
+    in degrees, from the six gamut boundary lines of HSLuv.
+    """
+    sub1 = (lightness + 16) ** 3 / 1560896
+    sub2 = np.where(sub1 > EPSILON, sub1, lightness / KAPPA)
+    radians = np.radians(hue)
+    sin, cos = np.sin(radians), np.cos(radians)
+    best = np.full(np.shape(lightness), np.inf)
+    for m1, m2, m3 in XYZ_TO_RGB:
+        for t in (0, 1):
+            top1 = (284517 * m1 - 94839 * m3) * sub2
+            top2 = (838422 * m3 + 769860 * m2 + 731718 * m1) * lightness * sub2 - 769860 * t * lightness
+            bottom = (632260 * m3 - 126452 * m2) * sub2 + 126452 * t
+            with np.errstate(divide='ignore', invalid='ignore'):
+                length = (top2 / bottom) / (sin - (top1 / bottom) * cos)
+            best = np.where((length >= 0) & (length < best), length, best)
+    return best
+
+
+def rgb_to_hsluv(rgb):
+    xyz = _dot(RGB_TO_XYZ, srgb_to_linear(rgb))
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    lightness = np.where(y <= EPSILON, y / WHITE_XYZ[1] * KAPPA, 116 * np.cbrt(y / WHITE_XYZ[1]) - 16)
+    divider = x + 15 * y + 3 * z
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.where(divider > 0, 13 * lightness * (4 * x / divider - REF_U), 0.0)
+        v = np.where(divider > 0, 13 * lightness * (9 * y / divider - REF_V), 0.0)
+        chroma = np.hypot(u, v)
+        hue = np.where(chroma < 1e-8, 0.0, np.degrees(np.arctan2(v, u)) % 360)
+        saturation = np.where(
+            (lightness > 99.9999999) | (lightness < 1e-8), 0.0, chroma / _max_chroma(lightness, hue) * 100
+        )
+    return np.stack([hue, saturation, lightness], axis=-1)
+
+
+def hsluv_to_rgb(hsluv):
+    hue, saturation, lightness = hsluv[..., 0], hsluv[..., 1], hsluv[..., 2]
+    y = np.where(lightness <= 8, WHITE_XYZ[1] * lightness / KAPPA, WHITE_XYZ[1] * ((lightness + 16) / 116) ** 3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chroma = np.where(
+            (lightness > 99.9999999) | (lightness < 1e-8), 0.0, _max_chroma(lightness, hue) / 100 * saturation
+        )
+        radians = np.radians(hue)
+        u, v = chroma * np.cos(radians), chroma * np.sin(radians)
+        var_u = u / (13 * lightness) + REF_U
+        var_v = v / (13 * lightness) + REF_V
+        x = -(9 * y * var_u) / ((var_u - 4) * var_v - var_u * var_v)
+        z = (9 * y - 15 * var_v * y - var_v * x) / (3 * var_v)
+    xyz = np.stack([x, y, z], axis=-1)
+    xyz = np.where((lightness < 1e-8)[..., None], 0.0, xyz)
+    return linear_to_srgb(_dot(XYZ_TO_RGB, xyz))
+
+
+_TO_SPACE = {'lab': rgb_to_lab, 'oklab': rgb_to_oklab, 'hsluv': rgb_to_hsluv}
+_FROM_SPACE = {'lab': lab_to_rgb, 'oklab': oklab_to_rgb, 'hsluv': hsluv_to_rgb}
+
+
+def to_space(rgb, space):
+    """
+    Convert 0-255 sRGB components to ``space`` coordinates.
+    """
+    rgb = np.asarray(rgb, dtype=np.float64)
+    return rgb if space == 'rgb' else _TO_SPACE[space](rgb / 255)
+
+
+def from_space(coords, space):
+    """
+    Convert ``space`` coordinates to rounded 0-255 sRGB components as uint8,
+    clipping colors outside the sRGB gamut.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    rgb = coords / 255 if space == 'rgb' else _FROM_SPACE[space](coords)
+    return np.clip(np.round(rgb * 255), 0, 255).astype(np.uint8)
+
+
+def interpolate(start, end, ratio, space):
+    """
+    Interpolate between ``space`` coordinates ``start`` and ``end`` at
+    ``ratio`` (0-1, broadcast against them). HSLuv hues take the shorter
+    way around the hue circle.
+    """
+    delta = end - start
+    if space == 'hsluv':
+        delta = delta.copy()
+        delta[..., 0] = (delta[..., 0] + 180) % 360 - 180
+    coords = start + delta * ratio
+    if space == 'hsluv':
+        coords[..., 0] %= 360
+    return coords
@@ -0,0 +1,163 @@
+"""
+Batch conversion of palette trees between the legacy and ColorTable block
+dialects.
+
+Files are parsed with the same rules as the editor (``formats.loads``) and
+rewritten by a process pool. A manifest in the output directory remembers
+the size, mtime, hash and skipped lines of every converted source, so
+unchanged files are skipped on the next run without being read and their
+warnings still appear in the report.
+
+Files without a single color entry, such as notes saved as ``.txt``, are
+reported as failed and never written.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .formats import atomic_write, dumps, loads
+
+PALETTE_EXTENSIONS = ('.pal', '.pal3', '.txt')
+MANIFEST_NAME = '.colortable-convert.json'
+REPORT_NAME = 'conversion-report.txt'
+
+
+def find_palettes(root, exclude=None):
+    """
+    Yield the paths of palette files below ``root``, relative to it,
+    skipping the ``exclude`` directory.
+    """
+    exclude = os.path.abspath(exclude) if exclude else None
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name for name in dirnames if os.path.abspath(os.path.join(directory, name)) != exclude
+        )
+        for filename in sorted(filenames):
+            if filename.lower().endswith(PALETTE_EXTENSIONS) and filename != REPORT_NAME:
+                yield os.path.relpath(os.path.join(directory, filename), root)
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def convert_file(source, target, dialect, known_digest=None, known_diagnostics=()):
+    """
+    Convert one palette file. Returns a result dictionary with the status
+    ('converted', 'unchanged' or 'failed'), the source digest and stat, and
+    the lines that were skipped while parsing; for unchanged files these are
+    ``known_diagnostics``, from the run that converted them.
+    """
+    try:
+        with open(source, 'rb') as file:
+            data = file.read()
+        digest = file_digest(data)
+        if digest == known_digest and os.path.exists(target):
+            status = 'unchanged'
+            diagnostics = list(known_diagnostics)
+        else:
+            parsed = []
+            table = loads(data.decode('utf-8', errors='replace'), parsed)
+            if not table.valid_stops():
+                reason = f", {len(parsed)} unreadable line(s)" if parsed else ""
+                return {'status': 'failed', 'error': f"Not a palette: no color entries{reason}"}
+            diagnostics = [str(diagnostic) for diagnostic in parsed]
+            output = dumps(table, dialect)
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            atomic_write(target, output)
+            status = 'converted'
+            if os.path.abspath(source) == os.path.abspath(target):
+                digest = file_digest(output.encode('utf-8'))
+        stat = os.stat(source)
+        return {
+            'status': status,
+            'digest': digest,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'diagnostics': diagnostics,
+        }
+    except (OSError, ValueError) as e:
+        return {'status': 'failed', 'error': str(e)}
+
+
+def load_manifest(path, dialect):
+    try:
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    # Entries written for another target dialect are stale
+    if manifest.get('dialect') != dialect:
+        return {}
+    return manifest.get('files', {})
+
+
+def convert_tree(source_root, dialect, output_root=None, workers=None, force=False, in_place=False):
+    """
+    Convert every palette below ``source_root`` to ``dialect`` ('legacy' or
+    'block'), mirroring the tree into ``output_root``. Without an output
+    root the files are rewritten in place, which ``in_place`` must confirm.
+
+    Returns a summary dictionary with counts and per-file failures and
+    warnings; the same summary is written to a report in the output root.
+    """
+    if dialect not in ('legacy', 'block'):
+        raise ValueError(f"Unknown dialect: {dialect}")
+    if output_root is None and not in_place:
+        raise ValueError("Give an output directory, or convert in place explicitly")
+    output_root = output_root or source_root
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    manifest = {} if force else load_manifest(manifest_path, dialect)
+
+    summary = {'converted': 0, 'unchanged': 0, 'failed': {}, 'warnings': {}}
+    jobs = {}
+    exclude = output_root if os.path.abspath(output_root) != os.path.abspath(source_root) else None
+    for relpath in find_palettes(source_root, exclude):
+        source = os.path.join(source_root, relpath)
+        target = os.path.join(output_root, relpath)
+        entry = manifest.get(relpath)
+        stat = os.stat(source)
+        if (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                and os.path.exists(target)):
+            summary['unchanged'] += 1  # Skipped without reading the file
+            if entry.get('diagnostics'):
+                summary['warnings'][relpath] = entry['diagnostics']
+            continue
+        jobs[relpath] = (source, target, dialect, entry['digest'] if entry else None,
+                         entry.get('diagnostics', []) if entry else [])
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {relpath: pool.submit(convert_file, *job) for relpath, job in jobs.items()}
+        for relpath, future in futures.items():
+            result = future.result()
+            if result['status'] == 'failed':
+                summary['failed'][relpath] = result['error']
+                manifest.pop(relpath, None)
+                continue
+            summary[result['status']] += 1
+            if result['diagnostics']:
+                summary['warnings'][relpath] = result['diagnostics']
+            manifest[relpath] = {key: result[key] for key in ('digest', 'size', 'mtime_ns', 'diagnostics')}
+
+    with open(manifest_path, 'w') as file:
+        json.dump({'dialect': dialect, 'files': manifest}, file, indent=1, sort_keys=True)
+    write_report(os.path.join(output_root, REPORT_NAME), summary)
+    return summary
+
+
+def write_report(path, summary):
+    lines = [
+        f"Converted: {summary['converted']}",
+        f"Unchanged: {summary['unchanged']}",
+        f"Failed: {len(summary['failed'])}",
+        "",
+    ]
+    for relpath, error in sorted(summary['failed'].items()):
+        lines.append(f"FAILED {relpath}: {error}")
+    for relpath, diagnostics in sorted(summary['warnings'].items()):
+        for diagnostic in diagnostics:
+            lines.append(f"SKIPPED LINE {relpath} {diagnostic}")
+    with open(path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
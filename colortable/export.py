@@ -0,0 +1,227 @@
+"""
+Export a table for tools that cannot read palette text.
+
+- ``.npy``: the (size, 4) uint8 RGBA lookup table indexed by raw code, with
+  the table's Scale, Offset and RF code applied, as ``colorize`` uses it;
+- ``.png``: an RGBA legend strip across the table's value domain;
+- ``.json``: a pickle-free spec for a matplotlib ``ListedColormap`` and
+  ``BoundaryNorm``;
+- ``.cpt``: a GMT color palette table.
+
+Every exporter reads one ``Sampling`` of the table, colored in a single
+``colorize_values`` pass and memoized by table content like compiled LUTs,
+so writing several formats samples the table once. Gradient bands are split
+into ``steps`` segments with their colors at both ends and at the center,
+so tools that interpolate in sRGB (GMT) or draw one color per bin
+(matplotlib) follow perceptual gradients too; solid and single bands are a
+single segment. Values below the first stop stay transparent and the last
+stop colors everything above the domain, as in the editor preview.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .colorize import PNGStreamWriter, deflate_rows
+from .formats import atomic_write
+from .lut import band_arrays, check_rf_code, colorize_values, lut_size, table_fingerprint, unpack_colors
+from .model import format_value
+
+GRADIENT_STEPS = 32   # Segments per gradient band
+LEGEND_WIDTH = 512    # Samples along a PNG legend
+LEGEND_HEIGHT = 32
+SAMPLING_CACHE_SIZE = 16
+FORMATS = ('.npy', '.png', '.json', '.cpt')
+
+_sampling_cache = OrderedDict()
+_sampling_cache_lock = threading.Lock()
+
+
+class Sampling:
+    """
+    The colors of a table as every exporter needs them:
+
+    - ``edges``: boundaries of the segments across the value domain;
+    - ``low``, ``high``, ``center``: RGBA at the start of each segment, just
+      below its end and at its middle;
+    - ``first``: whether a segment starts a band;
+    - ``over``: RGBA of the last stop, used above the domain;
+    - ``rf``: RGBA of the RF color, or None;
+    - ``lut``: the raw-code lookup table;
+    - ``legend``: RGBA at ``width`` pixel centers across the domain.
+    """
+
+    def __init__(self, table, steps=GRADIENT_STEPS, size=256, rf_code=None, width=LEGEND_WIDTH):
+        check_rf_code(rf_code, size)
+        stop_values, start, end, upper = band_arrays(table)
+        if not len(stop_values):
+            raise ValueError("The table has no color entries to export")
+        # Bands below the last stop; bands between stops sharing a value are empty
+        span = upper[:-1] - stop_values[:-1]
+        gradient = np.any(start[:-1] != end[:-1], axis=1)
+        parts = np.where(span > 0, np.where(gradient, steps, 1), 0)
+        band = np.repeat(np.arange(len(parts)), parts)
+        step = np.arange(len(band)) - (np.cumsum(parts) - parts)[band]
+        lower = stop_values[band] + span[band] * step / np.maximum(parts[band], 1)
+        self.edges = np.append(lower, stop_values[-1]) if len(band) else np.empty(0)
+        self.first = step == 0
+
+        low_value, high_value = stop_values[0], stop_values[-1]
+        legend = low_value + (np.arange(width) + 0.5) / width * (high_value - low_value)
+        codes = np.arange(size, dtype=np.float64) * table.scale_factor + table.offset_value
+        # Everything is colored in one pass, then split
+        groups = (lower, np.nextafter(self.edges[1:], -np.inf), (self.edges[:-1] + self.edges[1:]) / 2,
+                  legend, codes)
+        colors = colorize_values(table, np.concatenate(groups))
+        self.low, self.high, self.center, self.legend, self.lut = np.split(
+            colors, np.cumsum([len(group) for group in groups])[:-1]
+        )
+        self.over = start[-1]
+        self.rf = unpack_colors(table.rf) if table.rf is not None else None
+        if rf_code is not None and self.rf is not None:
+            self.lut[rf_code] = self.rf
+        for array in (self.low, self.high, self.center, self.legend, self.lut):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.edges) - 1 if len(self.edges) else 0
+
+
+def compile_sampling(table, steps=GRADIENT_STEPS, size=256, rf_code=None, width=LEGEND_WIDTH):
+    """
+    Return the Sampling of a table, memoized by table content and the
+    sampling parameters.
+    """
+    key = (table_fingerprint(table), steps, size, rf_code, width)
+    with _sampling_cache_lock:
+        sampling = _sampling_cache.get(key)
+        if sampling is not None:
+            _sampling_cache.move_to_end(key)
+            return sampling
+
+    sampling = Sampling(table, steps, size, rf_code, width)
+    with _sampling_cache_lock:
+        _sampling_cache[key] = sampling
+        while len(_sampling_cache) > SAMPLING_CACHE_SIZE:
+            _sampling_cache.popitem(last=False)
+    return sampling
+
+
+def write_npy(sampling, path):
+    np.save(path, sampling.lut)
+
+
+def write_png(sampling, path, height=LEGEND_HEIGHT, vertical=False, level=6):
+    """
+    Write the legend as a strip ``height`` pixels thick, low values on the
+    left, or at the bottom when ``vertical``.
+    """
+    if vertical:
+        pixels = np.repeat(sampling.legend[::-1, None], height, axis=1)
+    else:
+        pixels = np.repeat(sampling.legend[None], height, axis=0)
+    writer = PNGStreamWriter(path, pixels.shape[1], pixels.shape[0])
+    try:
+        writer.write_band(*deflate_rows(pixels, True, level))
+    finally:
+        writer.close()
+
+
+def _require_segments(sampling):
+    if not len(sampling):
+        raise ValueError("The table needs at least two distinct stop values for this format")
+
+
+def _unit_colors(rgba):
+    return np.round(np.asarray(rgba) / 255.0, 6).tolist()
+
+
+def matplotlib_spec(sampling, table):
+    """
+    Return a JSON-serializable spec with one color per segment:
+
+        cmap = ListedColormap(**spec['colormap']).with_extremes(**spec['extremes'])
+        norm = BoundaryNorm(**spec['norm'])
+    """
+    _require_segments(sampling)
+    return {
+        'colormap': {'colors': _unit_colors(sampling.center), 'name': table.product or 'colortable'},
+        'extremes': {'under': [0.0, 0.0, 0.0, 0.0], 'over': _unit_colors(sampling.over)},
+        'norm': {'boundaries': sampling.edges.tolist(), 'ncolors': len(sampling), 'clip': False},
+        'units': table.units,
+        'rf': _unit_colors(sampling.rf) if sampling.rf is not None else None,
+    }
+
+
+def write_matplotlib(sampling, table, path):
+    atomic_write(path, json.dumps(matplotlib_spec(sampling, table), indent=1) + '\n')
+
+
+def _cpt_color(rgba):
+    r, g, b, a = rgba.tolist()
+    if a == 255:
+        return f"{r}/{g}/{b}"
+    return f"{r}/{g}/{b}@{round((255 - a) / 2.55)}"  # GMT transparency is in percent
+
+
+def dumps_cpt(sampling, table):
+    """
+    Return a GMT .cpt with one linear slice per segment. Gradients of
+    sRGB-interpolated tables are exact in GMT and keep one slice per band.
+    """
+    _require_segments(sampling)
+    edges, low, high = sampling.edges, sampling.low, sampling.high
+    if table.interpolation == 'rgb':
+        starts = np.flatnonzero(sampling.first)
+        ends = np.append(starts[1:], len(sampling)) - 1
+        edges, low, high = np.append(edges[starts], edges[-1]), low[starts], high[ends]
+
+    lines = [f"# {table.product}" + (f" ({table.units})" if table.units else ""), "# COLOR_MODEL = RGB"]
+    for lower, upper, start, end in zip(edges[:-1].tolist(), edges[1:].tolist(), low, high):
+        if start[3] == 0 and end[3] == 0:
+            start_color = end_color = '-'  # Not painted
+        else:
+            start_color, end_color = _cpt_color(start), _cpt_color(end)
+        lines.append(f"{format_value(lower)}\t{start_color}\t{format_value(upper)}\t{end_color}")
+    lines.append("B\t-")
+    lines.append(f"F\t{_cpt_color(sampling.over) if sampling.over[3] else '-'}")
+    lines.append("N\t-")
+    return "\n".join(lines) + "\n"
+
+
+def write_cpt(sampling, table, path):
+    atomic_write(path, dumps_cpt(sampling, table))
+
+
+def export(table, paths, steps=GRADIENT_STEPS, dtype=np.uint8, rf_code=None, width=LEGEND_WIDTH,
+           height=LEGEND_HEIGHT, vertical=False):
+    """
+    Write a table to every path, in the format named by its extension (one
+    of ``FORMATS``), from a single Sampling.
+
+    Parameters:
+    - steps: Segments per gradient band in .json and .cpt files.
+    - dtype: Raw code type the .npy LUT is indexed by, uint8 or uint16.
+    - rf_code: Raw code drawn in the table's RF color in the .npy LUT.
+    - width, height, vertical: Size and orientation of .png legends.
+    """
+    if steps < 1 or width < 1 or height < 1:
+        raise ValueError("Steps, width and height must be at least 1")
+    formats = [os.path.splitext(path)[1].lower() for path in paths]
+    for path, ext in zip(paths, formats):
+        if ext not in FORMATS:
+            raise ValueError(f"Cannot export {path}: the extension must be one of {', '.join(FORMATS)}")
+
+    sampling = compile_sampling(table, steps, lut_size(dtype), rf_code, width)
+    for path, ext in zip(paths, formats):
+        if ext == '.npy':
+            write_npy(sampling, path)
+        elif ext == '.png':
+            write_png(sampling, path, height, vertical)
+        elif ext == '.json':
+            write_matplotlib(sampling, table, path)
+        else:
+            write_cpt(sampling, table, path)
+    return sampling
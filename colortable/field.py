@@ -0,0 +1,197 @@
+"""
+Screen-resolution previews of large sample fields.
+
+A field is a 2-D grid opened with ``colorize.open_grid``: raw uint8/uint16
+codes, colored with the table's Scale and Offset through the compiled LUT,
+or floating point data values. The field is reduced once into a pyramid of
+levels, each taking every other row and column of the one below.
+Decimating rather than averaging keeps raw codes intact, so RF and no-data
+codes keep their own colors at every level. A view is sampled from the
+coarsest level that still has at least one cell per screen pixel, so the
+cost of a frame depends on the size of the screen, not of the field.
+
+``RenderWorker`` runs renders in a background thread and keeps only the
+newest pending request, so a burst of pan or edit events costs one render.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .colorize import colorize_grid
+from .lut import lut_size
+
+MIN_LEVEL_SIZE = 256   # Longest side of the coarsest pyramid level
+MAX_SCALE_STEPS = 40   # Zoom limit, in factors of two either way of 1 cell per pixel
+
+
+class View(namedtuple('View', 'left top scale')):
+    """
+    The grid position (column, row) shown at the top left screen pixel and
+    the number of grid cells per screen pixel.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fit(cls, shape, width, height):
+        """
+        Return the view that shows a whole grid of ``shape``, centered.
+        """
+        rows, cols = shape
+        scale = max(rows / max(height, 1), cols / max(width, 1))
+        return cls((cols - width * scale) / 2, (rows - height * scale) / 2, scale)
+
+    def pan(self, dx, dy):
+        """
+        Move the view by a number of screen pixels.
+        """
+        return View(self.left - dx * self.scale, self.top - dy * self.scale, self.scale)
+
+    def zoom(self, factor, x, y):
+        """
+        Zoom by ``factor`` (above 1 zooms in) keeping the grid position
+        under screen pixel (x, y) in place.
+        """
+        scale = min(max(self.scale / factor, 2.0 ** -MAX_SCALE_STEPS), 2.0 ** MAX_SCALE_STEPS)
+        return View(self.left + x * (self.scale - scale), self.top + y * (self.scale - scale), scale)
+
+
+class FieldPyramid:
+    """
+    A grid and its decimated levels; level ``k`` holds every ``2 ** k``-th
+    row and column of the grid.
+    """
+
+    def __init__(self, grid):
+        self.levels = [grid]
+        while max(self.levels[-1].shape) > MIN_LEVEL_SIZE:
+            self.levels.append(np.ascontiguousarray(self.levels[-1][::2, ::2]))
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    @property
+    def dtype(self):
+        return self.levels[0].dtype
+
+    def level_for(self, scale):
+        """
+        Return the coarsest level with at least one cell per screen pixel
+        at ``scale`` grid cells per pixel.
+        """
+        if scale <= 1:
+            return 0
+        return min(int(np.log2(scale)), len(self.levels) - 1)
+
+    def sample(self, view, width, height):
+        """
+        Return the (height, width) cells under each screen pixel of a view,
+        a mask of the pixels that fall inside the grid, and the level used.
+        """
+        level = self.level_for(view.scale)
+        grid = self.levels[level]
+        factor = 2 ** level
+        rows = np.floor((view.top + (np.arange(height) + 0.5) * view.scale) / factor).astype(np.int64)
+        cols = np.floor((view.left + (np.arange(width) + 0.5) * view.scale) / factor).astype(np.int64)
+        row_inside = (rows >= 0) & (rows < grid.shape[0])
+        col_inside = (cols >= 0) & (cols < grid.shape[1])
+        cells = grid[np.ix_(np.clip(rows, 0, grid.shape[0] - 1), np.clip(cols, 0, grid.shape[1] - 1))]
+        return cells, row_inside[:, None] & col_inside[None, :], level
+
+
+def composite(rgba, inside, background=(0, 0, 0)):
+    """
+    Blend RGBA pixels over a background color, returning uint8 RGB. Pixels
+    outside the grid get the background.
+    """
+    alpha = rgba[..., 3:4].astype(np.uint16) * inside[..., None]
+    background = np.array(background, dtype=np.uint16)
+    rgb = (rgba[..., :3] * alpha + background * (255 - alpha) + 127) // 255
+    return rgb.astype(np.uint8)
+
+
+def render(pyramid, table, view, width, height, rf_code=None, background=(0, 0, 0)):
+    """
+    Render a view of a field colored with a table as (height, width, 3)
+    uint8 RGB. Returns the pixels and the pyramid level used.
+    """
+    cells, inside, level = pyramid.sample(view, width, height)
+    rgba = colorize_grid(table, cells, rf_code)
+    return composite(rgba, inside, background), level
+
+
+Frame = namedtuple('Frame', 'pixels view level seconds')
+
+
+class RenderWorker:
+    """
+    Run ``function(*args)`` for the newest submitted arguments in a
+    background thread. ``take()`` returns the newest finished result as
+    ``(value, exception)``, or None when nothing finished since the last
+    call; it never blocks, so a UI can poll it from a timer.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self._condition = threading.Condition()
+        self._pending = None
+        self._result = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='colortable-render', daemon=True)
+        self._thread.start()
+
+    def submit(self, *args):
+        with self._condition:
+            self._pending = args  # Replaces a request that has not started yet
+            self._condition.notify()
+
+    def take(self):
+        with self._condition:
+            result, self._result = self._result, None
+        return result
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                args, self._pending = self._pending, None
+            try:
+                result = (self.function(*args), None)
+            except Exception as e:
+                result = (None, e)
+            with self._condition:
+                self._result = result
+
+
+class FieldRenderer:
+    """
+    Render frames of one field. The pyramid is built on the first render,
+    inside the worker thread that calls ``frame``.
+    """
+
+    def __init__(self, grid, rf_code=None, background=(0, 0, 0)):
+        if grid.dtype.kind == 'u':
+            lut_size(grid.dtype)  # Raises for codes wider than 16 bits
+        elif grid.dtype.kind != 'f':
+            raise ValueError(f"Unsupported grid dtype: {grid.dtype}")
+        self.grid = grid
+        self.rf_code = rf_code
+        self.background = background
+        self.pyramid = None
+
+    def frame(self, table, view, width, height):
+        start = time.perf_counter()
+        if self.pyramid is None:
+            self.pyramid = FieldPyramid(self.grid)
+        pixels, level = render(self.pyramid, table, view, width, height, self.rf_code, self.background)
+        return Frame(pixels, view, level, time.perf_counter() - start)
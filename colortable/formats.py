@@ -0,0 +1,552 @@
+import itertools
+import logging
+import os
+import re
+from collections import namedtuple
+
+from .model import INTERPOLATIONS, ColorStop, ColorTable, format_value, pack_rgba, rgb_to_hex, unpack_rgba
+
+log = logging.getLogger(__name__)
+
+# Patterns are compiled once here rather than on every stop
+RE_COLOR_KEY = re.compile(r'color\[(.*?)\]$', re.IGNORECASE)
+RE_RGB = re.compile(r'rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)$', re.IGNORECASE)
+RE_SPACE_COLOR = re.compile(r'(hsluv|oklab|lab)\(\s*([^()]*?)\s*\)$', re.IGNORECASE)
+RE_SOLID = re.compile(r'solid\(\s*(.*?)\s*\)$', re.IGNORECASE)
+RE_GRADIENT = re.compile(r'gradient\(\s*(.*?\))\s*,\s*(.*?)\s*\)$', re.IGNORECASE)
+
+SETTING_KEYS = ('product', 'units', 'scale', 'offset', 'step')
+LEGACY_STOP_KEYS = ('solidcolor', 'solidcolor4', 'color', 'color4')
+COLOR_FUNCTIONS = ('rgb(', 'hsluv(', 'lab(', 'oklab(')
+PROGRESS_LINES = 4096  # Lines parsed between progress reports
+
+# Records yielded by iter_records, each with the line number it came from
+Setting = namedtuple('Setting', 'line name value')
+StopRecord = namedtuple('StopRecord', 'line stop')
+RFRecord = namedtuple('RFRecord', 'line color')
+DialectRecord = namedtuple('DialectRecord', 'line dialect')
+
+
+class Diagnostic(namedtuple('Diagnostic', 'line message text')):
+    """
+    A rejected line: its 1-based line number, the reason and the line text.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return f"line {self.line}: {self.message} ({self.text})"
+
+
+class ParseError(ValueError):
+    """
+    Raised when a file cannot be parsed at all, e.g. an unterminated
+    ColorTable block.
+    """
+
+    def __init__(self, message, line=None):
+        super().__init__(f"line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+def clean_line(line):
+    """
+    Remove any content following a ';' and trim whitespace.
+    """
+    line = line.strip()
+    if ';' in line:
+        line = line.split(';', 1)[0].strip()
+    return line
+
+
+def iter_lines(lines):
+    """
+    Yield (line number, cleaned line) for the meaningful lines of a file,
+    skipping comments and empty lines.
+    """
+    for lineno, line in enumerate(lines, 1):
+        line = clean_line(line)
+        if not line:
+            continue  # Skip empty lines
+        # Skip lines that start with other comment indicators
+        if line.startswith(('#', '//')):
+            continue
+        yield lineno, line
+
+
+def parse_rf(rest):
+    """
+    Parse an 'R G B' RF definition into a packed color.
+    """
+    rgb = rest.split()
+    if len(rgb) != 3:
+        raise ValueError(f"Invalid RF format: {rest}")
+    r, g, b = map(int, rgb)
+    return pack_rgba(r, g, b)
+
+
+def parse_interpolation(rest):
+    """
+    Parse an Interpolation setting: 'rgb', 'lab', 'oklab' or 'hsluv'.
+    """
+    interpolation = rest.strip().lower()
+    if interpolation not in INTERPOLATIONS:
+        raise ValueError(f"Unknown interpolation: {rest}")
+    return interpolation
+
+
+def parse_rgb(color_str):
+    """
+    Parse an 'rgb(r, g, b[, a])', 'hsluv(h, s, l[, a])', 'lab(L, a, b[, a])'
+    or 'oklab(L, a, b[, a])' color into a packed color and whether it had an
+    alpha component. HSLuv, CIELAB and OKLab colors are converted to the
+    nearest sRGB color.
+    """
+    color_str = color_str.strip()
+    match = RE_RGB.match(color_str)
+    if match:
+        r, g, b, a = match.groups()
+        return pack_rgba(int(r), int(g), int(b), int(a) if a is not None else 255), a is not None
+    match = RE_SPACE_COLOR.match(color_str)
+    if match:
+        parts = match.group(2).split(',')
+        try:
+            if len(parts) not in (3, 4):
+                raise ValueError
+            coords = [float(part) for part in parts[:3]]
+            alpha = int(parts[3]) if len(parts) == 4 else 255
+        except ValueError:
+            raise ValueError(f"Invalid {match.group(1)} color: {color_str}") from None
+        from .colorspace import from_space  # NumPy is only needed for these colors
+        r, g, b = (int(c) for c in from_space(coords, match.group(1).lower()))
+        return pack_rgba(r, g, b, alpha), len(parts) == 4
+    raise ValueError(f"Unknown color format: {color_str}")
+
+
+def parse_single_color(color_str):
+    """
+    Parse an 'rgb(...)' or other ``parse_rgb`` color into a '#rrggbb' string
+    and an alpha, which is None when the color has no alpha component.
+    """
+    color, has_alpha = parse_rgb(color_str)
+    r, g, b, a = unpack_rgba(color)
+    return rgb_to_hex(r, g, b), a if has_alpha else None
+
+
+def parse_band(rest):
+    """
+    Parse the right-hand side of a ``color[value] = ...`` line into
+    (type, format, start, end) with packed colors. Raises ValueError for
+    malformed definitions.
+    """
+    rest = rest.strip()
+    lowered = rest.lower()
+    # Handle different color band definitions
+    if lowered.startswith(COLOR_FUNCTIONS):
+        # SingleColor
+        start, has_alpha = parse_rgb(rest)
+        return 'single', 'rgba' if has_alpha else 'rgb', start, None
+    if lowered.startswith('solid('):
+        # Solid color band
+        match = RE_SOLID.match(rest)
+        if match:
+            start, has_alpha = parse_rgb(match.group(1))
+            return 'solid', 'rgba' if has_alpha else 'rgb', start, None
+    elif lowered.startswith('gradient('):
+        # Gradient color band
+        match = RE_GRADIENT.match(rest)
+        if match:
+            start, start_alpha = parse_rgb(match.group(1))
+            end, end_alpha = parse_rgb(match.group(2))
+            return 'gradient', 'rgba' if start_alpha or end_alpha else 'rgb', start, end
+    raise ValueError(f"Unknown color band definition: {rest}")
+
+
+def parse_color_band(rest):
+    """
+    Parse the right-hand side of a ``color[value] = ...`` line into a
+    ``color_info`` style band dictionary.
+    """
+    return ColorStop(None, *parse_band(rest)).to_band()
+
+
+def parse_legacy_stop(key, rest):
+    """
+    Parse the body of a SolidColor, SolidColor4, Color or Color4 line.
+    Raises ValueError for malformed lines.
+    """
+    parts = rest.split()
+    if not parts:
+        raise ValueError("Missing value")
+    value = float(parts[0])
+
+    if key == 'solidcolor':
+        # SolidColor: value R G B
+        if len(parts) != 4:
+            raise ValueError(f"Invalid SolidColor format: {rest}")
+        return ColorStop(value, 'solid', 'rgb', pack_rgba(*map(int, parts[1:4])))
+    if key == 'solidcolor4':
+        # SolidColor4: value R G B A
+        if len(parts) != 5:
+            raise ValueError(f"Invalid SolidColor4 format: {rest}")
+        return ColorStop(value, 'solid', 'rgba', pack_rgba(*map(int, parts[1:5])))
+
+    if len(parts) == 7:
+        # Gradient without alpha values: value R G B R G B
+        start = pack_rgba(*map(int, parts[1:4]))
+        end = pack_rgba(*map(int, parts[4:7]))
+    elif len(parts) == 9 and key == 'color4':
+        # Gradient with alpha values: value R G B A R G B A
+        start = pack_rgba(*map(int, parts[1:5]))
+        end = pack_rgba(*map(int, parts[5:9]))
+    elif len(parts) == 4:
+        # Single color without alpha
+        start = pack_rgba(*map(int, parts[1:4]))
+        end = None
+    elif len(parts) == 5 and key == 'color4':
+        # Single color with alpha
+        start = pack_rgba(*map(int, parts[1:5]))
+        end = None
+    else:
+        raise ValueError(f"Invalid {'Color4' if key == 'color4' else 'Color'} format: {rest}")
+
+    translucent = (start & 0xFF) != 255 or (end is not None and (end & 0xFF) != 255)
+    return ColorStop(value, 'gradient' if end is not None else 'single',
+                     'rgba' if translucent else 'rgb', start, end)
+
+
+def _block_line(lineno, line):
+    """
+    Turn one line inside a ColorTable block into a record.
+    """
+    key, sep, rest = line.partition('=')
+    if not sep:
+        return Diagnostic(lineno, "Expected 'key = value'", line)
+    key = key.strip().lower()
+    rest = rest.strip()
+    if len(rest) >= 2 and rest[0] == rest[-1] == '"':
+        rest = rest[1:-1].replace('\\"', '"')  # Quoted, as dumps_block writes it
+    else:
+        rest = rest.strip('"').strip("'")
+    try:
+        if key == 'category':
+            return Setting(lineno, 'product', rest)
+        if key in SETTING_KEYS:
+            return Setting(lineno, key, rest)
+        if key == 'interpolation':
+            return Setting(lineno, key, parse_interpolation(rest))
+        if key.startswith('color['):
+            # Extract the value inside the brackets
+            match = RE_COLOR_KEY.match(key)
+            if not match:
+                raise ValueError("Malformed color key")
+            return StopRecord(lineno, ColorStop(float(match.group(1)), *parse_band(rest)))
+        if key == 'rf':
+            return RFRecord(lineno, parse_rf(rest))
+    except ValueError as e:
+        return Diagnostic(lineno, str(e), line)
+    # Additional keys like Decimals, ND, Label can be handled here if needed
+    return None
+
+
+def _block_records(lines):
+    state = 'keyword'  # Then 'open' (waiting for '{'), 'body' and 'closed'
+    lineno = None
+    for lineno, line in lines:
+        if state == 'keyword':
+            index = line.lower().find('colortable')
+            if index < 0:
+                raise ParseError("Invalid ColorTable block.", lineno)
+            line = line[index + len('colortable'):].strip()
+            state = 'open'
+        if state == 'open':
+            if not line:
+                continue
+            if not line.startswith('{'):
+                raise ParseError("Invalid ColorTable block: expected '{'", lineno)
+            line = line[1:].strip()
+            state = 'body'
+        if state == 'body':
+            if '}' in line:
+                line, _, after = line.partition('}')
+                line = line.strip()
+                state = 'closed'
+                if after.strip():
+                    yield Diagnostic(lineno, "Text after the end of the ColorTable block", after.strip())
+            if line:
+                record = _block_line(lineno, line)
+                if record is not None:
+                    yield record
+        elif state == 'closed' and line:
+            yield Diagnostic(lineno, "Text after the end of the ColorTable block", line)
+    if state != 'closed':
+        raise ParseError("Invalid ColorTable block: missing '}'", lineno)
+
+
+def _legacy_records(lines):
+    for lineno, line in lines:
+        key, sep, rest = line.partition(':')
+        if not sep:
+            yield Diagnostic(lineno, "Expected 'Key: value'", line)
+            continue
+        key = key.strip().lower()
+        rest = rest.strip()
+        try:
+            if key in SETTING_KEYS:
+                yield Setting(lineno, key, rest)
+            elif key == 'interpolation':
+                yield Setting(lineno, key, parse_interpolation(rest))
+            elif key in LEGACY_STOP_KEYS:
+                yield StopRecord(lineno, parse_legacy_stop(key, rest))
+            elif key == 'rf':
+                yield RFRecord(lineno, parse_rf(rest))
+        except ValueError as e:
+            yield Diagnostic(lineno, str(e), line)
+
+
+def detect_dialect(line):
+    return 'block' if 'colortable' in line.lower() else 'legacy'
+
+
+def iter_records(lines, dialect=None):
+    """
+    Parse the raw lines of a color table file in a single pass, yielding
+    a DialectRecord for the first meaningful line, then Setting, StopRecord,
+    RFRecord and Diagnostic records in file order.
+
+    ``lines`` may be any iterable of lines, such as an open file, so large
+    files are never held in memory at once. The dialect is detected from the
+    first meaningful line unless given as 'block' or 'legacy'.
+    """
+    cleaned = iter_lines(lines)
+    first = next(cleaned, None)
+    if first is None:
+        return
+    if dialect is None:
+        dialect = detect_dialect(first[1])
+    yield DialectRecord(first[0], dialect)
+    cleaned = itertools.chain([first], cleaned)
+    if dialect == 'block':
+        yield from _block_records(cleaned)
+    else:
+        yield from _legacy_records(cleaned)
+
+
+def build_table(records, diagnostics=None):
+    """
+    Build a ColorTable from parsed records. Rejected lines are appended to
+    ``diagnostics`` when a list is given, and logged otherwise.
+    """
+    table = ColorTable()
+    stops = []
+    for record in records:
+        kind = type(record)
+        if kind is StopRecord:
+            stops.append(record.stop)
+        elif kind is Setting:
+            setattr(table, record.name, record.value)
+        elif kind is RFRecord:
+            table.rf = record.color
+        elif kind is DialectRecord:
+            table.dialect = record.dialect
+        elif diagnostics is not None:
+            diagnostics.append(record)
+        else:
+            log.warning("%s", record)
+    table.stops = stops
+    table.sort()
+    return table
+
+
+def parse_colortable_block(lines, diagnostics=None):
+    """
+    Parse the lines of a ``ColorTable { ... }`` file into a ColorTable.
+    """
+    return build_table(iter_records(lines, 'block'), diagnostics)
+
+
+def parse_legacy_format(lines, diagnostics=None):
+    """
+    Parse the lines of a legacy ``Product:/SolidColor:/Color4:`` file into
+    a ColorTable.
+    """
+    return build_table(iter_records(lines, 'legacy'), diagnostics)
+
+
+def report_lines(lines, progress):
+    """
+    Yield a list of lines, calling ``progress(done, total)`` with the
+    number of lines handed out every PROGRESS_LINES lines and at the end.
+    """
+    total = len(lines)
+    for start in range(0, total, PROGRESS_LINES):
+        progress(start, total)
+        yield from lines[start:start + PROGRESS_LINES]
+    progress(total, total)
+
+
+def loads(text, diagnostics=None, progress=None):
+    """
+    Parse the text of a color table file in either dialect.
+
+    ``progress(done, total)``, when given, is called as lines are parsed and
+    may raise to abandon the parse.
+    """
+    lines = text.splitlines()
+    if progress is not None:
+        lines = report_lines(lines, progress)
+    return build_table(iter_records(lines), diagnostics)
+
+
+def load(path, diagnostics=None):
+    """
+    Parse a color table file in either dialect, reading it line by line.
+    """
+    with open(path, 'r') as file:
+        return build_table(iter_records(file), diagnostics)
+
+
+def _rgb_str(color, with_alpha):
+    rgba = unpack_rgba(color)
+    return ' '.join(map(str, rgba if with_alpha else rgba[:3]))
+
+
+def _rgb_func(color, with_alpha):
+    return f"rgb({', '.join(map(str, unpack_rgba(color) if with_alpha else unpack_rgba(color)[:3]))})"
+
+
+def dumps_legacy(table):
+    """
+    Serialize a table in the legacy ``Product:/SolidColor:/Color4:`` dialect.
+    """
+    lines = [f"Product: {table.product}", f"Units: {table.units}"]
+    # Scale, Offset and Step are only written when set
+    for label, text in (('Scale', table.scale), ('Offset', table.offset), ('Step', table.step)):
+        if text.strip():
+            lines.append(f"{label}: {text}")
+    # Only written for perceptual interpolation, so plain tables stay compatible
+    if table.interpolation != 'rgb':
+        lines.append(f"Interpolation: {table.interpolation}")
+    lines.append("")
+
+    # Stops are written in descending order of value
+    for stop in reversed(table.valid_stops()):
+        value = stop.value
+        rgba = stop.format == 'rgba'
+        if stop.type == 'solid':
+            if rgba:
+                lines.append(f"SolidColor4: {value} {_rgb_str(stop.start, True)}")
+            else:
+                lines.append(f"SolidColor: {value} {_rgb_str(stop.start, False)}")
+        elif stop.type == 'gradient':
+            if rgba and stop.end is not None:
+                lines.append(f"Color4: {value} {_rgb_str(stop.start, True)} {_rgb_str(stop.end, True)}")
+            else:
+                end = stop.end if stop.end is not None else stop.start
+                lines.append(f"Color: {value} {_rgb_str(stop.start, False)} {_rgb_str(end, False)}")
+        else:
+            lines.append(f"Color{'4' if rgba else ''}: {value} {_rgb_str(stop.start, rgba)}")
+
+    if table.rf is not None:
+        lines.append("")
+        lines.append(f"RF: {_rgb_str(table.rf, False)}")
+    return '\n'.join(lines) + '\n'
+
+
+def dumps_block(table):
+    """
+    Serialize a table as a ``ColorTable { ... }`` block.
+    """
+    lines = ["ColorTable {"]
+    if table.product:
+        product = table.product.replace('"', '\\"')
+        lines.append(f'  Category = "{product}"')
+    for label, text in (('Units', table.units), ('Scale', table.scale),
+                        ('Offset', table.offset), ('Step', table.step)):
+        if text.strip():
+            lines.append(f"  {label} = {text}")
+    if table.interpolation != 'rgb':
+        lines.append(f"  Interpolation = {table.interpolation}")
+    if table.rf is not None:
+        lines.append(f"  RF = {_rgb_str(table.rf, False)}")
+
+    # Stops are written in ascending order of value
+    for stop in table.valid_stops():
+        rgba = stop.format == 'rgba'
+        start = _rgb_func(stop.start, rgba)
+        if stop.type == 'gradient':
+            end = _rgb_func(stop.end if stop.end is not None else stop.start, rgba)
+            band = f"gradient({start}, {end})"
+        elif stop.type == 'solid':
+            band = f"solid({start})"
+        else:
+            band = start
+        lines.append(f"  color[{format_value(stop.value)}] = {band}")
+    lines.append("}")
+    return '\n'.join(lines) + '\n'
+
+
+DIALECTS = {
+    'legacy': dumps_legacy,
+    'block': dumps_block,
+}
+
+
+def dumps(table, dialect=None):
+    """
+    Serialize a table in the 'legacy' or 'block' dialect, by default the
+    one it was read in, or legacy for new tables.
+    """
+    dialect = dialect or table.dialect or 'legacy'
+    try:
+        writer = DIALECTS[dialect]
+    except KeyError:
+        raise ValueError(f"Unknown dialect: {dialect}") from None
+    return writer(table)
+
+
+def dump(table, path, dialect=None):
+    """
+    Write a table to ``path``; see ``dumps`` for the dialect. The file is
+    replaced atomically, so an interrupted save never leaves it truncated.
+    """
+    atomic_write(path, dumps(table, dialect))
+
+
+def _create_temp(path):
+    """
+    Create and open a new temporary file next to ``path``. It is created
+    with mode 0666 so the kernel applies the process umask, as for any new
+    file; mkstemp would create it 0600.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        tmp_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.tmp")
+        try:
+            return os.open(tmp_path, flags, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+def atomic_write(path, text):
+    """
+    Write ``text`` to a temporary file next to ``path`` in one call, then
+    rename it over ``path``. The permissions of an existing file are kept.
+    """
+    fd, tmp_path = _create_temp(path)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass  # A new table keeps the mode it was created with
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,264 @@
+"""
+Delta-based undo/redo history.
+
+Each entry records only what an edit changed: the before and after fields
+of the edited stops, the stops that were added or removed, or the settings
+that changed. Opening a file records the replaced table object itself, so
+no entry ever copies a whole table. The history is capped by the estimated
+memory of its entries and drops the oldest ones first.
+"""
+from collections import deque
+from contextlib import contextmanager
+
+STOP_BYTES = 200   # Rough footprint of one recorded stop or stop state
+ENTRY_BYTES = 100  # Rough footprint of an entry itself
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class Command:
+    """
+    One undoable change, reverted by ``undo()`` and applied again by
+    ``redo()``, which every command defines. ``size`` estimates the memory
+    it keeps alive.
+    """
+    label = ''
+    size = ENTRY_BYTES
+
+
+class StopEdit(Command):
+    """
+    Changed fields of one stop, as ``ColorStop.snapshot()`` tuples.
+    """
+    label = 'Edit Entry'
+
+    def __init__(self, table, stop, before, after):
+        self.table = table
+        self.stop = stop
+        self.before = before
+        self.after = after
+        self.size = ENTRY_BYTES + 2 * STOP_BYTES
+
+    def apply(self, snapshot):
+        value = self.stop.value
+        self.stop.restore(snapshot)
+        if self.stop.value != value:
+            self.table.reposition(self.stop)
+
+    def undo(self):
+        self.apply(self.before)
+
+    def redo(self):
+        self.apply(self.after)
+
+
+class StopsEdit(Command):
+    """
+    Changed fields of many stops at once, e.g. from a bulk transform, as
+    lists of ``ColorStop.snapshot()`` tuples.
+    """
+    label = 'Transform Entries'
+
+    def __init__(self, table, stops, before, after):
+        self.table = table
+        self.stops = list(stops)
+        self.before = before
+        self.after = after
+        self.size = ENTRY_BYTES + 2 * STOP_BYTES * len(self.stops)
+
+    def apply(self, snapshots):
+        for stop, snapshot in zip(self.stops, snapshots):
+            stop.restore(snapshot)
+        self.table.sort()
+
+    def undo(self):
+        self.apply(self.before)
+
+    def redo(self):
+        self.apply(self.after)
+
+
+class AddStops(Command):
+    label = 'Add Entries'
+
+    def __init__(self, table, stops):
+        self.table = table
+        self.stops = list(stops)
+        self.size = ENTRY_BYTES + STOP_BYTES * len(self.stops)
+
+    def undo(self):
+        self.table.remove_many(self.stops)
+
+    def redo(self):
+        with self.table.bulk():
+            for stop in self.stops:
+                self.table.add(stop)
+
+
+class RemoveStops(AddStops):
+    label = 'Remove Entries'
+
+    def undo(self):
+        AddStops.redo(self)
+
+    def redo(self):
+        AddStops.undo(self)
+
+
+class SettingsEdit(Command):
+    """
+    Changed table attributes, such as Product, Step or RF, as dictionaries
+    of attribute name to value.
+    """
+    label = 'Edit Settings'
+
+    def __init__(self, table, before, after):
+        self.table = table
+        self.before = before
+        self.after = after
+
+    def undo(self):
+        for name, value in self.before.items():
+            setattr(self.table, name, value)
+
+    def redo(self):
+        for name, value in self.after.items():
+            setattr(self.table, name, value)
+
+
+class ReplaceTable(Command):
+    """
+    Swap the ``table`` attribute of ``owner``, e.g. when a file is opened.
+    The old table object is kept as is rather than copied.
+
+    ``old_file`` and ``new_file``, when given, are the ``(file_path,
+    disk_state)`` of the owner that go with each table, so undoing an open
+    also points the owner back at the file the old table came from.
+    """
+    label = 'Open'
+
+    def __init__(self, owner, old, new, old_file=None, new_file=None):
+        self.owner = owner
+        self.old = old
+        self.new = new
+        self.old_file = old_file
+        self.new_file = new_file
+        self.size = ENTRY_BYTES + STOP_BYTES * len(old.stops)
+
+    def apply(self, table, file):
+        self.owner.table = table
+        if file is not None:
+            self.owner.file_path, self.owner.disk_state = file
+
+    def undo(self):
+        self.apply(self.old, self.old_file)
+
+    def redo(self):
+        self.apply(self.new, self.new_file)
+
+
+class Compound(Command):
+    """
+    Several commands undone and redone as one entry.
+    """
+
+    def __init__(self, commands, label=''):
+        self.commands = commands
+        self.label = label or (commands[0].label if commands else '')
+        self.size = sum(command.size for command in commands)
+
+    def undo(self):
+        for command in reversed(self.commands):
+            command.undo()
+
+    def redo(self):
+        for command in self.commands:
+            command.redo()
+
+
+class History:
+    """
+    Undo and redo stacks of commands, capped at ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0          # Estimated bytes of both stacks
+        self.applying = False  # Set while undoing or redoing
+        self._group = None
+
+    def record(self, command):
+        """
+        Add a command that has already been applied. Ignored while undoing
+        or redoing, and collected into the open group if there is one.
+        """
+        if self.applying:
+            return
+        if self._group is not None:
+            self._group.append(command)
+            return
+        for undone in self.redo_stack:
+            self.size -= undone.size
+        self.redo_stack.clear()
+        self.undo_stack.append(command)
+        self.size += command.size
+        self.trim()
+
+    @contextmanager
+    def group(self, label=''):
+        """
+        Record every command of the block as a single entry.
+        """
+        if self._group is not None:
+            yield  # Nested groups join the outer one
+            return
+        self._group = []
+        try:
+            yield
+        finally:
+            commands, self._group = self._group, None
+            if commands:
+                self.record(commands[0] if len(commands) == 1 else Compound(commands, label))
+
+    def trim(self):
+        # The newest entry is always kept, however large
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().size
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """
+        Undo the newest entry and return it, or None if there is none.
+        """
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self._apply(command.undo)
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self._apply(command.redo)
+        self.undo_stack.append(command)
+        return command
+
+    def _apply(self, action):
+        self.applying = True
+        try:
+            action()
+        finally:
+            self.applying = False
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
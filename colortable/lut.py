@@ -0,0 +1,238 @@
+"""
+Compile color tables into dense RGBA lookup tables indexed by raw data codes.
+
+A raw code maps to a data value as ``value = code * Scale + Offset`` and the
+value is colored with the same band semantics as the editor preview:
+
+- values below the first stop are transparent;
+- a band covers [its value, next stop's value);
+- 'single' and 'solid' bands use their start color, alpha included;
+- 'gradient' bands interpolate start to end color and alpha linearly across
+  the band, in sRGB or in the perceptual space named by the table's
+  ``interpolation`` (CIELAB, OKLab or HSLuv); alpha is always linear;
+- the last stop colors every value at or above it with its start color.
+
+Colorizing a grid of codes is then a single ``np.take``.
+
+Perceptual interpolation converts each band's two end colors once, then
+interpolates every sample of the band in that space and converts the
+results back to sRGB in a single vectorized pass.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .colorspace import from_space, interpolate, to_space
+
+# Number of compiled LUTs kept in memory
+LUT_CACHE_SIZE = 64
+
+_lut_cache = OrderedDict()
+_lut_cache_lock = threading.Lock()
+
+
+def table_fingerprint(table):
+    """
+    Return a hashable key describing everything that affects the colors of
+    a table: its valid stops, Scale, Offset, RF color and interpolation.
+    """
+    stops = tuple((stop.value, stop.type, stop.start, stop.end) for stop in table.valid_stops())
+    return (table.scale_factor, table.offset_value, table.rf, table.interpolation, stops)
+
+
+def unpack_colors(packed):
+    """
+    Unpack an array of 0xRRGGBBAA integers into an (N, 4) uint8 array.
+    """
+    packed = np.asarray(packed, dtype=np.uint32)
+    shifts = np.array([24, 16, 8, 0], dtype=np.uint32)
+    return ((packed[..., None] >> shifts) & 0xFF).astype(np.uint8)
+
+
+def pack_colors(rgba):
+    """
+    Pack an (N, 4) array of 8-bit RGBA components into a list of
+    0xRRGGBBAA integers, the inverse of ``unpack_colors``.
+    """
+    rgba = np.asarray(rgba, dtype=np.uint32)
+    return ((rgba[..., 0] << 24) | (rgba[..., 1] << 16) | (rgba[..., 2] << 8) | rgba[..., 3]).tolist()
+
+
+def band_arrays(table):
+    """
+    Return the bands of a table as arrays: stop values, start RGBA, end RGBA
+    and the upper bound of each band. Non-gradient bands get end == start
+    so every band can be interpolated the same way.
+    """
+    stops = table.valid_stops()
+    values = np.array([stop.value for stop in stops], dtype=np.float64)
+    start = unpack_colors([stop.start for stop in stops])
+    end = unpack_colors([
+        stop.end if stop.type == 'gradient' and stop.end is not None else stop.start
+        for stop in stops
+    ])
+    # The last band has no upper stop and keeps its start color
+    upper = np.append(values[1:], values[-1:]) if len(values) else values
+    return values, start.reshape(-1, 4), end.reshape(-1, 4), upper
+
+
+def blend(start, end, ratio, space='rgb'):
+    """
+    Interpolate (N, 4) uint8 RGBA start and end colors at (N,) ratios the
+    way gradient bands are: color in ``space``, alpha linearly, truncating
+    sRGB results like the preview's int() conversion.
+    """
+    start_rgba = start.astype(np.float64)
+    end_rgba = end.astype(np.float64)
+    ratio = ratio[:, None]
+    out = (start_rgba + (end_rgba - start_rgba) * ratio).astype(np.uint8)
+    if space != 'rgb':
+        coords = interpolate(to_space(start[:, :3], space), to_space(end[:, :3], space), ratio, space)
+        out[:, :3] = from_space(coords, space)
+    return out
+
+
+def colorize_values(table, values):
+    """
+    Color an array of data values, returning an array of shape
+    ``values.shape + (4,)`` with uint8 RGBA colors.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.zeros(values.shape + (4,), dtype=np.uint8)
+    stop_values, start, end, upper = band_arrays(table)
+    if not len(stop_values):
+        return out
+
+    band = np.searchsorted(stop_values, values, side='right') - 1
+    # NaN and values below the first stop stay transparent
+    inside = (band >= 0) & ~np.isnan(values)
+    band = band[inside]
+    lower = stop_values[band]
+    span = upper[band] - lower
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(span > 0, (values[inside] - lower) / span, 0.0)
+    ratio = np.clip(ratio, 0.0, 1.0)[:, None]
+
+    space = table.interpolation
+    if space == 'rgb':
+        out[inside] = blend(start[band], end[band], ratio[:, 0], space)
+        return out
+
+    colors = start[band]
+    # Only samples of bands whose colors differ need converting
+    gradient = np.any(start != end, axis=1)[band]
+    band, ratio = band[gradient], ratio[gradient]
+    start_alpha = start[band, 3].astype(np.float64)
+    colors[gradient, 3] = (start_alpha + (end[band, 3] - start_alpha) * ratio[:, 0]).astype(np.uint8)
+    # Each band's end colors are converted once, not once per sample
+    start_coords = to_space(start[:, :3], space)
+    end_coords = to_space(end[:, :3], space)
+    coords = interpolate(start_coords[band], end_coords[band], ratio, space)
+    colors[gradient, :3] = from_space(coords, space)
+    out[inside] = colors
+    return out
+
+
+def value_domain(table):
+    """
+    Return the (min, max) stop values of a table, or None without stops.
+    """
+    stops = table.valid_stops()
+    if not stops:
+        return None
+    return stops[0].value, stops[-1].value
+
+
+def sample_domain(table, samples):
+    """
+    Sample a table at ``samples`` evenly spaced pixel centers across its
+    value domain, as the preview bar does. Returns the sampled values and
+    their (samples, 4) uint8 RGBA colors.
+    """
+    domain = value_domain(table)
+    if domain is None:
+        values = np.full(samples, np.nan)
+    else:
+        min_val, max_val = domain
+        values = min_val + (np.arange(samples) + 0.5) / samples * (max_val - min_val)
+    return values, colorize_values(table, values)
+
+
+def lut_size(dtype):
+    """
+    Number of LUT entries needed to index every code of an unsigned integer
+    dtype, e.g. 256 for uint8 and 65536 for uint16.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'u' or dtype.itemsize > 2:
+        raise ValueError(f"Raw codes must be uint8 or uint16, not {dtype}")
+    return 1 << (8 * dtype.itemsize)
+
+
+def check_rf_code(rf_code, size):
+    """
+    Raise ValueError unless ``rf_code`` is None or a code of a LUT of
+    ``size`` entries.
+    """
+    if rf_code is not None and not 0 <= rf_code < size:
+        raise ValueError(f"The RF code must be between 0 and {size - 1}, not {rf_code}")
+
+
+def build_lut(table, size=256, rf_code=None):
+    """
+    Compile a table like ``compile_lut`` but without its memo, for callers
+    that keep compiled LUTs under keys of their own.
+    """
+    check_rf_code(rf_code, size)
+    codes = np.arange(size, dtype=np.float64)
+    lut = colorize_values(table, codes * table.scale_factor + table.offset_value)
+    if rf_code is not None and table.rf is not None:
+        lut[rf_code] = unpack_colors(table.rf)
+    lut.flags.writeable = False
+    return lut
+
+
+def compile_lut(table, size=256, rf_code=None):
+    """
+    Compile a table into a read-only (size, 4) uint8 RGBA lookup table
+    indexed by raw code.
+
+    Parameters:
+    - table: The ColorTable to compile.
+    - size: Number of raw codes, e.g. ``lut_size(np.uint16)``.
+    - rf_code: Raw code that marks range-folded gates and is drawn in the
+      table's RF color, or None.
+
+    Results are memoized by table content, so compiling an unchanged table
+    again only costs building its fingerprint.
+    """
+    check_rf_code(rf_code, size)  # Before a miss can be memoized
+    key = (table_fingerprint(table), size, rf_code)
+    with _lut_cache_lock:
+        lut = _lut_cache.get(key)
+        if lut is not None:
+            _lut_cache.move_to_end(key)
+            return lut
+
+    lut = build_lut(table, size, rf_code)
+    with _lut_cache_lock:
+        _lut_cache[key] = lut
+        while len(_lut_cache) > LUT_CACHE_SIZE:
+            _lut_cache.popitem(last=False)
+    return lut
+
+
+def clear_lut_cache():
+    with _lut_cache_lock:
+        _lut_cache.clear()
+
+
+def colorize(table, codes, rf_code=None, out=None):
+    """
+    Color an array of raw uint8/uint16 codes with a table, returning
+    ``codes.shape + (4,)`` uint8 RGBA.
+    """
+    codes = np.asarray(codes)
+    lut = compile_lut(table, lut_size(codes.dtype), rf_code)
+    return np.take(lut, codes, axis=0, out=out)
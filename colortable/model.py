@@ -0,0 +1,331 @@
+import bisect
+from contextlib import contextmanager
+
+# Colors are stored packed as 0xRRGGBBAA integers so that a table with many
+# thousands of stops costs one small int per color instead of a hex string
+# plus a separate alpha value.
+WHITE = 0xFFFFFFFF
+
+BAND_TYPES = ('single', 'solid', 'gradient')
+COLOR_FORMATS = ('rgb', 'rgba')
+# Color spaces gradient bands can be interpolated in
+INTERPOLATIONS = ('rgb', 'lab', 'oklab', 'hsluv')
+
+
+def pack_rgba(r, g, b, a=255):
+    """
+    Pack 8-bit RGBA components into a single 0xRRGGBBAA integer.
+    """
+    for component in (r, g, b, a):
+        if not 0 <= component <= 255:
+            raise ValueError("RGB values must be between 0 and 255.")
+    return (r << 24) | (g << 16) | (b << 8) | a
+
+
+def unpack_rgba(color):
+    """
+    Split a packed 0xRRGGBBAA integer into an (r, g, b, a) tuple.
+    """
+    return (color >> 24) & 0xFF, (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+
+
+def hex_to_rgb(hex_color, alpha=255):
+    """
+    Convert a '#rrggbb' string into an (r, g, b, alpha) tuple.
+    """
+    hex_color = hex_color.lstrip('#')
+    if len(hex_color) != 6:
+        raise ValueError(f"Invalid hex color: {hex_color}")
+    rgb = tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return rgb + (alpha,)
+
+
+def rgb_to_hex(r, g, b):
+    return "#{:02x}{:02x}{:02x}".format(r, g, b)
+
+
+def pack_hex(hex_color, alpha=255):
+    """
+    Pack a '#rrggbb' string and an alpha value into a 0xRRGGBBAA integer.
+    """
+    return pack_rgba(*hex_to_rgb(hex_color, alpha))
+
+
+def color_hex(color):
+    """
+    Return the '#rrggbb' part of a packed color.
+    """
+    return rgb_to_hex(*unpack_rgba(color)[:3])
+
+
+class ColorStop:
+    """
+    A single color band of a color table, starting at ``value``.
+
+    Attributes:
+    - value: The starting data value of the band, or None while unset.
+    - type: 'single', 'solid' or 'gradient'.
+    - format: 'rgb' or 'rgba'.
+    - start: Packed 0xRRGGBBAA start color.
+    - end: Packed 0xRRGGBBAA end color (gradients only), or None.
+    """
+    __slots__ = ('value', 'type', 'format', 'start', 'end')
+
+    def __init__(self, value=None, type='single', format='rgb', start=WHITE, end=None):
+        self.value = value
+        self.type = type
+        self.format = format
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_band(cls, value, color_band=None):
+        """
+        Build a stop from a value and a ``color_info`` style band dictionary
+        with the keys 'type', 'format', 'start_color', 'end_color',
+        'start_alpha' and 'end_alpha'. Missing keys take the editor defaults.
+        """
+        band = color_band or {}
+        if isinstance(value, str):
+            value = value.strip()
+            try:
+                value = float(value) if value else None
+            except ValueError:
+                value = None
+        elif value is not None:
+            value = float(value)
+        start = pack_hex(band.get('start_color') or '#FFFFFF', band.get('start_alpha', 255))
+        end = None
+        if band.get('end_color'):
+            end = pack_hex(band['end_color'], band.get('end_alpha', 255))
+        return cls(value, band.get('type', 'single'), band.get('format', 'rgb'), start, end)
+
+    def to_band(self):
+        """
+        Return the stop as a ``color_info`` style band dictionary.
+        """
+        return {
+            'type': self.type,
+            'format': self.format,
+            'start_color': self.start_color,
+            'end_color': self.end_color,
+            'start_alpha': self.start_alpha,
+            'end_alpha': self.end_alpha
+        }
+
+    @property
+    def start_color(self):
+        return color_hex(self.start)
+
+    @property
+    def start_alpha(self):
+        return self.start & 0xFF
+
+    @property
+    def end_color(self):
+        return color_hex(self.end) if self.end is not None else None
+
+    @property
+    def end_alpha(self):
+        return self.end & 0xFF if self.end is not None else 255
+
+    def set_start(self, hex_color, alpha=255):
+        self.start = pack_hex(hex_color, alpha)
+
+    def set_end(self, hex_color, alpha=255):
+        self.end = pack_hex(hex_color, alpha)
+
+    def copy(self):
+        return ColorStop(self.value, self.type, self.format, self.start, self.end)
+
+    def snapshot(self):
+        """
+        Return the stop's fields as a tuple, e.g. to undo an edit.
+        """
+        return (self.value, self.type, self.format, self.start, self.end)
+
+    def restore(self, snapshot):
+        self.value, self.type, self.format, self.start, self.end = snapshot
+
+    def __eq__(self, other):
+        if not isinstance(other, ColorStop):
+            return NotImplemented
+        return (self.value, self.type, self.format, self.start, self.end) == \
+            (other.value, other.type, other.format, other.start, other.end)
+
+    __hash__ = None
+
+    def __repr__(self):
+        end = f", end=0x{self.end:08x}" if self.end is not None else ""
+        return f"ColorStop({self.value!r}, {self.type!r}, {self.format!r}, start=0x{self.start:08x}{end})"
+
+
+def format_value(value):
+    """
+    Format a stop value for display, dropping the '.0' of whole numbers.
+    """
+    if value is None:
+        return ''
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
+def stop_sort_key(stop):
+    # Unset values sort to the end, like invalid entries in the editor
+    return stop.value if stop.value is not None else float('inf')
+
+
+class ColorTable:
+    """
+    An in-memory color table: the header settings plus a list of stops kept
+    sorted by value.
+
+    The Scale, Offset and Step settings are kept as the text they were read
+    from so that saving a table reproduces them verbatim; use
+    ``scale_factor``, ``offset_value`` and ``step_value`` for arithmetic.
+    """
+
+    def __init__(self, stops=(), product='', units='', scale='', offset='', step='', rf=None, dialect=None,
+                 interpolation='rgb'):
+        self.stops = sorted(stops, key=stop_sort_key)
+        self.product = product
+        self.units = units
+        self.scale = scale
+        self.offset = offset
+        self.step = step
+        # Packed RF color, or None when the table does not define one
+        self.rf = rf
+        # File dialect the table was read from ('legacy' or 'block'), used
+        # as the default when it is saved again; None for new tables
+        self.dialect = dialect
+        # Color space gradient bands are interpolated in, one of INTERPOLATIONS
+        self.interpolation = interpolation
+        self._bulk_depth = 0
+
+    def __len__(self):
+        return len(self.stops)
+
+    def __iter__(self):
+        return iter(self.stops)
+
+    def __eq__(self, other):
+        if not isinstance(other, ColorTable):
+            return NotImplemented
+        return (self.settings() == other.settings() and self.rf == other.rf
+                and self.interpolation == other.interpolation and self.stops == other.stops)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<ColorTable product={self.product!r} units={self.units!r} stops={len(self.stops)}>"
+
+    def settings(self):
+        return {
+            'product': self.product,
+            'units': self.units,
+            'scale': self.scale,
+            'offset': self.offset,
+            'step': self.step
+        }
+
+    def add(self, stop):
+        """
+        Insert a stop at its sorted position and return it. Inside a
+        ``bulk()`` block the stop is appended and sorted on exit instead.
+        """
+        if self._bulk_depth:
+            self.stops.append(stop)
+        else:
+            bisect.insort(self.stops, stop, key=stop_sort_key)
+        return stop
+
+    def add_band(self, value, color_band=None):
+        return self.add(ColorStop.from_band(value, color_band))
+
+    def index(self, stop, hint=None):
+        """
+        Return the position of ``stop``, checking the ``hint`` position first.
+        """
+        # Identity, not equality: two rows may hold identical stops
+        if hint is not None and 0 <= hint < len(self.stops) and self.stops[hint] is stop:
+            return hint
+        for i, existing in enumerate(self.stops):
+            if existing is stop:
+                return i
+        raise ValueError("stop is not part of this table")
+
+    def remove(self, stop, hint=None):
+        del self.stops[self.index(stop, hint)]
+
+    def remove_many(self, stops):
+        """
+        Remove several stops in one pass over the table.
+        """
+        removed = {id(stop) for stop in stops}
+        self.stops = [stop for stop in self.stops if id(stop) not in removed]
+
+    def reposition(self, stop, hint=None):
+        """
+        Move a stop whose value changed back to its sorted position with a
+        bisect, and return its new index.
+        """
+        del self.stops[self.index(stop, hint)]
+        if self._bulk_depth:
+            self.stops.append(stop)
+            return len(self.stops) - 1
+        index = bisect.bisect_right(self.stops, stop_sort_key(stop), key=stop_sort_key)
+        self.stops.insert(index, stop)
+        return index
+
+    @contextmanager
+    def bulk(self):
+        """
+        Defer sorting while many stops are added; the stops are sorted once
+        when the outermost block exits.
+        """
+        self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                self.sort()
+
+    def sort(self):
+        self.stops.sort(key=stop_sort_key)
+
+    def valid_stops(self):
+        """
+        Return the stops that have a value set, in ascending order.
+        """
+        return [stop for stop in self.stops if stop.value is not None]
+
+    @property
+    def rf_color(self):
+        return color_hex(self.rf) if self.rf is not None else None
+
+    @property
+    def scale_factor(self):
+        return _to_float(self.scale, 1.0) or 1.0
+
+    @property
+    def offset_value(self):
+        return _to_float(self.offset, 0.0)
+
+    @property
+    def step_value(self):
+        step = _to_float(self.step, 0.0)
+        return step if step > 0 else None
+
+    def copy(self):
+        table = ColorTable((), **self.settings(), rf=self.rf, dialect=self.dialect,
+                           interpolation=self.interpolation)
+        table.stops = [stop.copy() for stop in self.stops]
+        return table
+
+
+def _to_float(text, default):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,94 @@
+"""
+Timing spans around the editor's hot paths.
+
+``span('parse')`` measures the enclosed block and remembers its last
+duration, which the editor's performance bar shows. Spans are cheap enough
+to leave on: one ``perf_counter`` call on entry and exit.
+
+Set ``COLORTABLE_PROFILE`` to a file path (or ``1`` for
+``colortable-profile.txt``) to also run every outermost span under cProfile
+and tracemalloc and append both reports to that file.
+"""
+import io
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_REPORT = 'colortable-profile.txt'
+REPORT_FUNCTIONS = 30    # Functions listed per cProfile report
+REPORT_ALLOCATIONS = 10  # Source lines listed per tracemalloc report
+
+
+class Profiler:
+    """
+    Registry of the last duration of every span, with optional per
+    operation cProfile/tracemalloc reports.
+    """
+
+    def __init__(self, report_path=None):
+        self.report_path = report_path
+        self.last = {}        # Span name -> seconds of its last run
+        self.listeners = []   # Called with (name, seconds) when a span ends
+        self.depth = 0
+
+    @contextmanager
+    def span(self, name):
+        outermost = self.depth == 0
+        profile = None
+        if outermost and self.report_path:
+            import cProfile  # Only needed when reports are enabled
+            profile = cProfile.Profile()
+            tracemalloc.start()
+            profile.enable()
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.depth -= 1
+            if profile is not None:
+                profile.disable()
+                self.write_report(name, seconds, profile)
+            self.record(name, seconds)
+
+    def record(self, name, seconds):
+        """
+        Record the duration of work timed elsewhere, e.g. in a worker thread;
+        call it from the thread that owns the listeners.
+        """
+        self.last[name] = seconds
+        for listener in self.listeners:
+            listener(name, seconds)
+
+    def write_report(self, name, seconds, profile):
+        import pstats
+
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stream = io.StringIO()
+        stream.write(f"==== {name}: {seconds * 1000:.1f} ms at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+        stream.write(f"tracemalloc: peak {peak / 1024:.1f} KiB; largest live allocations:\n")
+        for stat in snapshot.statistics('lineno')[:REPORT_ALLOCATIONS]:
+            stream.write(f"  {stat}\n")
+        stream.write("\n")
+        try:
+            with open(self.report_path, 'a') as file:
+                file.write(stream.getvalue())
+        except OSError:
+            self.report_path = None  # Stop profiling rather than fail every operation
+
+
+def _report_path():
+    path = os.environ.get('COLORTABLE_PROFILE', '')
+    if path.lower() in ('', '0', 'false', 'no', 'off'):
+        return None
+    return DEFAULT_REPORT if path.lower() in ('1', 'true', 'yes', 'on') else path
+
+
+profiler = Profiler(_report_path())
+span = profiler.span
@@ -0,0 +1,228 @@
+"""
+Small-region screen capture for the color picker.
+
+``PIL.ImageGrab.grab(bbox=...)`` copies the whole desktop on Windows and
+X11 and crops afterwards, which is slow on large multi-monitor setups. The
+grabbers here copy only the requested rectangle:
+
+- Windows: GDI ``BitBlt`` from the virtual screen;
+- X11: ``XGetImage`` on the root window;
+- anything else (macOS, Wayland): ``ImageGrab.grab(bbox=...)``.
+
+Coordinates are virtual desktop coordinates, the same ones the mouse
+listener reports, so monitors left of or above the primary one work. On
+Windows they are physical pixels once ``set_dpi_aware`` has run.
+"""
+import ctypes
+import sys
+
+
+def average_color(image, size):
+    """
+    Return the mean (r, g, b) of the ``size`` x ``size`` square at the
+    center of ``image``.
+    """
+    from PIL import ImageStat
+
+    size = max(1, min(size, image.width, image.height))
+    left = (image.width - size) // 2
+    top = (image.height - size) // 2
+    mean = ImageStat.Stat(image.convert('RGB').crop((left, top, left + size, top + size))).mean
+    return tuple(int(round(channel)) for channel in mean[:3])
+
+
+class ScreenGrabber:
+    """
+    Fallback grabber using Pillow.
+    """
+
+    def __init__(self):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+
+    def bounds(self):
+        """
+        Return the (left, top, right, bottom) of the virtual desktop, or
+        None when it is not known.
+        """
+        return None
+
+    def grab(self, left, top, width, height):
+        """
+        Return an RGB image of the given screen rectangle. Parts outside
+        the desktop are black.
+        """
+        return self._grab(bbox=(left, top, left + width, top + height), all_screens=True).convert('RGB')
+
+    def close(self):
+        pass
+
+
+class _Win32Grabber(ScreenGrabber):
+    SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
+    SRCCOPY, CAPTUREBLT = 0x00CC0020, 0x40000000
+
+    class BITMAPINFOHEADER(ctypes.Structure):
+        _fields_ = [
+            ('biSize', ctypes.c_uint32), ('biWidth', ctypes.c_int32), ('biHeight', ctypes.c_int32),
+            ('biPlanes', ctypes.c_uint16), ('biBitCount', ctypes.c_uint16), ('biCompression', ctypes.c_uint32),
+            ('biSizeImage', ctypes.c_uint32), ('biXPelsPerMeter', ctypes.c_int32),
+            ('biYPelsPerMeter', ctypes.c_int32), ('biClrUsed', ctypes.c_uint32), ('biClrImportant', ctypes.c_uint32),
+        ]
+
+    def __init__(self):
+        from ctypes import wintypes
+        from PIL import Image
+        self._image = Image
+        self.user32 = ctypes.WinDLL('user32')
+        self.gdi32 = ctypes.WinDLL('gdi32')
+        # Handles are pointer sized; the default int restype would truncate them
+        self.user32.GetDC.restype = wintypes.HDC
+        self.user32.GetDC.argtypes = [wintypes.HWND]
+        self.user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+        self.gdi32.CreateCompatibleDC.restype = wintypes.HDC
+        self.gdi32.CreateCompatibleDC.argtypes = [wintypes.HDC]
+        self.gdi32.CreateCompatibleBitmap.restype = wintypes.HBITMAP
+        self.gdi32.CreateCompatibleBitmap.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int]
+        self.gdi32.SelectObject.restype = wintypes.HGDIOBJ
+        self.gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+        self.gdi32.BitBlt.argtypes = [wintypes.HDC] + [ctypes.c_int] * 4 + [wintypes.HDC] + [ctypes.c_int] * 2 + [wintypes.DWORD]
+        self.gdi32.GetDIBits.argtypes = [
+            wintypes.HDC, wintypes.HBITMAP, wintypes.UINT, wintypes.UINT, ctypes.c_void_p, ctypes.c_void_p, wintypes.UINT
+        ]
+        self.gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+        self.gdi32.DeleteDC.argtypes = [wintypes.HDC]
+
+    def bounds(self):
+        metric = self.user32.GetSystemMetrics
+        left, top = metric(self.SM_XVIRTUALSCREEN), metric(self.SM_YVIRTUALSCREEN)
+        return left, top, left + metric(self.SM_CXVIRTUALSCREEN), top + metric(self.SM_CYVIRTUALSCREEN)
+
+    def grab(self, left, top, width, height):
+        screen_dc = self.user32.GetDC(None)  # The whole virtual screen
+        memory_dc = self.gdi32.CreateCompatibleDC(screen_dc)
+        bitmap = self.gdi32.CreateCompatibleBitmap(screen_dc, width, height)
+        previous = self.gdi32.SelectObject(memory_dc, bitmap)
+        try:
+            if not self.gdi32.BitBlt(memory_dc, 0, 0, width, height, screen_dc, left, top,
+                                     self.SRCCOPY | self.CAPTUREBLT):
+                raise OSError("BitBlt failed")
+            # Negative height: top-down rows of 32-bit BGRX pixels
+            header = self.BITMAPINFOHEADER(biSize=ctypes.sizeof(self.BITMAPINFOHEADER), biWidth=width,
+                                           biHeight=-height, biPlanes=1, biBitCount=32)
+            pixels = ctypes.create_string_buffer(width * height * 4)
+            if self.gdi32.GetDIBits(memory_dc, bitmap, 0, height, pixels, ctypes.byref(header), 0) != height:
+                raise OSError("GetDIBits failed")
+        finally:
+            self.gdi32.SelectObject(memory_dc, previous)
+            self.gdi32.DeleteObject(bitmap)
+            self.gdi32.DeleteDC(memory_dc)
+            self.user32.ReleaseDC(None, screen_dc)
+        return self._image.frombuffer('RGB', (width, height), pixels.raw, 'raw', 'BGRX', 0, 1)
+
+
+class _X11Grabber(ScreenGrabber):
+    Z_PIXMAP = 2
+    ALL_PLANES = 0xFFFFFFFF
+
+    class XImage(ctypes.Structure):
+        _fields_ = [
+            ('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int), ('format', ctypes.c_int),
+            ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int), ('bitmap_unit', ctypes.c_int),
+            ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int), ('depth', ctypes.c_int),
+            ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+            ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong),
+        ]
+
+    def __init__(self):
+        import ctypes.util
+        from PIL import Image
+        self._image = Image
+        path = ctypes.util.find_library('X11')
+        if not path:
+            raise OSError("libX11 not found")
+        self.xlib = ctypes.cdll.LoadLibrary(path)
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self.xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.xlib.XGetImage.restype = ctypes.POINTER(self.XImage)
+        self.xlib.XGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+            ctypes.c_ulong, ctypes.c_int
+        ]
+        self.xlib.XDestroyImage.argtypes = [ctypes.POINTER(self.XImage)]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("Cannot open the X display")
+        self.root = self.xlib.XDefaultRootWindow(self.display)
+        screen = self.xlib.XDefaultScreen(self.display)
+        # The root window spans every monitor
+        self.size = self.xlib.XDisplayWidth(self.display, screen), self.xlib.XDisplayHeight(self.display, screen)
+
+    def bounds(self):
+        return (0, 0) + self.size
+
+    def grab(self, left, top, width, height):
+        # XGetImage fails outside the root window, so grab the visible part
+        # and paste it onto a black canvas
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, self.size[0]), min(top + height, self.size[1])
+        canvas = self._image.new('RGB', (width, height))
+        if x1 <= x0 or y1 <= y0:
+            return canvas
+        ximage = self.xlib.XGetImage(self.display, self.root, x0, y0, x1 - x0, y1 - y0,
+                                     self.ALL_PLANES, self.Z_PIXMAP)
+        if not ximage:
+            raise OSError("XGetImage failed")
+        try:
+            info = ximage.contents
+            if info.bits_per_pixel != 32:
+                raise OSError(f"Unsupported X visual ({info.bits_per_pixel} bits per pixel)")
+            data = ctypes.string_at(info.data, info.bytes_per_line * info.height)
+            part = self._image.frombuffer('RGB', (info.width, info.height), data, 'raw', 'BGRX',
+                                          info.bytes_per_line, 1)
+        finally:
+            self.xlib.XDestroyImage(ximage)
+        canvas.paste(part, (x0 - left, y0 - top))
+        return canvas
+
+    def close(self):
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+def set_dpi_aware():
+    """
+    Make the process DPI aware on Windows, so screen and mouse coordinates
+    are physical pixels on scaled displays. Call it once at startup, before
+    Tk creates a window: changing it later rescales windows that already
+    exist. Does nothing on other platforms.
+    """
+    if sys.platform == 'win32':
+        try:
+            ctypes.WinDLL('user32').SetProcessDPIAware()
+        except (OSError, AttributeError):
+            pass
+
+
+def open_grabber():
+    """
+    Return the fastest grabber available on this platform.
+    """
+    backends = []
+    if sys.platform == 'win32':
+        backends.append(_Win32Grabber)
+    elif sys.platform != 'darwin':
+        backends.append(_X11Grabber)
+    for backend in backends:
+        try:
+            return backend()
+        except (OSError, AttributeError):
+            continue  # e.g. a Wayland session without Xwayland
+    return ScreenGrabber()
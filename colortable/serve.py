@@ -0,0 +1,514 @@
+"""
+Local colorization service for processes that share palettes.
+
+A small asyncio HTTP/1.1 server, on a loopback TCP port or a Unix socket,
+colors binary arrays with color tables found below a root directory:
+
+    POST /colorize?table=reflectivity.pal&dtype=uint16&rf_code=1
+        body: the raw array bytes; response: RGBA bytes, 4 per element
+    GET /metrics
+        latency, throughput, batching and table cache counters as JSON
+
+uint8/uint16 arrays are raw codes colored through the compiled LUT, with
+the table's Scale, Offset and RF code, as ``colorize`` does; float arrays
+hold data values. Tables are parsed with ``formats.loads``, so both
+dialects work, and kept compiled in an LRU keyed by the SHA-256 of the
+file. A file is only hashed again when its size or mtime changes, so an
+edited palette is picked up on the next request.
+
+Requests that arrive within ``batch_window`` seconds of each other are
+colored together: requests for the same table, dtype and RF code share one
+table lookup and one ``np.take`` in a worker thread, so many small
+requests cost little more than one large one.
+
+The service never listens beyond the loopback interface.
+"""
+import asyncio
+import hashlib
+import http.client
+import ipaddress
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, quote, urlsplit
+
+import numpy as np
+
+from .formats import loads
+from .lut import build_lut, colorize_values, lut_size
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+TABLE_CACHE_SIZE = 64             # Compiled tables kept in memory
+BATCH_WINDOW = 0.002              # Seconds a batch waits for more requests
+MAX_BATCH_PIXELS = 1 << 22        # Elements after which a batch is closed early
+MAX_BODY_BYTES = 256 * 1024 * 1024
+LATENCY_WINDOW = 1024             # Recent requests the latency figures cover
+
+REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+Request = namedtuple('Request', 'method path query headers body')
+Pending = namedtuple('Pending', 'path rf_code values future')
+
+
+class ServiceError(Exception):
+    """
+    A request the service rejected, with the HTTP status it answered with.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def check_loopback(host):
+    if host == 'localhost':
+        return
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"The service only listens on localhost, not {host}")
+
+
+class CompiledTable:
+    """
+    A parsed table and the LUTs compiled from it, per size and RF code.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.luts = {}
+
+    def lut(self, size, rf_code):
+        key = (size, rf_code)
+        lut = self.luts.get(key)
+        if lut is None:
+            lut = self.luts[key] = build_lut(self.table, size, rf_code)
+        return lut
+
+
+class TableLRU:
+    """
+    Compiled tables keyed by the SHA-256 of their file, least recently used
+    first out. Files whose size and mtime are unchanged are not re-hashed;
+    the digests of files are only remembered while their table is cached.
+    """
+
+    def __init__(self, max_entries=TABLE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Digest -> CompiledTable
+        self.digests = {}             # Path -> (size, mtime_ns, digest)
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            known = self.digests.get(path)
+        data = None
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = known[2]
+        else:
+            with open(path, 'rb') as file:
+                data = file.read()
+            digest = hashlib.sha256(data).digest()
+        known = (stat.st_size, stat.st_mtime_ns, digest)
+
+        with self.lock:
+            compiled = self.entries.get(digest)
+            if compiled is not None:
+                self.entries.move_to_end(digest)
+                self.digests[path] = known
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        if data is None:  # Evicted since the file was hashed
+            with open(path, 'rb') as file:
+                data = file.read()
+        table = loads(data.decode('utf-8', errors='replace'))
+        if not table.valid_stops():
+            raise ValueError(f"{os.path.basename(path)} has no color entries")
+        compiled = CompiledTable(table)
+        with self.lock:
+            self.entries[digest] = compiled
+            self.digests[path] = known
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                self.evictions += 1
+                for stale in [name for name, entry in self.digests.items() if entry[2] == evicted]:
+                    del self.digests[stale]
+        return compiled
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+class Metrics:
+    """
+    Request counters, with latency and throughput over the most recent
+    ``window`` requests as well as since the service started.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.perf_counter()
+        self.requests = self.errors = self.pixels = 0
+        self.batches = self.batched_requests = 0
+        self.recent = deque(maxlen=window)  # (finished, seconds, pixels)
+
+    def record(self, seconds, pixels):
+        self.requests += 1
+        self.pixels += pixels
+        self.recent.append((time.perf_counter(), seconds, pixels))
+
+    def record_batch(self, requests):
+        self.batches += 1
+        self.batched_requests += requests
+
+    def snapshot(self):
+        now = time.perf_counter()
+        uptime = now - self.started
+        snapshot = {
+            'uptime_seconds': round(uptime, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'pixels': self.pixels,
+            'pixels_per_second': round(self.pixels / uptime, 1) if uptime > 0 else 0.0,
+            'batches': self.batches,
+            'mean_batch_requests': round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+        }
+        if self.recent:
+            finished, seconds, pixels = (np.array(column) for column in zip(*self.recent))
+            p50, p95, p99 = np.percentile(seconds, (50, 95, 99)) * 1000
+            snapshot['latency_ms'] = {
+                'mean': round(float(seconds.mean()) * 1000, 3), 'p50': round(float(p50), 3),
+                'p95': round(float(p95), 3), 'p99': round(float(p99), 3),
+                'max': round(float(seconds.max()) * 1000, 3),
+            }
+            # From the start of the oldest recent request to now
+            elapsed = now - (finished[0] - seconds[0])
+            snapshot['recent_pixels_per_second'] = round(float(pixels.sum()) / elapsed, 1) if elapsed > 0 else 0.0
+        return snapshot
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request, or return None at the end of the connection.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ServiceError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ServiceError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise ServiceError(413, f"Arrays are limited to {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b''
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return Request(method.upper(), url.path, query, headers, body)
+
+
+async def write_response(writer, status, body, content_type='text/plain; charset=utf-8', headers=()):
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}", f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}", *headers]
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+    writer.write(body)
+    await writer.drain()
+
+
+class ColorizeService:
+    """
+    The colorization service for the tables below ``root``.
+
+    Parameters:
+    - cache_size: Compiled tables kept in the LRU.
+    - batch_window: Seconds a batch stays open for more requests; 0 only
+      batches requests that are already queued.
+    - max_batch_pixels: Elements after which a batch is closed early.
+    - threads: Worker threads that parse tables and color batches.
+    """
+
+    def __init__(self, root, cache_size=TABLE_CACHE_SIZE, batch_window=BATCH_WINDOW,
+                 max_batch_pixels=MAX_BATCH_PIXELS, threads=None):
+        self.root = os.path.realpath(root)
+        self.tables = TableLRU(cache_size)
+        self.metrics = Metrics()
+        self.batch_window = batch_window
+        self.max_batch_pixels = max_batch_pixels
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='colorize')
+        self.queue = None
+        self.tasks = set()
+
+    def resolve(self, reference):
+        """
+        Return the path of a table reference, relative to the root.
+        """
+        path = os.path.realpath(os.path.join(self.root, reference))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ServiceError(403, f"{reference} is outside the table directory")
+        if not os.path.isfile(path):
+            raise ServiceError(404, f"No table {reference}")
+        return path
+
+    async def colorize(self, path, values, rf_code=None):
+        """
+        Queue a flat array for the next batch and return its RGBA colors.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(Pending(path, rf_code, values, future))
+        return await future
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            pixels = items[0].values.size
+            deadline = loop.time() + self.batch_window
+            while pixels < self.max_batch_pixels:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                items.append(item)
+                pixels += item.values.size
+            self.metrics.record_batch(len(items))
+
+            groups = {}
+            for item in items:
+                groups.setdefault((item.path, item.values.dtype.str, item.rf_code), []).append(item)
+            for group in groups.values():
+                # Colored concurrently with the next batch being collected
+                task = asyncio.create_task(self.run_group(group))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def run_group(self, items):
+        loop = asyncio.get_running_loop()
+        try:
+            outputs = await loop.run_in_executor(
+                self.executor, self.colorize_group, items[0].path, items[0].rf_code, [item.values for item in items]
+            )
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        for item, rgba in zip(items, outputs):
+            if not item.future.done():  # Cancelled if the client went away
+                item.future.set_result(rgba)
+
+    def colorize_group(self, path, rf_code, arrays):
+        """
+        Color arrays of one dtype with one table in a single pass; runs in a
+        worker thread.
+        """
+        compiled = self.tables.get(path)
+        values = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        if values.dtype.kind == 'u':
+            rgba = np.take(compiled.lut(lut_size(values.dtype), rf_code), values, axis=0)
+        else:
+            rgba = colorize_values(compiled.table, values)
+        return np.split(rgba, np.cumsum([len(array) for array in arrays])[:-1])
+
+    async def dispatch(self, request):
+        if request.path == '/metrics':
+            if request.method != 'GET':
+                raise ServiceError(405, "Use GET for /metrics")
+            snapshot = self.metrics.snapshot()
+            snapshot['tables'] = self.tables.stats()
+            return json.dumps(snapshot, indent=1).encode('utf-8') + b'\n', 'application/json', ()
+        if request.path != '/colorize':
+            raise ServiceError(404, f"No endpoint {request.path}")
+        if request.method != 'POST':
+            raise ServiceError(405, "Use POST for /colorize")
+
+        start = time.perf_counter()
+        if 'table' not in request.query:
+            raise ServiceError(400, "Missing the table parameter")
+        path = self.resolve(request.query['table'])
+        try:
+            dtype = np.dtype(request.query.get('dtype', 'uint8'))
+            rf_code = int(request.query['rf_code']) if 'rf_code' in request.query else None
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, str(e))
+        if dtype.kind == 'u':
+            size = lut_size(dtype)
+            if rf_code is not None and not 0 <= rf_code < size:
+                raise ServiceError(400, f"rf_code must be a {dtype} code")
+        elif dtype.kind == 'f':
+            rf_code = None  # Data values have no RF code
+        else:
+            raise ServiceError(400, f"Arrays must be uint8, uint16 or float, not {dtype}")
+        if len(request.body) % dtype.itemsize:
+            raise ServiceError(400, f"The body is not a whole number of {dtype} elements")
+
+        values = np.frombuffer(request.body, dtype=dtype)
+        rgba = await self.colorize(path, values, rf_code)
+        seconds = time.perf_counter() - start
+        self.metrics.record(seconds, values.size)
+        headers = (f"X-Elements: {values.size}", f"X-Latency-Ms: {seconds * 1000:.3f}")
+        return rgba.reshape(-1).data, 'application/octet-stream', headers
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = None
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    body, content_type, headers = await self.dispatch(request)
+                    status = 200
+                except ServiceError as e:
+                    status, body = e.status, str(e).encode('utf-8')
+                except FileNotFoundError as e:
+                    status, body = 404, str(e).encode('utf-8')
+                except (OSError, ValueError) as e:
+                    status, body = 400, str(e).encode('utf-8')
+                except Exception as e:
+                    log.exception("Request %s failed", request.path if request else '')
+                    status, body = 500, f"Internal error: {e}".encode('utf-8')
+                if status == 200:
+                    await write_response(writer, status, body, content_type, headers)
+                else:
+                    self.metrics.errors += 1
+                    await write_response(writer, status, body)
+                # After an unreadable request the rest of the stream cannot be trusted
+                if request is None or request.headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, ready=None):
+        """
+        Serve until cancelled. ``ready(server)``, when given, is called once
+        the server is listening.
+        """
+        self.queue = asyncio.Queue()
+        if socket_path:
+            if sys.platform == 'win32':
+                raise ValueError("Unix sockets are not available on Windows")
+            server = await asyncio.start_unix_server(self.handle, socket_path)
+        else:
+            check_loopback(host)
+            server = await asyncio.start_server(self.handle, host, port)
+        loop = asyncio.get_running_loop()
+        batcher = asyncio.create_task(self.batch_loop())
+        # Signal handlers can only be set from the main thread
+        on_sigterm = sys.platform != 'win32' and threading.current_thread() is threading.main_thread()
+        if on_sigterm:
+            # Stop as cleanly on SIGTERM, from service managers, as on Ctrl+C
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if on_sigterm:
+                loop.remove_signal_handler(signal.SIGTERM)
+            for task in (batcher, *self.tasks):
+                task.cancel()
+            await asyncio.gather(batcher, *self.tasks, return_exceptions=True)
+            self.executor.shutdown(wait=False)
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def serve(root, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, ready=None, **options):
+    """
+    Run a ColorizeService until interrupted or terminated and return its
+    final metrics.
+    """
+    service = ColorizeService(root, **options)
+    try:
+        asyncio.run(service.run(host, port, socket_path, ready))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    snapshot = service.metrics.snapshot()
+    snapshot['tables'] = service.tables.stats()
+    return snapshot
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """
+    Blocking client for a running service, over one kept-alive connection.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=30):
+        if socket_path:
+            self.connection = _UnixConnection(socket_path, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, target, body=None):
+        self.connection.request(method, target, body=body)
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise ServiceError(response.status, data.decode('utf-8', errors='replace'))
+        return data
+
+    def colorize(self, table, values, rf_code=None):
+        """
+        Color an array with the table at ``table``, a path relative to the
+        service's root, returning ``values.shape + (4,)`` uint8 RGBA.
+        """
+        values = np.ascontiguousarray(values)
+        target = f"/colorize?table={quote(table)}&dtype={values.dtype.str}"
+        if rf_code is not None:
+            target += f"&rf_code={rf_code}"
+        data = self.request('POST', target, memoryview(values).cast('B') if values.size else b'')
+        return np.frombuffer(data, dtype=np.uint8).reshape(values.shape + (4,))
+
+    def metrics(self):
+        return json.loads(self.request('GET', '/metrics'))
+
+    def close(self):
+        self.connection.close()
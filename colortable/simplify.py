@@ -0,0 +1,190 @@
+"""
+Simplify a table to the fewest solid and gradient bands that reproduce it
+within a maximum CIEDE2000 difference.
+
+The simplified table breaks only at values where the original has a stop,
+so solid edges stay exactly where they were. Between two kept stops a
+single band is fitted: solid when the original renders one color there,
+otherwise a gradient from the color at the first stop to the color just
+below the second, interpolated in the table's own color space.
+
+The fit is greedy: from each kept stop the band is stretched over as many
+following stops as the tolerance allows. The reach is found by doubling
+and then bisecting the number of stops, and every candidate band is checked
+against the dense samples it covers in one vectorized pass.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .analysis import DEFAULT_SAMPLES, delta_e, diff, sample_values, to_lab
+from .lut import blend, colorize_values, pack_colors, value_domain
+from .model import ColorStop, ColorTable
+
+DEFAULT_MAX_DELTA_E = 1.0
+ALPHA_TOLERANCE = 1  # Largest alpha difference a band may introduce, in 8-bit steps
+REJECT_STRIDE = 16   # Sample stride of the quick check of long bands
+
+
+class Simplified(namedtuple('Simplified', 'table stops_before stops_after max_delta_e')):
+    """
+    The result of ``simplify``: the simplified table, the number of valid
+    stops before and after, and the largest ΔE from the original over the
+    sampled domain.
+    """
+    __slots__ = ()
+
+
+class _Fit:
+    """
+    Samples of a table and the colors at and just below each stop.
+
+    Bands are checked at every stop value, just below it and halfway to
+    the next stop, where the difference between two linear interpolations
+    peaks, plus a dense grid for the curvature of wide perceptual gradients.
+    """
+
+    def __init__(self, table, stops, samples):
+        self.space = table.interpolation
+        self.stop_values = np.array([stop.value for stop in stops])
+        below = np.nextafter(self.stop_values, -np.inf)
+        middle = (self.stop_values[:-1] + self.stop_values[1:]) / 2
+        grid = sample_values((stops[0].value, stops[-1].value), samples)
+        self.values = np.unique(np.concatenate((self.stop_values, below[1:], middle, grid)))
+        self.rgba = colorize_values(table, self.values)
+        self.lab = to_lab(self.rgba)
+        self.first = np.searchsorted(self.values, self.stop_values)  # First sample of each stop's band
+        self.at = colorize_values(table, self.stop_values)
+        self.below = colorize_values(table, below)
+
+    def layout(self, ks, ms, stride=1):
+        """
+        Return the indices of every ``stride``-th sample covered by the
+        bands from stops ``ks`` to stops ``ms``, concatenated, with the band
+        of each sample, and the offset and length of each band's run.
+        """
+        first, last = self.first[ks], self.first[ms]
+        lengths = np.maximum((last - first + stride - 1) // stride, 0)
+        band = np.repeat(np.arange(len(ks)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        index = first[band] + (np.arange(lengths.sum()) - offsets[band]) * stride
+        return index, band, offsets, lengths
+
+    def bands(self, ks, ms, layout=None):
+        """
+        Return the start and end RGBA of the bands fitted from stops ``ks``
+        to stops ``ms``, with end equal to start for solid bands.
+        """
+        index, band, offsets, lengths = layout or self.layout(ks, ms)
+        start, end = self.at[ks], self.below[ms].copy()
+        same = (self.rgba[index] == start[band]).all(axis=1)
+        solid = np.ones(len(ks), dtype=bool)
+        covered = lengths > 0  # Stops with the same value cover no samples
+        if covered.any():
+            solid[covered] = np.logical_and.reduceat(same, offsets[covered])
+        end[solid] = start[solid]
+        return start, end
+
+    def errors(self, ks, ms, stride=1):
+        """
+        Return the largest ΔE and alpha difference of each band from stop
+        ``ks[i]`` to stop ``ms[i]`` against the samples it covers (every
+        ``stride``-th sample). The bands are checked in one vectorized pass.
+        """
+        ks, ms = np.asarray(ks), np.asarray(ms)
+        layout = self.layout(ks, ms, stride)
+        index, band, offsets, lengths = layout
+        start, end = self.bands(ks, ms, layout)
+        low, high = self.stop_values[ks][band], self.stop_values[ms][band]
+        fitted = blend(start[band], end[band], (self.values[index] - low) / (high - low), self.space)
+        delta = delta_e(to_lab(fitted), self.lab[index])
+        alpha = np.abs(fitted[:, 3].astype(np.int16) - self.rgba[index, 3])
+
+        errors = np.zeros(len(ks))
+        alphas = np.zeros(len(ks), dtype=np.int16)
+        covered = lengths > 0
+        if covered.any():
+            errors[covered] = np.maximum.reduceat(delta, offsets[covered])
+            alphas[covered] = np.maximum.reduceat(alpha, offsets[covered])
+        return errors, alphas
+
+    def fits(self, ks, ms, max_delta_e, stride=1):
+        errors, alphas = self.errors(ks, ms, stride)
+        return (errors <= max_delta_e) & (alphas <= ALPHA_TOLERANCE)
+
+    def fit(self, k, m, max_delta_e):
+        # Long bands are first checked on a subset of samples, which rejects most misfits cheaply
+        if self.first[m] - self.first[k] > REJECT_STRIDE * 64 and \
+                not self.fits([k], [m], max_delta_e, REJECT_STRIDE)[0]:
+            return False
+        return bool(self.fits([k], [m], max_delta_e)[0])
+
+    def reach(self, k, max_delta_e):
+        """
+        Return the farthest stop a single band from stop ``k`` can reach.
+        """
+        last = len(self.stop_values) - 1
+        good, step = k + 1, 1
+        # Double the reach until a band fails, then bisect between the last fit and the failure
+        while good < last:
+            candidate = min(k + 2 * step, last)
+            if not self.fit(k, candidate, max_delta_e):
+                bad = candidate
+                break
+            good, step = candidate, 2 * step
+        else:
+            return good
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            if self.fit(k, middle, max_delta_e):
+                good = middle
+            else:
+                bad = middle
+        return good
+
+
+def simplify(table, max_delta_e=DEFAULT_MAX_DELTA_E, samples=None):
+    """
+    Return a Simplified with the fewest bands, found greedily, that
+    reproduce ``table`` within ``max_delta_e`` over its value domain. The
+    table itself is not changed.
+    """
+    stops = table.valid_stops()
+    if len(stops) < 3 or stops[0].value == stops[-1].value:
+        return Simplified(table.copy(), len(stops), len(stops), 0.0)
+
+    fit = _Fit(table, stops, samples or DEFAULT_SAMPLES)
+    last = len(stops) - 1
+    # Whether a band from each stop can span the next two, checked for all stops in two passes
+    # (even and odd starts do not overlap); where it cannot, the next stop is kept without a search
+    mergeable = np.zeros(last, dtype=bool)
+    for parity in (0, 1):
+        ks = np.arange(parity, last - 1, 2)
+        mergeable[ks] = fit.fits(ks, ks + 2, max_delta_e)
+
+    kept = []
+    k = 0
+    while k < last:
+        kept.append(k)
+        k = fit.reach(k, max_delta_e) if mergeable[k] else k + 1
+    if len(kept) == last:
+        return Simplified(table.copy(), len(stops), len(stops), 0.0)  # No band can be merged
+
+    bands = np.array(kept)
+    ends_at = np.append(bands[1:], last)
+    starts, ends = fit.bands(bands, ends_at)
+    solid = (starts == ends).all(axis=1)
+    translucent = (starts[:, 3] < 255) | (ends[:, 3] < 255)
+    result = ColorTable((), **table.settings(), rf=table.rf, dialect=table.dialect,
+                        interpolation=table.interpolation)
+    result.stops = [
+        ColorStop(stops[k].value, 'solid' if is_solid else 'gradient', 'rgba' if alpha else 'rgb', start,
+                  None if is_solid else end)
+        for k, is_solid, alpha, start, end in zip(
+            bands.tolist(), solid.tolist(), translucent.tolist(), pack_colors(starts), pack_colors(ends)
+        )
+    ]
+    # The last stop colors everything above the domain and is kept as it is
+    result.stops.append(stops[-1].copy())
+    error = diff(table, result, samples, value_domain(table))
+    return Simplified(result, len(stops), len(result.stops), float(np.nanmax(error.delta_e)))
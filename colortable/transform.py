@@ -0,0 +1,124 @@
+"""
+Bulk transforms over the stops of a table, each a single vectorized pass.
+
+- ``remap_values``: affine remap of stop values, e.g. shifting thresholds by
+  +5 dBZ or rescaling a velocity table to a new Nyquist velocity;
+- ``resample``: replace the bands of a value range with N - 1 evenly
+  spaced gradient bands sampled from the table as it renders;
+- ``adjust_colors``: rotate hue and shift lightness in HSLuv, so hue turns
+  do not change lightness, and scale alpha.
+
+Every transform works on the stops of ``select(table, low, high)`` (all
+stops by default), changes the table in place and returns what it changed
+so a caller can record it for undo. ``transform_bands`` runs any of them
+on a list of ``(value, color_info)`` band dictionaries instead of a table.
+"""
+import numpy as np
+
+from .colorspace import from_space, to_space
+from .lut import colorize_values, pack_colors, unpack_colors
+from .model import ColorStop, ColorTable
+
+
+def select(table, low=None, high=None):
+    """
+    Return the stops of a table with a value in [low, high]; None leaves
+    that side open.
+    """
+    low = -np.inf if low is None else low
+    high = np.inf if high is None else high
+    return [stop for stop in table.valid_stops() if low <= stop.value <= high]
+
+
+def remap_values(table, scale=1.0, offset=0.0, stops=None):
+    """
+    Set ``value = value * scale + offset`` for the given stops (by default
+    all stops) and re-sort the table. Returns the changed stops.
+    """
+    stops = table.valid_stops() if stops is None else stops
+    values = np.array([stop.value for stop in stops], dtype=np.float64) * scale + offset
+    for stop, value in zip(stops, values.tolist()):
+        stop.value = value
+    table.sort()
+    return stops
+
+
+def resample(table, count, stops=None):
+    """
+    Replace the bands between the first and last of the given stops (by
+    default the whole table) with ``count - 1`` evenly spaced gradient
+    bands that follow the colors the table renders there; bands that fall
+    inside one solid color become solid. The last stop is kept, so the
+    range ends up with ``count`` stops. Returns the removed and the added
+    stops.
+    """
+    if count < 2:
+        raise ValueError("Resampling needs at least 2 stops")
+    stops = table.valid_stops() if stops is None else sorted(stops, key=lambda stop: stop.value)
+    if len(stops) < 2 or stops[0].value == stops[-1].value:
+        return [], []
+    last = stops[-1]
+    values = np.linspace(stops[0].value, last.value, count)
+    start = colorize_values(table, values[:-1])
+    # Each band ends with the color just below the next stop, the end of a gradient
+    end = colorize_values(table, np.nextafter(values[1:], -np.inf))
+    translucent = (start[:, 3] < 255) | (end[:, 3] < 255)
+    flat = np.all(start == end, axis=1)  # Inside a solid band
+    added = [
+        ColorStop(value, 'solid' if solid else 'gradient', 'rgba' if alpha else 'rgb', start_color,
+                  None if solid else end_color)
+        for value, solid, alpha, start_color, end_color in zip(
+            values[:-1].tolist(), flat.tolist(), translucent.tolist(), pack_colors(start), pack_colors(end)
+        )
+    ]
+    removed = [stop for stop in stops if stop is not last]
+    table.remove_many(removed)
+    with table.bulk():
+        for stop in added:
+            table.add(stop)
+    return removed, added
+
+
+def adjust_colors(table, hue=0.0, lightness=0.0, alpha=1.0, stops=None):
+    """
+    Rotate the hue of the given stops' colors by ``hue`` degrees, shift
+    their HSLuv lightness by ``lightness`` (0-100 scale) and multiply their
+    alpha by ``alpha``. Returns the changed stops.
+    """
+    stops = table.valid_stops() if stops is None else stops
+    if not stops:
+        return []
+    has_end = [stop.end is not None for stop in stops]
+    packed = [stop.start for stop in stops] + [stop.end for stop, end in zip(stops, has_end) if end]
+    rgba = unpack_colors(packed)
+    if hue or lightness:
+        coords = to_space(rgba[:, :3], 'hsluv')
+        coords[:, 0] = (coords[:, 0] + hue) % 360
+        coords[:, 2] = np.clip(coords[:, 2] + lightness, 0.0, 100.0)
+        rgba[:, :3] = from_space(coords, 'hsluv')
+    if alpha != 1.0:
+        rgba[:, 3] = np.clip(np.round(rgba[:, 3] * alpha), 0, 255)
+
+    colors = iter(pack_colors(rgba))
+    starts = [next(colors) for _ in stops]
+    changed = []
+    for stop, start, end in zip(stops, starts, has_end):
+        stop.start = start
+        if end:
+            stop.end = next(colors)
+        if alpha < 1.0 and (stop.start_alpha < 255 or stop.end_alpha < 255):
+            stop.format = 'rgba'  # Otherwise the new alpha would not be saved
+        changed.append(stop)
+    return changed
+
+
+def transform_bands(bands, transform, *args, low=None, high=None, **kwargs):
+    """
+    Run a transform on ``(value, color_info)`` pairs, as used by
+    ``ColorStop.from_band``, and return the resulting pairs in value order.
+
+    Example: ``transform_bands(bands, remap_values, offset=5.0)``.
+    """
+    table = ColorTable([ColorStop.from_band(value, band) for value, band in bands])
+    transform(table, *args, stops=select(table, low, high), **kwargs)
+    return [(stop.value, stop.to_band()) for stop in table.stops]
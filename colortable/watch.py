@@ -0,0 +1,179 @@
+"""
+Change detection for a table file edited outside the editor, and the
+stop-level diff used to apply the change.
+
+Watchers are polled rather than run in a thread, so a GUI can check them
+from a timer:
+
+- Linux: inotify on the file's directory, so a poll is one non-blocking
+  read and also notices files replaced by a rename, as atomic saves do;
+- anything else: the file's size, mtime and inode are compared with an
+  ``os.stat`` per poll.
+
+``diff_stops`` matches the stops of two tables by value and returns only
+the stops that were removed, added or changed, so a reload touches nothing
+else.
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+from collections import namedtuple
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+READ_SIZE = 64 * 1024
+
+
+class StopDiff(namedtuple('StopDiff', 'removed added changed')):
+    """
+    The result of ``diff_stops``: stops of the old table that are gone,
+    stops of the new table that are new, and (old stop, new snapshot) for
+    stops whose value is unchanged but whose type, format or colors differ.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.removed or self.added or self.changed)
+
+    def __len__(self):
+        return len(self.removed) + len(self.added) + len(self.changed)
+
+
+def diff_stops(old, new):
+    """
+    Diff the stops of two tables. Stops are matched by value, in order when
+    several share a value; stops without a value are not part of a file and
+    are left alone.
+    """
+    by_value = {}
+    for stop in new.valid_stops():
+        by_value.setdefault(stop.value, []).append(stop)
+    removed, changed = [], []
+    for stop in old.valid_stops():
+        matches = by_value.get(stop.value)
+        if not matches:
+            removed.append(stop)
+            continue
+        match = matches.pop(0)
+        if match != stop:
+            changed.append((stop, match.snapshot()))
+    added = [stop for matches in by_value.values() for stop in matches]
+    return StopDiff(removed, added, changed)
+
+
+def table_state(table):
+    """
+    Return the settings, RF color and interpolation of a table, the parts a
+    reload merges field by field.
+    """
+    return dict(table.settings(), rf=table.rf, interpolation=table.interpolation)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None  # Missing, e.g. halfway through a replace
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class FileWatcher:
+    """
+    Polling watcher comparing the file's stat signature.
+    """
+    method = 'poll'
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.signature = _signature(self.path)
+
+    def changed(self):
+        """
+        Return True when the file changed since the last call (or since
+        the watcher was created or reset). Never blocks.
+        """
+        signature = _signature(self.path)
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return True
+
+    def reset(self):
+        """
+        Forget changes so far, e.g. after the editor saved the file itself.
+        """
+        self.signature = _signature(self.path)
+
+    def close(self):
+        pass
+
+
+class _InotifyWatcher(FileWatcher):
+    """
+    Watcher reading inotify events for the file's directory.
+    """
+    method = 'inotify'
+
+    def __init__(self, path):
+        super().__init__(path)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory, name = os.path.split(self.path)
+        # The directory is watched so replacing the file by a rename is seen too
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify_add_watch failed")
+        self.name = os.fsencode(name)
+
+    def changed(self):
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + EVENT.size <= len(data):
+                _, mask, _, length = EVENT.unpack_from(data, offset)
+                name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0')
+                if name == self.name or mask & IN_Q_OVERFLOW:
+                    changed = True
+                offset += EVENT.size + length
+        if changed:
+            self.signature = _signature(self.path)
+        return changed
+
+    def reset(self):
+        self.changed()
+        super().reset()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_watcher(path):
+    """
+    Return the cheapest watcher available for ``path`` on this platform.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return _InotifyWatcher(path)
+        except (OSError, AttributeError):
+            pass  # e.g. the inotify watch limit is reached
+    return FileWatcher(path)
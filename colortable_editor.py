@@ -1,20 +1,844 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 from tkinter.colorchooser import askcolor
-import re
-import pyautogui
-from PIL import ImageGrab
+import importlib
+import os
+import sys
 import threading
 import time
-from pynput import mouse
+from contextlib import contextmanager
+
+# NumPy (through colortable.lut), Pillow and pynput are imported on first
+# use: the preview needs NumPy once a table has stops, the picker the others
+from colortable import ColorStop, ColorTable, dump, loads
+from colortable.cache import default_cache, load_cached
+from colortable.history import AddStops, History, RemoveStops, ReplaceTable, SettingsEdit, StopEdit, StopsEdit
+from colortable.model import WHITE, format_value, pack_hex
+from colortable.profiling import profiler, span
+from colortable.screen import average_color, open_grabber, set_dpi_aware
+from colortable.watch import diff_stops, open_watcher, table_state
+
+
+class ColorRow:
+    """
+    One reusable row of widgets in the color entry list.
+
+    A row is a view over a single stop of the table and is rebound to
+    another stop whenever the list scrolls, so the number of rows only
+    depends on the height of the list, not on the size of the table.
+    """
+
+    def __init__(self, color_list, parent):
+        self.list = color_list
+        self.app = app = color_list.app
+        self.stop = None
+        self.edited = None    # Stop whose value was typed since the last commit; the text stays in value_var
+        self.edit_before = None  # Snapshot of the edited stop before typing started
+        self.binding = False  # Suppresses write-through while rebinding
+        self.shown = False
+
+        self.frame = ttk.Frame(parent)
+
+        self.value_var = tk.StringVar()
+        self.value_entry = ttk.Entry(self.frame, width=10, textvariable=self.value_var)
+        self.value_entry.pack(side="left", padx=5)
+        self.value_var.trace_add('write', self.update_value)
+
+        # Commit the value to re-sort the entries
+        self.value_entry.bind("<FocusOut>", lambda e: self.commit())
+        self.value_entry.bind("<Return>", lambda e: self.commit())
+
+        self.band_type_var = tk.StringVar(value='Single')
+        band_type_menu = ttk.OptionMenu(self.frame, self.band_type_var, 'Single', 'Single', 'Solid', 'Gradient')
+        band_type_menu.pack(side="left", padx=5)
+        self.band_type_var.trace_add('write', self.update_band_type)
+
+        # Color format selector
+        self.color_format_var = tk.StringVar(value='RGB')
+        color_format_menu = ttk.OptionMenu(self.frame, self.color_format_var, 'RGB', 'RGB', 'RGBA')
+        color_format_menu.pack(side="left", padx=5)
+        self.color_format_var.trace_add('write', self.update_color_format)
+
+        # Color previews
+        self.start_color_preview = tk.Label(self.frame, width=3, relief="solid", borderwidth=1)
+        self.start_color_preview.pack(side="left", padx=5)
+
+        ttk.Button(
+            self.frame, text="Start Color",
+            command=lambda: app.select_color(self.start_color_preview, self.color_format_var)
+        ).pack(side="left", padx=5)
+
+        # Pick Screen Color Button
+        ttk.Button(
+            self.frame, text="Pick Screen Color",
+            command=lambda: app.pick_screen_color(self.start_color_preview, self.color_format_var)
+        ).pack(side="left", padx=5)
+
+        # End color widgets are created the first time a gradient is shown
+        self.end_color_preview = None
+        self.end_color_button = None
+        self.end_pick_screen_color_button = None
+
+        ttk.Button(
+            self.frame, text="Remove", command=lambda: app.remove_color_entry(self.stop)
+        ).pack(side="right", padx=5)
+
+        for widget in (self.frame,) + tuple(self.frame.winfo_children()):
+            color_list.bind_wheel(widget)
+
+    def bind(self, stop):
+        """
+        Show ``stop`` in this row.
+        """
+        if stop is not self.edited:
+            self.release()
+        self.stop = stop
+        self.binding = True
+        try:
+            if stop is not self.edited:  # Keep text still being typed
+                self.value_var.set(format_value(stop.value))
+            self.band_type_var.set(stop.type.capitalize())
+            self.color_format_var.set(stop.format.upper())
+            self.show_color(self.start_color_preview, stop.start_color, stop.start_alpha, stop.set_start)
+            self.update_end_widgets()
+        finally:
+            self.binding = False
+
+    def show_color(self, color_preview, color, alpha, on_change):
+        color_preview.stop = self.stop
+        color_preview.config(background=color)
+        color_preview.color_value = color
+        color_preview.alpha_value = alpha
+        color_preview.on_change = on_change
+
+    def show(self):
+        if not self.shown:
+            self.frame.pack(fill="x", pady=2)
+            self.shown = True
+
+    def release(self):
+        """
+        Commit a value typed into this row once the row stops showing it.
+        """
+        if self.edited is not None:
+            self.apply_value()
+            self.frame.after_idle(self.app.commit_value, self.edited, self.edit_before)
+            self.edited = None
+
+    def hide(self):
+        self.release()
+        if self.shown:
+            self.frame.pack_forget()
+            self.shown = False
+        self.stop = None
+
+    def update_value(self, *args):
+        if self.binding or self.stop is None:
+            return
+        if self.edited is None:
+            self.edit_before = self.stop.snapshot()
+        # The stop keeps its value, and the table its order, until the commit
+        self.edited = self.stop
+
+    def apply_value(self):
+        try:
+            self.edited.value = float(self.value_var.get())
+        except ValueError:
+            self.edited.value = None  # Invalid values are skipped when saving
+
+    def commit(self):
+        if self.edited is not None:
+            self.apply_value()
+            stop, self.edited = self.edited, None
+            self.app.commit_value(stop, self.edit_before, self.list.first + self.list.rows.index(self))
+
+    def update_band_type(self, *args):
+        if self.binding or self.stop is None:
+            return
+        before = self.stop.snapshot()
+        self.stop.type = self.band_type_var.get().lower()
+        if self.stop.type == 'gradient' and self.stop.end is None:
+            self.stop.end = WHITE
+        self.app.record_stop_edit(self.stop, before)
+        self.update_end_widgets()
+        self.app.schedule_preview()
+
+    def update_color_format(self, *args):
+        if self.binding or self.stop is None:
+            return
+        before = self.stop.snapshot()
+        self.stop.format = self.color_format_var.get().lower()
+        self.app.record_stop_edit(self.stop, before)
+        self.app.schedule_preview()
+
+    def update_end_widgets(self):
+        # Show/hide end color widgets based on band type
+        stop = self.stop
+        if stop.type == 'gradient' and stop.end is not None:
+            if self.end_color_preview is None:
+                self.end_color_preview = tk.Label(self.frame, width=3, relief="solid", borderwidth=1)
+                self.end_color_button = ttk.Button(
+                    self.frame, text="End Color",
+                    command=lambda: self.app.select_color(self.end_color_preview, self.color_format_var)
+                )
+                # Add Pick Screen Color Button for End Color
+                self.end_pick_screen_color_button = ttk.Button(
+                    self.frame, text="Pick Screen Color",
+                    command=lambda: self.app.pick_screen_color(self.end_color_preview, self.color_format_var)
+                )
+                for widget in (self.end_color_preview, self.end_color_button, self.end_pick_screen_color_button):
+                    self.list.bind_wheel(widget)
+            self.show_color(self.end_color_preview, stop.end_color, stop.end_alpha, stop.set_end)
+            if not self.end_color_preview.winfo_manager():
+                self.end_color_preview.pack(side="left", padx=5)
+                self.end_color_button.pack(side="left", padx=5)
+                self.end_pick_screen_color_button.pack(side="left", padx=5)
+        elif self.end_color_preview is not None:
+            # Hide end color widgets
+            self.end_color_preview.pack_forget()
+            self.end_color_button.pack_forget()
+            self.end_pick_screen_color_button.pack_forget()
+
+
+class ColorEntryList:
+    """
+    Virtualized list of color entries backed by ``app.table.stops``.
+
+    Only enough ColorRow widgets to fill the visible area are created; the
+    vertical scrollbar moves a window over the stops and the rows are
+    rebound to the stops inside it.
+    """
+    WHEEL_ROWS = 3  # Rows scrolled per mouse wheel notch
+
+    def __init__(self, app, parent):
+        self.app = app
+        self.first = 0  # Index of the stop shown in the top row
+        self.rows = []
+        self.row_height = 30  # Replaced by the measured height of a row
+
+        self.canvas = tk.Canvas(parent, highlightthickness=0)
+        self.rows_frame = ttk.Frame(self.canvas)
+        self.scroll_y = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.scroll_x = ttk.Scrollbar(parent, orient="horizontal", command=self.canvas.xview)
+
+        self.canvas.configure(xscrollcommand=self.scroll_x.set)
+        self.scroll_y.pack(side="right", fill="y")
+        self.scroll_x.pack(side="bottom", fill="x")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.create_window((0, 0), window=self.rows_frame, anchor="nw")
+
+        # Only the visible rows live in the frame, so its size is cheap to track
+        self.rows_frame.bind(
+            "<Configure>", lambda e: self.canvas.configure(scrollregion=(0, 0, e.width, e.height))
+        )
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.bind_wheel(self.canvas)
+
+    @property
+    def stops(self):
+        return self.app.table.stops
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel, add="+")
+        widget.bind("<Button-4>", self.on_wheel, add="+")
+        widget.bind("<Button-5>", self.on_wheel, add="+")
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.scroll(-self.WHEEL_ROWS)
+        else:
+            self.scroll(self.WHEEL_ROWS)
+
+    def visible_count(self):
+        return max(1, self.canvas.winfo_height() // self.row_height + 1)
+
+    def add_row(self):
+        row = ColorRow(self, self.rows_frame)
+        if not self.rows:
+            row.frame.update_idletasks()
+            self.row_height = row.frame.winfo_reqheight() + 4  # pady=2 above and below
+        self.rows.append(row)
+        return row
+
+    def refresh(self):
+        """
+        Rebind the visible rows to the stops at the current scroll position.
+        Does nothing while the app is in a batch; the batch refreshes once
+        when it ends.
+        """
+        if self.app.batch_depth:
+            return
+        with span('layout'):
+            stops = self.stops
+            count = min(self.visible_count(), len(stops))
+            self.first = max(0, min(self.first, len(stops) - count))
+            while len(self.rows) < count:
+                self.add_row()
+            for i, row in enumerate(self.rows):
+                if i < count:
+                    row.bind(stops[self.first + i])
+                    row.show()
+                else:
+                    row.hide()
+            if stops:
+                self.scroll_y.set(self.first / len(stops), (self.first + count) / len(stops))
+            else:
+                self.scroll_y.set(0, 1)
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+
+    def yview(self, *args):
+        # Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(self.stops))
+            self.refresh()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= max(1, self.visible_count() - 1)
+            self.scroll(amount)
+
+    def see(self, stop):
+        """
+        Scroll so that ``stop`` is visible and return its row.
+        """
+        index = next(i for i, existing in enumerate(self.stops) if existing is stop)
+        count = max(1, self.visible_count() - 1)  # The last row may be cut off
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + count:
+            self.first = index - count + 1
+        self.refresh()
+        return self.rows[index - self.first]
+
+
+class ScreenColorPicker:
+    """
+    Live magnifier loupe for picking a color from anywhere on the desktop.
+
+    The pynput listener thread only records the latest cursor position and
+    click; all capture and Tk work happens on the main loop, which polls at
+    a throttled frame rate and grabs a few pixels around the cursor.
+    """
+    RADIUS = 7       # Pixels captured on each side of the cursor
+    ZOOM = 9         # Screen pixels are drawn as ZOOM x ZOOM squares
+    OFFSET = 24      # Distance between the cursor and the loupe window
+    FRAME_MS = 40    # Loupe refresh interval (25 fps)
+
+    def __init__(self, root, sample_size, on_pick, on_close):
+        from pynput import mouse
+
+        self.root = root
+        self.sample_size = sample_size
+        self.on_pick = on_pick
+        self.on_close = on_close
+        # Written by the listener thread, read by poll()
+        self.position = None
+        self.click = None
+        self.cancelled = False
+        self.shown_position = None
+
+        self.grabber = open_grabber()
+        self.bounds = self.grabber.bounds()
+        size = (2 * self.RADIUS + 1) * self.ZOOM
+
+        self.window = tk.Toplevel(root)
+        self.window.overrideredirect(True)
+        self.window.attributes('-topmost', True)
+        self.canvas = tk.Canvas(self.window, width=size, height=size, highlightthickness=0, background='black')
+        self.canvas.pack()
+        self.image_item = self.canvas.create_image(0, 0, anchor='nw')
+        # Outline of the averaged sample around the center pixel
+        low = (self.RADIUS - sample_size // 2) * self.ZOOM
+        high = (self.RADIUS + sample_size // 2 + 1) * self.ZOOM
+        self.canvas.create_rectangle(low, low, high - 1, high - 1, outline='white')
+        self.canvas.create_rectangle(low - 1, low - 1, high, high, outline='black')
+        self.label = tk.Label(self.window, text="Click to pick, right-click to cancel", font=('Courier', 9))
+        self.label.pack(fill='x')
+        self.window.withdraw()  # Shown at the first cursor position
+        self.image = None
+
+        self.left_button = mouse.Button.left
+        self.listener = mouse.Listener(on_move=self.on_move, on_click=self.on_click)
+        self.listener.start()
+        self.root.after(self.FRAME_MS, self.poll)
+
+    def on_move(self, x, y):
+        self.position = (int(x), int(y))
+
+    def on_click(self, x, y, button, pressed):
+        if pressed:
+            self.cancelled = button != self.left_button
+            self.click = (int(x), int(y))
+            return False  # Stop the listener
+
+    def capture(self, x, y):
+        radius = self.RADIUS
+        return self.grabber.grab(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1)
+
+    def poll(self):
+        try:
+            if self.click is not None:
+                self.finish()
+                return
+            position = self.position
+            if position is not None and position != self.shown_position:
+                self.shown_position = position
+                self.show_loupe(*position)
+        except Exception as e:
+            self.close()
+            messagebox.showerror("Error", f"Failed to capture color: {e}")
+            return
+        self.root.after(self.FRAME_MS, self.poll)
+
+    def show_loupe(self, x, y):
+        image = self.capture(x, y)
+        r, g, b = average_color(image, self.sample_size)
+        header = f"P6 {image.width} {image.height} 255\n".encode()
+        self.image = tk.PhotoImage(data=header + image.tobytes(), format='PPM').zoom(self.ZOOM)
+        self.canvas.itemconfig(self.image_item, image=self.image)
+        self.label.config(text=f"#{r:02x}{g:02x}{b:02x}  ({x}, {y})")
+
+        # Keep the loupe on the desktop and out of the captured area
+        width, height = self.window.winfo_reqwidth(), self.window.winfo_reqheight()
+        left, top = x + self.OFFSET, y + self.OFFSET
+        if self.bounds:
+            if left + width > self.bounds[2]:
+                left = x - self.OFFSET - width
+            if top + height > self.bounds[3]:
+                top = y - self.OFFSET - height
+        self.window.geometry(f"+{left}+{top}")
+        if not self.window.winfo_viewable():
+            self.window.deiconify()
+
+    def finish(self):
+        x, y = self.click
+        color = None
+        if not self.cancelled:
+            r, g, b = average_color(self.capture(x, y), self.sample_size)
+            color = f"#{r:02x}{g:02x}{b:02x}"
+        self.close()
+        if color:
+            self.on_pick(color)
+
+    def close(self):
+        self.listener.stop()
+        self.grabber.close()
+        self.window.destroy()
+        self.on_close()
+
+
+def color_bar_ppm(table, width, height=40):
+    """
+    Return a table's color bar, sampled across its value domain, as binary
+    PPM data. Tk reads PPM natively, so no conversion step is needed, and
+    the data can be built outside the Tk thread.
+    """
+    import numpy as np
+    from colortable.lut import sample_domain
+
+    _, rgba = sample_domain(table, width)
+    pixels = np.broadcast_to(rgba[:, :3], (height, width, 3))
+    return f"P6 {width} {height} 255\n".encode() + pixels.tobytes()
+
+
+class LoadCancelled(Exception):
+    """
+    Raised inside a TableLoad's worker to abandon the load.
+    """
+
+
+class TableLoad:
+    """
+    Read and parse a table file in a worker thread.
+
+    The worker only publishes plain values: ``progress`` as the latest
+    (phase, done, total) report and ``result`` as (table, error) once it
+    finishes. The Tk loop polls them from a timer, so any number of progress
+    reports between two polls costs one redraw of the progress bar.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.diagnostics = []
+        self.progress = ('read', 0, 0)
+        self.result = None  # (table, error); both None when cancelled
+        self.seconds = 0.0
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        threading.Thread(target=self.run, name='colortable-open', daemon=True).start()
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.result = (load_cached(self.path, self.diagnostics, self.report), None)
+        except LoadCancelled:
+            self.result = (None, None)
+        except Exception as e:
+            self.result = (None, e)
+        self.seconds = time.perf_counter() - start
+        self.done.set()
+
+    def report(self, phase, done, total):
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+        self.progress = (phase, done, total)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class TransformDialog:
+    """
+    Window with the bulk transforms of ``colortable.transform``, applied to
+    the entries whose value lies in the From/To range (blank for the whole
+    table). Each transform is one undo step.
+    """
+
+    def __init__(self, app, on_close):
+        self.app = app
+        self.on_close = on_close
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Transform Entries")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        frame = ttk.Frame(self.window, padding=10)
+        frame.pack(fill="both", expand=True)
+
+        def field(row, column, label, value=''):
+            ttk.Label(frame, text=label).grid(row=row, column=column, sticky='e')
+            entry = ttk.Entry(frame, width=8)
+            entry.insert(0, value)
+            entry.grid(row=row, column=column + 1, padx=5, pady=3)
+            return entry
+
+        ttk.Label(frame, text="Entries:").grid(row=0, column=0, sticky='w')
+        self.low_entry = field(0, 1, "From value:")
+        self.high_entry = field(0, 3, "To value:")
+
+        ttk.Label(frame, text="Values:").grid(row=1, column=0, sticky='w')
+        self.scale_entry = field(1, 1, "Multiply by:", '1')
+        self.offset_entry = field(1, 3, "Then add:", '0')
+        ttk.Button(frame, text="Remap", command=self.remap).grid(row=1, column=7, padx=5)
+
+        ttk.Label(frame, text="Resample:").grid(row=2, column=0, sticky='w')
+        self.count_entry = field(2, 1, "Entries:", '16')
+        ttk.Button(frame, text="Resample", command=self.resample).grid(row=2, column=7, padx=5)
+
+        ttk.Label(frame, text="Colors:").grid(row=3, column=0, sticky='w')
+        self.hue_entry = field(3, 1, "Hue (deg):", '0')
+        self.lightness_entry = field(3, 3, "Lightness:", '0')
+        self.alpha_entry = field(3, 5, "Alpha x:", '1')
+        ttk.Button(frame, text="Adjust", command=self.adjust).grid(row=3, column=7, padx=5)
+
+    def number(self, entry, name, default=None, kind=float):
+        text = entry.get().strip()
+        if not text and default is not None:
+            return default
+        try:
+            return kind(text)
+        except ValueError:
+            raise ValueError(f"{name} must be a number, not {text!r}") from None
+
+    def run(self, transform, **kwargs):
+        try:
+            low = self.number(self.low_entry, "From value", default=-float('inf'))
+            high = self.number(self.high_entry, "To value", default=float('inf'))
+            kwargs = {name: self.number(*spec) for name, spec in kwargs.items()}
+            self.app.transform_entries(transform, low, high, **kwargs)
+        except ValueError as e:
+            messagebox.showerror("Transform Entries", str(e), parent=self.window)
+
+    def remap(self):
+        self.run('remap_values', scale=(self.scale_entry, "Multiply by"), offset=(self.offset_entry, "Then add"))
+
+    def resample(self):
+        self.run('resample', count=(self.count_entry, "Entries", None, int))
+
+    def adjust(self):
+        self.run('adjust_colors', hue=(self.hue_entry, "Hue"), lightness=(self.lightness_entry, "Lightness"),
+                 alpha=(self.alpha_entry, "Alpha"))
+
+    def close(self):
+        self.window.destroy()
+        self.on_close()
+
+
+class SimplifyDialog:
+    """
+    Window showing the table before and after simplification to a maximum
+    delta E. The fit runs in a worker thread, so typing a new tolerance or
+    editing the table never waits for it; Apply replaces the entries in one
+    undo step.
+    """
+    BAR_WIDTH = 600
+    POLL_MS = 50
+
+    def __init__(self, app, on_close):
+        from colortable.field import RenderWorker
+        from colortable.simplify import DEFAULT_MAX_DELTA_E, simplify
+
+        def fit(table, max_delta_e):
+            # Runs in the worker thread on a copy of the table
+            result = simplify(table, max_delta_e)
+            return result, color_bar_ppm(table, self.BAR_WIDTH, 30), color_bar_ppm(result.table, self.BAR_WIDTH, 30)
+
+        self.app = app
+        self.on_close = on_close
+        self.result = None
+        self.source = None  # Copy of the table the pending or shown fit is for
+        self.images = ()
+        self.closed = False
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Simplify Table")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        frame = ttk.Frame(self.window, padding=10)
+        frame.pack(fill="both", expand=True)
+
+        ttk.Label(frame, text="Max delta E:").grid(row=0, column=0, sticky='e')
+        self.delta_e_entry = ttk.Entry(frame, width=8)
+        self.delta_e_entry.insert(0, f"{DEFAULT_MAX_DELTA_E:g}")
+        self.delta_e_entry.grid(row=0, column=1, sticky='w', padx=5, pady=3)
+        self.delta_e_entry.bind("<Return>", lambda e: self.request())
+        ttk.Button(frame, text="Update", command=self.request).grid(row=0, column=2, padx=5)
+
+        ttk.Label(frame, text="Before:").grid(row=1, column=0, sticky='e')
+        self.before_label = tk.Label(frame)
+        self.before_label.grid(row=1, column=1, columnspan=3, sticky='w', padx=5, pady=3)
+        ttk.Label(frame, text="After:").grid(row=2, column=0, sticky='e')
+        self.after_label = tk.Label(frame)
+        self.after_label.grid(row=2, column=1, columnspan=3, sticky='w', padx=5, pady=3)
+        self.status_var = tk.StringVar(value="Fitting...")
+        ttk.Label(frame, textvariable=self.status_var).grid(row=3, column=0, columnspan=3, sticky='w', pady=3)
+        self.apply_button = ttk.Button(frame, text="Apply", command=self.apply, state='disabled')
+        self.apply_button.grid(row=3, column=3, sticky='e')
+
+        self.worker = RenderWorker(fit)
+        self.request()
+        self.window.after(self.POLL_MS, self.poll)
+
+    def request(self):
+        try:
+            max_delta_e = float(self.delta_e_entry.get())
+            if max_delta_e <= 0:
+                raise ValueError
+        except ValueError:
+            self.status_var.set("Max delta E must be a positive number")
+            return
+        self.result = None
+        self.apply_button.config(state='disabled')
+        self.status_var.set("Fitting...")
+        self.source = self.app.table.copy()
+        self.worker.submit(self.source, max_delta_e)
+
+    def poll(self):
+        if self.closed:
+            return
+        finished = self.worker.take()
+        if finished is not None:
+            value, error = finished
+            if error is not None:
+                self.status_var.set(f"Simplification failed: {error}")
+            else:
+                self.show(*value)
+        self.window.after(self.POLL_MS, self.poll)
+
+    def show(self, result, before, after):
+        self.result = result
+        self.images = (tk.PhotoImage(data=before, format='PPM'), tk.PhotoImage(data=after, format='PPM'))
+        self.before_label.config(image=self.images[0])
+        self.after_label.config(image=self.images[1])
+        self.status_var.set(f"{result.stops_before} entries -> {result.stops_after} entries, "
+                            f"max delta E {result.max_delta_e:.2f}")
+        self.apply_button.config(state='normal' if result.stops_after < result.stops_before else 'disabled')
+
+    def apply(self):
+        if self.result is None:
+            return
+        if self.app.table != self.source:
+            self.request()  # Edited since the fit; fit the current table instead
+            return
+        self.app.replace_stops(self.result.table.stops, 'Simplify Table')
+        self.request()
+
+    def close(self):
+        self.closed = True
+        self.worker.close()
+        self.window.destroy()
+        self.on_close()
+
+
+class FieldPreview:
+    """
+    Window showing a sample field (a .npy or raw grid) colored with the
+    current table.
+
+    Frames are rendered at window resolution from the field's pyramid in a
+    worker thread. The main loop only submits the newest view and table and
+    polls for finished frames, so panning, zooming and editing never wait
+    for a render. While a frame is pending, panning moves the last frame so
+    the field keeps following the cursor.
+    """
+    WIDTH, HEIGHT = 800, 600
+    FRAME_MS = 30      # Poll interval for finished frames
+    ZOOM_STEP = 1.25   # Zoom factor per wheel notch
+
+    def __init__(self, app, grid, name, on_close):
+        from colortable.field import FieldRenderer, RenderWorker, View
+
+        self.app = app
+        self.grid = grid
+        self.on_close = on_close
+        self.fit_view = lambda: View.fit(grid.shape, *self.size)
+        renderer = FieldRenderer(grid)
+
+        def render(table, view, width, height):
+            # Runs in the worker thread; Tk only gets the finished PPM data
+            frame = renderer.frame(table, view, width, height)
+            return frame, f"P6 {width} {height} 255\n".encode() + frame.pixels.tobytes()
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"Sample Field - {name}")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.canvas = tk.Canvas(self.window, width=self.WIDTH, height=self.HEIGHT, background='black',
+                                highlightthickness=0)
+        self.canvas.pack(fill='both', expand=True)
+        self.status_var = tk.StringVar(value=f"{grid.shape[1]} x {grid.shape[0]} {grid.dtype}: building overviews...")
+        ttk.Label(self.window, textvariable=self.status_var, anchor='w', font=('Courier', 8),
+                  relief='sunken').pack(fill='x')
+        self.image_item = self.canvas.create_image(0, 0, anchor='nw')
+        self.image = None
+        self.size = (self.WIDTH, self.HEIGHT)
+        self.view = self.fit_view()
+        self.shown_view = None  # View of the frame on the canvas
+        self.drag = None
+        self.closed = False
+        # Copied because the main loop keeps editing the table while a frame renders
+        self.table = app.table.copy()
+        self.worker = RenderWorker(render)
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.fit())
+        self.canvas.bind("<MouseWheel>", lambda e: self.on_zoom(e, e.delta > 0))
+        self.canvas.bind("<Button-4>", lambda e: self.on_zoom(e, True))
+        self.canvas.bind("<Button-5>", lambda e: self.on_zoom(e, False))
+        self.request()
+        self.window.after(self.FRAME_MS, self.poll)
+
+    def request(self):
+        self.worker.submit(self.table, self.view, *self.size)
+
+    def table_changed(self):
+        self.table = self.app.table.copy()
+        self.request()
+
+    def fit(self):
+        self.view = self.fit_view()
+        self.request()
+
+    def on_resize(self, event):
+        size = (max(event.width, 1), max(event.height, 1))
+        if size != self.size:
+            self.size = size
+            self.request()
+
+    def on_press(self, event):
+        self.drag = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.drag is None:
+            return
+        dx, dy = event.x - self.drag[0], event.y - self.drag[1]
+        self.drag = (event.x, event.y)
+        self.view = self.view.pan(dx, dy)
+        self.place_image()
+        self.request()
+
+    def on_zoom(self, event, zoom_in):
+        self.view = self.view.zoom(self.ZOOM_STEP if zoom_in else 1 / self.ZOOM_STEP, event.x, event.y)
+        self.request()
+
+    def place_image(self):
+        # Offset the shown frame by how far the view moved since it was requested
+        shown = self.shown_view
+        if shown is not None and shown.scale == self.view.scale:
+            self.canvas.coords(self.image_item, (shown.left - self.view.left) / shown.scale,
+                               (shown.top - self.view.top) / shown.scale)
+        else:
+            self.canvas.coords(self.image_item, 0, 0)
+
+    def poll(self):
+        if self.closed:
+            return
+        result = self.worker.take()
+        if result is not None:
+            value, error = result
+            if error is not None:
+                self.status_var.set(f"Render failed: {error}")
+            else:
+                self.show(*value)
+        self.window.after(self.FRAME_MS, self.poll)
+
+    def show(self, frame, data):
+        self.image = tk.PhotoImage(data=data, format='PPM')
+        self.canvas.itemconfigure(self.image_item, image=self.image)
+        self.shown_view = frame.view
+        self.place_image()
+        rows, cols = self.grid.shape
+        self.status_var.set(f"{cols} x {rows} {self.grid.dtype}  |  zoom {1 / frame.view.scale:.3g}x  |  "
+                            f"level {frame.level}  |  {frame.seconds * 1000:.0f} ms  |  "
+                            "drag to pan, wheel to zoom, double-click to fit")
+
+    def close(self):
+        self.closed = True
+        self.worker.close()
+        self.window.destroy()
+        self.on_close()
 
 
 class ColorTableApp:
+    HUD_SPANS = ('open', 'parse', 'reload', 'layout', 'preview', 'save')  # Timings shown in the performance bar
+    PREVIEW_DELAY_MS = 150  # Quiet time before the auto preview redraws
+    PREVIEW_MARGIN = 10     # Space left and right of the preview bar
+    ANALYSIS_HEIGHT = 60    # Height of the analysis overlay under the preview
+    INTERPOLATION_LABELS = {'rgb': 'sRGB', 'lab': 'CIELAB', 'oklab': 'OKLab', 'hsluv': 'HSLuv'}
+    LOAD_POLL_MS = 50       # Progress refresh interval while a file opens
+    WATCH_POLL_MS = 500     # How often a watched file is checked for changes
+    WATCH_SETTLE_MS = 200   # Quiet time after a change before the file is reloaded
+
     def __init__(self, root):
         self.root = root
         self.root.title("Color Table Creator")
-        self.color_entries = []
+        self.table = ColorTable(rf=WHITE)
+        self.color_bar_cache = None  # (key, PhotoImage) of the last preview bar
+        self.batch_depth = 0  # Nesting level of batch() blocks
+        self.picker = None  # Active ScreenColorPicker
+        self.pick_sample_var = tk.IntVar(value=1)  # Picker averages an N x N square
+        self.hud_var = tk.BooleanVar(value=bool(profiler.report_path))
+        self.auto_preview_var = tk.BooleanVar(value=True)
+        self.save_dialect_var = tk.StringVar(value='auto')  # 'auto' keeps the dialect of the opened file
+        self.history = History()
+        self.preview_job = None    # Pending auto preview after() id
+        self.preview_state = None  # Layout and stops of the drawn preview
+        self.analysis_var = tk.BooleanVar(value=False)
+        self.compare_table = None  # Table the analysis overlay compares against
+        self.compare_name = ''
+        self.field_preview = None  # Open FieldPreview window
+        self.transform_dialog = None  # Open TransformDialog window
+        self.simplify_dialog = None   # Open SimplifyDialog window
+        self.table_load = None     # TableLoad in progress
+        self.file_path = None      # File the table was opened from or last saved to
+        self.disk_state = None     # table_state() of that file as last read or written
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watcher = None        # FileWatcher of file_path while watching
+        self.watch_job = None      # Pending poll_watch after() id
+        self.watch_pending = False # A change was seen and the file is settling
+        self.watch_load = None     # TableLoad re-reading the watched file
         self.setup_ui()
+        profiler.listeners.append(self.on_span)
 
     def setup_ui(self):
         # File menu
@@ -22,10 +846,45 @@ class ColorTableApp:
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Open Color Table", command=self.open_color_table)
         file_menu.add_command(label="Save Color Table", command=self.save_color_table)
+        format_menu = tk.Menu(file_menu, tearoff=0)
+        for label, dialect in (("Same as Opened File", 'auto'), ("Legacy (Product:/Color:)", 'legacy'),
+                               ("ColorTable Block", 'block')):
+            format_menu.add_radiobutton(label=label, variable=self.save_dialect_var, value=dialect)
+        file_menu.add_cascade(label="Save Format", menu=format_menu)
+        file_menu.add_command(label="Export Table...", command=self.export_color_table)
+        file_menu.add_checkbutton(label="Watch File for Changes", variable=self.watch_var, command=self.restart_watch)
+        file_menu.add_separator()
+        file_menu.add_command(label="Clear Table Cache", command=self.clear_table_cache)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.root.quit)
         menubar.add_cascade(label="File", menu=file_menu)
+
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Paste Color Entries", command=self.paste_color_entries)
+        edit_menu.add_command(label="Transform Entries...", command=self.open_transform_dialog)
+        edit_menu.add_command(label="Simplify Table...", command=self.open_simplify_dialog)
+        sample_menu = tk.Menu(edit_menu, tearoff=0)
+        for size in (1, 3, 5, 9):
+            sample_menu.add_radiobutton(label=f"{size} x {size} Average", variable=self.pick_sample_var, value=size)
+        edit_menu.add_cascade(label="Screen Picker Sample", menu=sample_menu)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_checkbutton(label="Performance Bar", variable=self.hud_var, command=self.toggle_hud)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Analysis Overlay", variable=self.analysis_var, command=self.toggle_analysis)
+        view_menu.add_command(label="Compare With Table...", command=self.compare_with_table)
+        view_menu.add_command(label="Clear Comparison", command=self.clear_comparison)
+        view_menu.add_separator()
+        view_menu.add_command(label="Sample Field Preview...", command=self.open_field_preview)
+        menubar.add_cascade(label="View", menu=view_menu)
         self.root.config(menu=menubar)
+        self.root.bind_all("<Control-z>", lambda e: self.undo())
+        self.root.bind_all("<Control-y>", lambda e: self.redo())
+        self.root.bind_all("<Control-Z>", lambda e: self.redo())
 
         # Product, Units, Scale, Offset, Step, and RF settings
         frame_settings = ttk.LabelFrame(self.root, text="Settings")
@@ -54,6 +913,14 @@ class ColorTableApp:
         self.step_entry = ttk.Entry(frame_settings, width=15)
         self.step_entry.grid(row=2, column=1, padx=5, pady=5)
 
+        # Color space gradient bands are interpolated in
+        ttk.Label(frame_settings, text="Interpolation:").grid(row=2, column=2, sticky='e')
+        self.interpolation_var = tk.StringVar(value=self.INTERPOLATION_LABELS['rgb'])
+        ttk.OptionMenu(
+            frame_settings, self.interpolation_var, self.INTERPOLATION_LABELS['rgb'],
+            *self.INTERPOLATION_LABELS.values(), command=self.select_interpolation
+        ).grid(row=2, column=3, sticky='w', padx=5, pady=5)
+
         # Row 3: RF Color Selector
         ttk.Label(frame_settings, text="RF:").grid(row=3, column=0, sticky='e')
         self.rf_color_preview = tk.Label(
@@ -67,22 +934,11 @@ class ColorTableApp:
         )
         self.rf_color_button.grid(row=3, column=2, padx=5, pady=5)
 
-        # Scrollable frame for color entries with both vertical and horizontal scrollbars
+        # Virtualized list of color entries with both vertical and horizontal scrollbars
         frame_colors = ttk.LabelFrame(self.root, text="Color Entries")
         frame_colors.pack(fill="both", expand=True, padx=10, pady=5)
 
-        canvas = tk.Canvas(frame_colors)
-        self.scroll_frame = ttk.Frame(canvas)
-        scroll_y = ttk.Scrollbar(frame_colors, orient="vertical", command=canvas.yview)
-        scroll_x = ttk.Scrollbar(frame_colors, orient="horizontal", command=canvas.xview)
-
-        canvas.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
-        scroll_y.pack(side="right", fill="y")
-        scroll_x.pack(side="bottom", fill="x")
-        canvas.pack(side="left", fill="both", expand=True)
-        canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
-
-        self.scroll_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        self.color_list = ColorEntryList(self, frame_colors)
 
         # Add color button
         frame_buttons = ttk.Frame(self.root)
@@ -94,207 +950,225 @@ class ColorTableApp:
         self.preview_button = ttk.Button(frame_buttons, text="Preview Color Table", command=self.preview_color_table)
         self.preview_button.pack(side="right")
 
+        ttk.Checkbutton(
+            frame_buttons, text="Auto Preview", variable=self.auto_preview_var, command=self.schedule_preview
+        ).pack(side="right", padx=5)
+
         # Preview canvas (increase height to accommodate labels)
         self.preview_canvas = tk.Canvas(self.root, height=70)  # Increased height
         self.preview_canvas.pack(fill="x", padx=10, pady=5)
-
-    def clean_line(self, line):
+        self.preview_canvas.bind("<Configure>", lambda e: self.schedule_preview())
+
+        # Delta E per unit, banding hotspots, lightness and comparison, shown from the View menu
+        self.analysis_canvas = tk.Canvas(self.root, height=self.ANALYSIS_HEIGHT, background='white')
+        # Settings are written to the table, and recorded for undo, when a field is left
+        for name in self.table.settings():
+            setting_entry = getattr(self, f"{name}_entry")
+            setting_entry.bind("<FocusOut>", lambda e: self.commit_settings(), add="+")
+            setting_entry.bind("<Return>", lambda e: self.commit_settings(), add="+")
+        # Ticks follow the Step and Units fields
+        for setting_entry in (self.step_entry, self.units_entry):
+            setting_entry.bind("<KeyRelease>", lambda e: self.schedule_preview())
+
+        # Progress of a file being opened, shown only while a load is running
+        self.load_frame = ttk.Frame(self.root)
+        self.load_label = ttk.Label(self.load_frame, width=40, anchor='w')
+        self.load_label.pack(side="left")
+        ttk.Button(self.load_frame, text="Cancel", command=self.cancel_table_load).pack(side="right")
+        self.load_bar = ttk.Progressbar(self.load_frame, mode='determinate', maximum=1.0)
+        self.load_bar.pack(side="left", fill="x", expand=True, padx=5)
+
+        # Performance bar with the last span timings and Tk object counts
+        self.hud_label = ttk.Label(self.root, anchor='w', font=('Courier', 8), relief='sunken')
+        self.toggle_hud()
+
+    def toggle_hud(self):
+        if self.hud_var.get():
+            self.hud_label.pack(side="bottom", fill="x")
+            self.update_hud()
+        else:
+            self.hud_label.pack_forget()
+
+    def on_span(self, name, seconds):
+        # Nested spans are reported with the operation that contains them
+        if not profiler.depth and self.hud_var.get():
+            self.update_hud()
+
+    def update_hud(self):
+        timings = [
+            f"{name} {profiler.last[name] * 1000:.1f} ms" for name in self.HUD_SPANS if name in profiler.last
+        ]
+        widgets, pending = 0, [self.root]
+        while pending:
+            children = pending.pop().winfo_children()
+            widgets += len(children)
+            pending.extend(children)
+        counts = (f"canvas items {len(self.preview_canvas.find_all())}, "
+                  f"rows {len(self.color_list.rows)}, widgets {widgets}, stops {len(self.table.stops)}")
+        self.hud_label.config(text="  ".join(timings or ["no timings yet"]) + "  |  " + counts)
+
+    @contextmanager
+    def batch(self):
         """
-        Remove any content following a ';' and trim whitespace.
+        Suspend sorting and row layout while many stops change, e.g. while a
+        file loads or entries are pasted. The table is sorted and the rows
+        are laid out once when the outermost batch ends.
         """
-        line = line.strip()
-        if ';' in line:
-            line = line.split(';', 1)[0].strip()
-        return line
+        self.batch_depth += 1
+        try:
+            with self.table.bulk():
+                yield
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.color_list.refresh()
+                self.schedule_preview()
 
     def refresh_color_entries(self):
         """
-        Sort the color_entries list based on the numeric value in 'value_entry'
-        and re-pack them into the GUI in sorted order.
+        Sort the table stops by value and redraw the visible rows.
         """
-        # Define a helper function to extract the numeric value
-        def get_entry_value(entry):
-            try:
-                return float(entry['value_entry'].get())
-            except ValueError:
-                # Assign a large number to push invalid entries to the end
-                return float('inf')
-
-        # Sort the color_entries list
-        self.color_entries.sort(key=get_entry_value)
-
-        # Re-pack the entries in sorted order
-        for entry in self.color_entries:
-            entry['frame'].pack_forget()  # Remove from current position
-        for entry in self.color_entries:
-            entry['frame'].pack(fill="x", pady=2)  # Re-pack in sorted order
-
-    def create_color_entry(self, value='', color_band=None):
-        """
-        Create a color entry in the GUI.
-
-        Parameters:
-        - value: The starting data value for the color band.
-        - color_band: A dictionary containing color band information:
-          - 'type': 'single', 'solid', 'gradient'
-          - 'format': 'rgb', 'rgba'
-          - 'start_color': Hex color string
-          - 'end_color': Hex color string (only for gradients)
-        """
-        color_row = ttk.Frame(self.scroll_frame)
-        color_row.pack(fill="x", pady=2)
-
-        value_entry = ttk.Entry(color_row, width=10)
-        value_entry.pack(side="left", padx=5)
-        value_entry.insert(0, value)
-
-        # Bind the value_entry to refresh entries on value change
-        value_entry.bind("<FocusOut>", lambda e: self.refresh_color_entries())
-        value_entry.bind("<Return>", lambda e: self.refresh_color_entries())
-
-        # Store the color band info
-        color_info = {
-            'type': 'single',
-            'format': 'rgb',
-            'start_color': '#FFFFFF',
-            'end_color': None,
-            'start_alpha': 255,
-            'end_alpha': 255
-        }
-        if color_band:
-            color_info.update(color_band)
-
-        # Get band type from color_info if available
-        initial_band_type = color_info.get('type', 'single').capitalize()
-        band_type_var = tk.StringVar(value=initial_band_type)
-        band_type_menu = ttk.OptionMenu(color_row, band_type_var, initial_band_type, 'Single', 'Solid', 'Gradient')
-        band_type_menu.pack(side="left", padx=5)
-
-        # Color format selector
-        initial_color_format = color_info.get('format', 'rgb').upper()
-        color_format_var = tk.StringVar(value=initial_color_format)
-        color_format_menu = ttk.OptionMenu(color_row, color_format_var, initial_color_format, 'RGB', 'RGBA')
-        color_format_menu.pack(side="left", padx=5)
-
-        # Color previews
-        start_color_preview = tk.Label(
-            color_row, width=3, background=color_info['start_color'],
-            relief="solid", borderwidth=1
-        )
-        start_color_preview.pack(side="left", padx=5)
-        start_color_preview.color_value = color_info['start_color']
-        start_color_preview.alpha_value = color_info.get('start_alpha', 255)
-
-        start_color_button = ttk.Button(
-            color_row, text="Start Color",
-            command=lambda cp=start_color_preview: self.select_color(cp, color_format_var)
-        )
-        start_color_button.pack(side="left", padx=5)
+        if self.batch_depth:
+            return
+        self.table.sort()
+        self.color_list.refresh()
+        self.schedule_preview()
 
-        # Pick Screen Color Button
-        pick_screen_color_button = ttk.Button(
-            color_row, text="Pick Screen Color",
-            command=lambda cp=start_color_preview: self.pick_screen_color(cp, color_format_var)
-        )
-        pick_screen_color_button.pack(side="left", padx=5)
-
-        # Initialize 'end_color_preview' and 'end_color_button' as None
-        entry = {
-            'frame': color_row,
-            'value_entry': value_entry,
-            'band_type_var': band_type_var,
-            'color_format_var': color_format_var,
-            'start_color_preview': start_color_preview,
-            'end_color_preview': None,
-            'end_color_button': None,
-            'end_pick_screen_color_button': None,  # To handle end color picking
-            'color_info': color_info
-        }
-
-        # Append to color_entries
-        self.color_entries.append(entry)
-
-        # Refresh the entries to sort them
-        self.refresh_color_entries()
-
-        def update_band_type(*args):
-            band_type = band_type_var.get().lower()
-            # Show/hide end color widgets based on band type
-            if band_type == 'gradient':
-                if entry['end_color_preview'] is None:
-                    # Create end color widgets
-                    end_color_preview = tk.Label(
-                        color_row, width=3,
-                        background=color_info.get('end_color', '#FFFFFF'),
-                        relief="solid", borderwidth=1
-                    )
-                    end_color_preview.pack(side="left", padx=5)
-                    end_color_preview.color_value = color_info.get('end_color', '#FFFFFF')
-                    end_color_preview.alpha_value = color_info.get('end_alpha', 255)
-
-                    end_color_button = ttk.Button(
-                        color_row, text="End Color",
-                        command=lambda cp=end_color_preview: self.select_color(cp, color_format_var)
-                    )
-                    end_color_button.pack(side="left", padx=5)
-
-                    # Add Pick Screen Color Button for End Color
-                    end_pick_screen_color_button = ttk.Button(
-                        color_row, text="Pick Screen Color",
-                        command=lambda cp=end_color_preview: self.pick_screen_color(cp, color_format_var)
-                    )
-                    end_pick_screen_color_button.pack(side="left", padx=5)
-
-                    # Store in entry
-                    entry['end_color_preview'] = end_color_preview
-                    entry['end_color_button'] = end_color_button
-                    entry['end_pick_screen_color_button'] = end_pick_screen_color_button
-                else:
-                    # Widgets already exist; make sure they're visible
-                    entry['end_color_preview'].pack(side="left", padx=5)
-                    entry['end_color_button'].pack(side="left", padx=5)
-                    entry['end_pick_screen_color_button'].pack(side="left", padx=5)
-            else:
-                # Hide end color widgets
-                if entry['end_color_preview'] is not None:
-                    entry['end_color_preview'].pack_forget()
-                    entry['end_color_button'].pack_forget()
-                    entry['end_pick_screen_color_button'].pack_forget()
-
-            # Update color_info
-            color_info['type'] = band_type
-
-        # Bind the band type selector to update widgets
-        band_type_var.trace_add('write', update_band_type)
-        update_band_type()  # Initialize UI correctly
-
-        # Bind the color format selector to update color selection
-        def update_color_format(*args):
-            # Update color_info
-            color_info['format'] = color_format_var.get().lower()
-
-        color_format_var.trace_add('write', update_color_format)
-        update_color_format()  # Initialize UI correctly
-
-        remove_button = ttk.Button(
-            color_row, text="Remove",
-            command=lambda cr=color_row: self.remove_color_entry(cr)
-        )
-        remove_button.pack(side="right", padx=5)
+    def commit_value(self, stop, before, hint=None):
+        """
+        Record a typed value for undo and move the stop to its sorted position.
+        """
+        self.record_stop_edit(stop, before)
+        self.reposition_stop(stop, hint)
+
+    def record_stop_edit(self, stop, before):
+        after = stop.snapshot()
+        if after != before:
+            self.history.record(StopEdit(self.table, stop, before, after))
+
+    def undo(self):
+        self.apply_history(self.history.undo)
+
+    def redo(self):
+        self.apply_history(self.history.redo)
+
+    def apply_history(self, action):
+        # Typed values and settings become history entries before stepping
+        for row in self.color_list.rows:
+            row.commit()
+        self.commit_settings()
+        file_path = self.file_path
+        if action() is not None:
+            if self.file_path != file_path:
+                self.restart_watch()  # Undid or redid an open; watch that table's file
+            self.show_settings()
+            self.color_list.refresh()
+            self.schedule_preview()
+
+    def reposition_stop(self, stop, hint=None):
+        """
+        Move a stop whose value was edited to its sorted position.
+        """
+        try:
+            self.table.reposition(stop, hint)
+        except ValueError:
+            return  # Removed, or the table was replaced meanwhile
+        self.color_list.refresh()
+        self.schedule_preview()
+
+    def paste_color_entries(self):
+        """
+        Add the color entries of a table, or of a few of its lines, from the
+        clipboard.
+        """
+        try:
+            pasted = loads(self.root.clipboard_get())
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to paste color entries: {e}")
+            return
+        if not pasted.stops:
+            messagebox.showinfo("Paste Color Entries", "The clipboard holds no color entries.")
+            return
+        with self.batch():
+            for stop in pasted.stops:
+                self.table.add(stop)
+        self.history.record(AddStops(self.table, pasted.stops))
+
+    def open_transform_dialog(self):
+        if self.transform_dialog is None:
+            self.transform_dialog = TransformDialog(self, self.transform_dialog_closed)
+        self.transform_dialog.window.lift()
+
+    def transform_dialog_closed(self):
+        self.transform_dialog = None
+
+    def transform_entries(self, name, low, high, **kwargs):
+        """
+        Run the bulk transform ``name`` of colortable.transform over the
+        entries with a value in [low, high], record it as one undo step and
+        refresh the rows and preview once.
+        """
+        from colortable import transform
+
+        for row in self.color_list.rows:
+            row.commit()
+        self.commit_settings()
+        stops = transform.select(self.table, low, high)
+        if not stops:
+            messagebox.showinfo("Transform Entries", "No entries have a value in that range.")
+            return
+        if name == 'resample':
+            removed, added = transform.resample(self.table, stops=stops, **kwargs)
+            if not added:
+                return  # Fewer than two distinct values in the range
+            with self.history.group('Resample Entries'):
+                self.history.record(RemoveStops(self.table, removed))
+                self.history.record(AddStops(self.table, added))
+        else:
+            before = [stop.snapshot() for stop in stops]
+            getattr(transform, name)(self.table, stops=stops, **kwargs)
+            after = [stop.snapshot() for stop in stops]
+            if after != before:
+                self.history.record(StopsEdit(self.table, stops, before, after))
+        self.color_list.refresh()
+        self.schedule_preview()
+
+    def open_simplify_dialog(self):
+        if self.simplify_dialog is None:
+            self.simplify_dialog = SimplifyDialog(self, self.simplify_dialog_closed)
+        self.simplify_dialog.window.lift()
+
+    def simplify_dialog_closed(self):
+        self.simplify_dialog = None
+
+    def replace_stops(self, stops, label):
+        """
+        Replace every entry with a value by ``stops`` as one undo step,
+        keeping the settings and the table object.
+        """
+        for row in self.color_list.rows:
+            row.commit()
+        self.commit_settings()
+        removed = self.table.valid_stops()
+        stops = [stop.copy() for stop in stops]
+        with self.history.group(label), self.batch():
+            self.table.remove_many(removed)
+            self.history.record(RemoveStops(self.table, removed))
+            for stop in stops:
+                self.table.add(stop)
+            self.history.record(AddStops(self.table, stops))
 
     def add_color_entry(self):
-        self.create_color_entry()
+        stop = self.table.add(ColorStop())
+        self.history.record(AddStops(self.table, [stop]))
+        self.color_list.see(stop).value_entry.focus_set()
 
-    def remove_color_entry(self, color_row):
-        # Remove the entry from color_entries and destroy the frame
-        for entry in self.color_entries:
-            if entry['frame'] == color_row:
-                color_row.destroy()
-                self.color_entries.remove(entry)
-                break
-
-        # Refresh the entries to sort them
-        self.refresh_color_entries()
+    def remove_color_entry(self, stop):
+        if stop is not None:
+            self.table.remove(stop)
+            self.history.record(RemoveStops(self.table, [stop]))
+            self.color_list.refresh()
+            self.schedule_preview()
 
     def select_color(self, color_preview, color_format_var):
         # Get the current color value of the color preview label
@@ -310,65 +1184,53 @@ class ColorTableApp:
                     minvalue=0, maxvalue=255, initialvalue=color_preview.alpha_value
                 )
                 if alpha is not None:
-                    color_preview.config(background=color)
-                    color_preview.color_value = color
-                    color_preview.alpha_value = alpha
+                    self.set_preview_color(color_preview, color, alpha)
         else:
             color = askcolor(color=current_color)[1]
             if color:
-                color_preview.config(background=color)
-                color_preview.color_value = color
-                color_preview.alpha_value = 255  # Default alpha
+                self.set_preview_color(color_preview, color, 255)  # Default alpha
+
+    def set_preview_color(self, color_preview, color, alpha, on_change=None, stop=None):
+        """
+        Write a new color into the stop shown by a row's preview label.
+        ``on_change`` and ``stop`` override the label's current target.
+        """
+        stop = stop or color_preview.stop
+        before = stop.snapshot()
+        (on_change or color_preview.on_change)(color, alpha)
+        self.record_stop_edit(stop, before)
+        self.color_list.refresh()
+        self.schedule_preview()
 
     def pick_screen_color(self, color_preview, color_format_var):
         """
         Allows the user to pick a color from anywhere on the screen via a mouse click.
         """
+        if self.picker is not None:
+            return
+        # Remember the target now: the row may show another stop by the time of the click
+        on_change = color_preview.on_change
+        stop = color_preview.stop
+        current_alpha = color_preview.alpha_value
+        use_alpha = color_format_var.get().lower() == 'rgba'
+
+        def on_pick(hex_color):
+            # The screen has no alpha channel; RGBA picks are opaque
+            alpha = 255 if use_alpha else current_alpha
+            self.set_preview_color(color_preview, hex_color, alpha, on_change, stop)
+
+        def on_close():
+            self.picker = None
+            self.root.deiconify()  # Restore the main window
+            self.root.lift()
+
         # Minimize the main window to allow the user to see the screen
         self.root.withdraw()
-        time.sleep(0.2)  # Wait for the window to minimize
-
-        # Inform the user
-        messagebox.showinfo("Pick Color", "After clicking OK, click anywhere on the primary screen to select a color.")
-
-        # Function to handle the mouse click
-        def on_click(x, y, button, pressed):
-            if pressed:
-                try:
-                    # Get the primary screen size
-                    screen_width, screen_height = pyautogui.size()
-
-                    # Check if the click is within the primary screen
-                    if x < 0 or y < 0 or x > screen_width or y > screen_height:
-                        messagebox.showerror("Invalid Selection", "Selected position is outside the primary monitor.")
-                        self.root.deiconify()  # Restore the main window
-                        return False  # Stop listener
-
-                    # Get the color of the pixel at the clicked position
-                    screenshot = ImageGrab.grab()
-                    selected_color = screenshot.getpixel((x, y))
-
-                    # Update the color preview
-                    if selected_color:
-                        hex_color = "#{:02x}{:02x}{:02x}".format(*selected_color[:3])
-                        self.root.deiconify()  # Restore the main window
-                        self.root.lift()        # Bring it to the front
-                        color_preview.config(background=hex_color)
-                        color_preview.color_value = hex_color
-                        if color_format_var.get().lower() == 'rgba':
-                            # Handle alpha if available
-                            alpha = selected_color[3] if len(selected_color) > 3 else 255
-                            color_preview.alpha_value = alpha
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to capture color: {e}")
-                finally:
-                    self.root.deiconify()  # Ensure the window is restored
-                # Stop the listener after one click
-                return False
-
-        # Start the mouse listener in a separate thread
-        listener = mouse.Listener(on_click=on_click)
-        listener.start()
+        try:
+            self.picker = ScreenColorPicker(self.root, self.pick_sample_var.get(), on_pick, on_close)
+        except Exception as e:
+            self.root.deiconify()
+            messagebox.showerror("Error", f"Failed to start the screen color picker: {e}")
 
     def select_rf_color(self):
         # Get the current RF color
@@ -377,79 +1239,131 @@ class ColorTableApp:
         color = askcolor(color=current_color)[1]
         if color:
             self.rf_color_preview.config(background=color)
+            before = self.table.rf
+            self.table.rf = pack_hex(color)
+            self.history.record(SettingsEdit(self.table, {'rf': before}, {'rf': self.table.rf}))
+            self.schedule_preview()
+
+    def select_interpolation(self, label):
+        interpolation = next(name for name, text in self.INTERPOLATION_LABELS.items() if text == label)
+        if interpolation != self.table.interpolation:
+            before = self.table.interpolation
+            self.table.interpolation = interpolation
+            self.history.record(SettingsEdit(
+                self.table, {'interpolation': before}, {'interpolation': interpolation}
+            ))
+            self.schedule_preview()
 
     def preview_color_table(self):
+        with span('preview'):
+            self.draw_preview()
+            self.draw_analysis()
+        self.update_field_preview()
+
+    def schedule_preview(self):
+        """
+        Redraw the preview once edits pause, when Auto Preview is on. Every
+        change restarts the delay, so typing never waits for a redraw.
+        """
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+            self.preview_job = None
+        if self.auto_preview_var.get():
+            self.preview_job = self.root.after(self.PREVIEW_DELAY_MS, self.auto_preview)
+
+    def auto_preview(self):
+        self.preview_job = None
+        with span('preview'):
+            if not self.update_preview():
+                self.draw_preview()
+            self.draw_analysis()
+        self.update_field_preview()
+
+    def preview_layout(self, stops):
+        """
+        Return what the preview's ticks and pixel positions depend on.
+        """
+        width = max(int(self.preview_canvas.winfo_width() - 2 * self.PREVIEW_MARGIN), 1)
+        return (width, stops[0].value, stops[-1].value, self.step_entry.get(), self.units_entry.get().strip(),
+                self.table.interpolation)
+
+    def update_preview(self):
+        """
+        Redraw only the columns of the preview bar covered by bands whose
+        stops changed since the last draw. Returns False when the layout
+        changed and a full redraw is needed.
+        """
+        state = self.preview_state
+        stops = self.table.valid_stops()
+        if state is None or len(stops) < 2 or self.preview_layout(stops) != state['layout']:
+            return False
+        min_val, max_val = state['layout'][1:3]
+        keys = [(stop.value, stop.type, stop.start, stop.end) for stop in stops]
+        old_keys = state['keys']
+
+        # Changed stops lie between the common prefix and the common suffix
+        common = min(len(keys), len(old_keys))
+        first = 0
+        while first < common and keys[first] == old_keys[first]:
+            first += 1
+        last = 0
+        while last < common - first and keys[-1 - last] == old_keys[-1 - last]:
+            last += 1
+        if first < len(keys) or first < len(old_keys):
+            # A stop's value also ends the band below it; the first unchanged
+            # stop after the change starts a band that is unaffected
+            low = keys[first - 1][0] if first else min_val
+            high = keys[len(keys) - last][0] if last else None
+            self.redraw_bar_columns(state['image'], min_val, max_val, low, high)
+            state['keys'] = keys
+
+        self.preview_canvas.itemconfig(state['rf_item'], fill=self.table.rf_color)
+        return True
+
+    def redraw_bar_columns(self, image, min_val, max_val, low, high):
+        """
+        Resample the preview bar pixels whose values lie in [low, high), or
+        above ``low`` when ``high`` is None.
+        """
+        import numpy as np
+        from colortable.lut import colorize_values, table_fingerprint
+
+        width = image.width()
+        span_val = max_val - min_val
+        if span_val > 0:
+            x0 = max(int((low - min_val) / span_val * width - 0.5), 0)
+            x1 = width if high is None else min(int((high - min_val) / span_val * width + 0.5) + 1, width)
+        else:
+            x0, x1 = 0, width
+        if x1 <= x0:
+            return
+        values = min_val + (np.arange(x0, x1) + 0.5) / width * span_val
+        rgba = colorize_values(self.table, values)
+        # One row of colors; Tk tiles it down the height of the region
+        row = "{" + " ".join(f"#{r:02x}{g:02x}{b:02x}" for r, g, b, _ in rgba.tolist()) + "}"
+        image.put(row, to=(x0, 0, x1, image.height()))
+        self.color_bar_cache = ((width, table_fingerprint(self.table)), image)
+
+    def draw_preview(self):
         self.preview_canvas.delete("all")
+        self.preview_state = None
         # Update the canvas to get the correct width
         self.preview_canvas.update_idletasks()
         total_width = self.preview_canvas.winfo_width()
         height = self.preview_canvas.winfo_height()
 
-        margin = 10  # Define a margin on both sides
+        margin = self.PREVIEW_MARGIN  # Define a margin on both sides
         width = total_width - 2 * margin  # Adjusted width for drawing
 
-        # Collect entries that have both value and color set
-        entries = []
-        for entry in self.color_entries:
-            value_entry = entry['value_entry']
-            color_info = entry['color_info']
-            band_type = entry['band_type_var'].get().lower()
-            color_format = entry['color_format_var'].get().lower()
-            start_color_preview = entry['start_color_preview']
-            end_color_preview = entry.get('end_color_preview')  # Use .get() in case it's None
-            if value_entry.get().lstrip('-').replace('.', '', 1).isdigit():
-                value = float(value_entry.get())
-                start_color = start_color_preview.color_value
-                start_alpha = getattr(start_color_preview, 'alpha_value', 255)
-                end_color = None
-                end_alpha = 255
-                if band_type == 'gradient' and end_color_preview:
-                    end_color = end_color_preview.color_value
-                    end_alpha = getattr(end_color_preview, 'alpha_value', 255)
-                entries.append({
-                    'value': value,
-                    'color_info': {
-                        'type': band_type,
-                        'format': color_format,
-                        'start_color': start_color,
-                        'start_alpha': start_alpha,
-                        'end_color': end_color,
-                        'end_alpha': end_alpha
-                    }
-                })
-
-        if len(entries) > 1:
-            # Sort entries by value
-            entries.sort(key=lambda x: x['value'])
-            values = [e['value'] for e in entries]
-            min_val, max_val = min(values), max(values)
-            if max_val - min_val == 0:
-                color_width = width
-            else:
-                color_width = width / (max_val - min_val)
-
-            # Draw the color bar
-            for i in range(len(entries)):
-                x0 = margin + (entries[i]['value'] - min_val) * color_width
-                x1 = margin + (entries[i + 1]['value'] - min_val) * color_width if i + 1 < len(entries) else margin + width
-                color_info = entries[i]['color_info']
-
-                if color_info['type'] == 'gradient' and color_info['end_color']:
-                    # Draw gradient between start_color and end_color
-                    steps = max(int(x1 - x0), 1)
-                    for j in range(steps):
-                        ratio = j / steps
-                        start_rgb = self.hex_to_rgb(color_info['start_color'])
-                        end_rgb = self.hex_to_rgb(color_info['end_color'])
-                        r = int(start_rgb[0] + (end_rgb[0] - start_rgb[0]) * ratio)
-                        g = int(start_rgb[1] + (end_rgb[1] - start_rgb[1]) * ratio)
-                        b = int(start_rgb[2] + (end_rgb[2] - start_rgb[2]) * ratio)
-                        color = f'#{r:02x}{g:02x}{b:02x}'
-                        self.preview_canvas.create_line(x0 + j, 0, x0 + j, 40, fill=color)
-                else:
-                    # Draw solid color
-                    fill_color = color_info['start_color']
-                    self.preview_canvas.create_rectangle(x0, 0, x1, 40, fill=fill_color, outline="")
+        # Only stops with a value set take part in the preview
+        stops = self.table.valid_stops()
+
+        if len(stops) > 1:
+            min_val, max_val = stops[0].value, stops[-1].value
+
+            # Draw the color bar as a single image; ticks and RF are the only vector items
+            bar = self.color_bar_image(max(int(width), 1))
+            self.preview_canvas.create_image(margin, 0, image=bar, anchor='nw')
 
             # Draw tick marks and labels
             step_value = self.step_entry.get()
@@ -483,289 +1397,371 @@ class ColorTableApp:
                 self.preview_canvas.create_text(x, 55, text=label, anchor='n', font=('Arial', 8))
 
             # Optional: Display RF Color in Preview Canvas (e.g., as a separate indicator)
-            rf_color = self.rf_color_preview['background']
-            self.preview_canvas.create_rectangle(margin, 50, margin + 20, 60, fill=rf_color, outline="black")
+            rf_color = self.table.rf_color
+            rf_item = self.preview_canvas.create_rectangle(margin, 50, margin + 20, 60, fill=rf_color, outline="black")
             self.preview_canvas.create_text(margin + 30, 55, text="RF Color", anchor='w', font=('Arial', 8))
 
+            # Remembered so that auto preview can redraw only what changed
+            self.preview_state = {
+                'layout': self.preview_layout(stops),
+                'keys': [(stop.value, stop.type, stop.start, stop.end) for stop in stops],
+                'image': bar,
+                'rf_item': rf_item,
+            }
+
+    def color_bar_image(self, width, height=40):
+        """
+        Return the preview color bar as a PhotoImage. The bar is sampled in
+        one vectorized pass and cached until the canvas width or the table
+        colors change.
+        """
+        from colortable.lut import table_fingerprint
+
+        key = (width, table_fingerprint(self.table))
+        if self.color_bar_cache is None or self.color_bar_cache[0] != key:
+            image = tk.PhotoImage(data=color_bar_ppm(self.table, width, height), format='PPM')
+            self.color_bar_cache = (key, image)
+        return self.color_bar_cache[1]
+
     def open_color_table(self):
         file_path = filedialog.askopenfilename(
             filetypes=[("Color Table Files", "*.txt *.pal *.pal3 *.pal3.txt"), ("All Files", "*.*")]
         )
         if file_path:
-            try:
-                with open(file_path, 'r') as file:
-                    content = file.read()
-
-                # Clear existing color entries
-                for entry in self.color_entries:
-                    entry['frame'].destroy()
-                self.color_entries.clear()
-
-                # Reset RF color to default
-                self.rf_color_preview.config(background="#FFFFFF")
-
-                # Process lines to handle inline comments
-                lines = content.splitlines()
-                cleaned_lines = []
-                for line in lines:
-                    line = self.clean_line(line)
-                    if not line:
-                        continue  # Skip empty lines
-                    # Skip lines that start with other comment indicators
-                    if line.startswith(('#', '//')):
-                        continue
-                    cleaned_lines.append(line)
-
-                # Check for ColorTable block
-                if cleaned_lines and 'colortable' in cleaned_lines[0].lower():
-                    self.parse_colortable_block(cleaned_lines)
-                else:
-                    # Legacy parsing for older formats
-                    self.parse_legacy_format(cleaned_lines)
+            # Reading and parsing run in a worker; the current table stays until the new one is ready
+            if self.table_load is not None:
+                self.table_load.cancel()
+            self.table_load = TableLoad(file_path)
+            self.root.after(self.LOAD_POLL_MS, self.poll_table_load, self.table_load)
+
+    def poll_table_load(self, load):
+        if load is not self.table_load:
+            return  # Cancelled or replaced by another open
+        if not load.done.is_set():
+            phase, done, total = load.progress
+            action = "Reading" if phase == 'read' else "Parsing"
+            self.load_label.config(text=f"{action} {os.path.basename(load.path)}...")
+            self.load_bar.config(value=done / total if total else 0.0)
+            if not self.load_frame.winfo_ismapped():
+                self.load_frame.pack(side="bottom", fill="x", padx=10, pady=(0, 5))
+            self.root.after(self.LOAD_POLL_MS, self.poll_table_load, load)
+            return
+
+        self.table_load = None
+        self.load_frame.pack_forget()
+        table, error = load.result
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to load color table: {error}")
+            return
+        if table is None:
+            return
+        profiler.record('parse', load.seconds)
+        try:
+            with span('open'):
+                self.commit_settings()
+                old_table, old_file = self.table, (self.file_path, self.disk_state)
+                self.load_table(table)
+                # One entry holding the replaced table; undo brings it back
+                new_file = (load.path, table_state(table))
+                self.history.record(ReplaceTable(self, old_table, table, old_file, new_file))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load color table: {e}")
+            return
+        self.set_file(load.path)
+
+        if load.diagnostics:
+            self.show_diagnostics(load.diagnostics)
+        else:
+            messagebox.showinfo("Color Table Loaded", "Color table loaded successfully.")
 
-                messagebox.showinfo("Color Table Loaded", "Color table loaded successfully.")
+    def cancel_table_load(self):
+        """
+        Abandon the file being opened, keeping the current table.
+        """
+        if self.table_load is not None:
+            self.table_load.cancel()
+            self.table_load = None
+        self.load_frame.pack_forget()
 
+    def set_file(self, file_path):
+        """
+        Remember the file the table now matches on disk and watch it.
+        """
+        self.file_path = file_path
+        self.disk_state = table_state(self.table)
+        self.restart_watch()
+
+    def restart_watch(self):
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        if self.watch_job is not None:
+            self.root.after_cancel(self.watch_job)
+            self.watch_job = None
+        self.watch_pending = False
+        self.watch_load = None
+        if self.watch_var.get() and self.file_path:
+            self.watcher = open_watcher(self.file_path)
+            self.watch_job = self.root.after(self.WATCH_POLL_MS, self.poll_watch)
+
+    def poll_watch(self):
+        if self.watcher.changed():
+            # Scripts may write in several steps; reload once the file is quiet
+            self.watch_pending = True
+            delay = self.WATCH_SETTLE_MS
+        else:
+            if self.watch_pending and self.watch_load is None and self.table_load is None:
+                self.watch_pending = False
+                self.watch_load = TableLoad(self.file_path)
+                self.root.after(self.LOAD_POLL_MS, self.poll_watch_load, self.watch_load)
+            delay = self.WATCH_POLL_MS
+        self.watch_job = self.root.after(delay, self.poll_watch)
+
+    def poll_watch_load(self, load):
+        if load is not self.watch_load:
+            return  # The watch was restarted meanwhile
+        if not load.done.is_set():
+            self.root.after(self.LOAD_POLL_MS, self.poll_watch_load, load)
+            return
+        self.watch_load = None
+        table, error = load.result
+        # A file caught halfway through a write fails to parse; its next change retries
+        if table is not None and error is None and self.table_load is None:
+            self.reload_table(table)
+
+    def reload_table(self, disk):
+        """
+        Apply an external change of the watched file: only the stops that
+        were removed, added or changed on disk are touched, settings keep
+        local edits unless the file changed the same setting, and the list
+        stays on the entry it was scrolled to. The reload is one undo step.
+        """
+        if disk.rf is None:
+            disk.rf = WHITE
+        with span('reload'):
+            for row in self.color_list.rows:
+                row.commit()
+            self.commit_settings()
+            theirs, ours = table_state(disk), table_state(self.table)
+            settings = {name: value for name, value in theirs.items()
+                        if value != self.disk_state.get(name) and value != ours[name]}
+            diff = diff_stops(self.table, disk)
+            stops = self.table.stops
+            anchor = stops[self.color_list.first] if self.color_list.first < len(stops) else None
+
+            with self.history.group('Reload'), self.batch():
+                if diff.removed:
+                    self.table.remove_many(diff.removed)
+                    self.history.record(RemoveStops(self.table, diff.removed))
+                if diff.added:
+                    for stop in diff.added:
+                        self.table.add(stop)
+                    self.history.record(AddStops(self.table, diff.added))
+                for stop, after in diff.changed:
+                    before = stop.snapshot()
+                    stop.restore(after)
+                    self.history.record(StopEdit(self.table, stop, before, after))
+                if settings:
+                    before = {name: ours[name] for name in settings}
+                    for name, value in settings.items():
+                        setattr(self.table, name, value)
+                    self.history.record(SettingsEdit(self.table, before, settings))
+                    self.show_settings()
+            # The batch has sorted the stops; keep the top row on the same entry
+            if anchor is not None and id(anchor) not in {id(stop) for stop in diff.removed}:
+                self.color_list.first = self.table.index(anchor)
+                self.color_list.refresh()
+            self.disk_state = theirs
+
+    def toggle_analysis(self):
+        if self.analysis_var.get():
+            self.analysis_canvas.pack(fill="x", padx=10, pady=(0, 5), after=self.preview_canvas)
+            self.preview_color_table()
+        else:
+            self.analysis_canvas.pack_forget()
+
+    def compare_with_table(self):
+        """
+        Pick another revision of the table to show the per-value delta E
+        against in the analysis overlay.
+        """
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Color Table Files", "*.txt *.pal *.pal3 *.pal3.txt"), ("All Files", "*.*")]
+        )
+        if file_path:
+            try:
+                self.compare_table = load_cached(file_path, [])
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load color table: {e}")
+                return
+            self.compare_name = os.path.basename(file_path)
+            self.analysis_var.set(True)
+            self.toggle_analysis()
 
-    def parse_colortable_block(self, lines):
-        # Join lines to handle multi-line definitions
-        content = '\n'.join(lines)
-        # Extract the content inside the ColorTable { ... }
-        match = re.search(r'colortable\s*\{(.*)\}', content, re.IGNORECASE | re.DOTALL)
-        if not match:
-            raise ValueError("Invalid ColorTable block.")
-        block_content = match.group(1)
-
-        # Parse block content line by line
-        for line in block_content.split('\n'):
-            line = self.clean_line(line)
-            if not line:
-                continue  # Skip empty lines
-
-            if '=' in line:
-                key, rest = line.split('=', 1)
-                key = key.strip().lower()
-                rest = rest.strip().strip('"').strip("'")
-                if key == 'category':
-                    self.product_entry.delete(0, tk.END)
-                    self.product_entry.insert(0, rest)
-                elif key == 'units':
-                    self.units_entry.delete(0, tk.END)
-                    self.units_entry.insert(0, rest)
-                elif key == 'scale':
-                    self.scale_entry.delete(0, tk.END)
-                    self.scale_entry.insert(0, rest)
-                elif key == 'offset':
-                    self.offset_entry.delete(0, tk.END)
-                    self.offset_entry.insert(0, rest)
-                elif key == 'step':
-                    self.step_entry.delete(0, tk.END)
-                    self.step_entry.insert(0, rest)
-                elif key.startswith('color['):
-                    # Extract the value inside the brackets
-                    value_match = re.match(r'color\[(.*?)\]', key, re.IGNORECASE)
-                    if value_match:
-                        value = value_match.group(1)
-                        color_band = self.parse_color_band(rest)
-                        self.create_color_entry(value=value, color_band=color_band)
-                elif key == 'rf':
-                    # Handle RF Field
-                    rgb = rest.split()
-                    if len(rgb) == 3:
-                        try:
-                            r, g, b = map(int, rgb)
-                            # Validate RGB values
-                            if all(0 <= val <= 255 for val in (r, g, b)):
-                                hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-                                self.rf_color_preview.config(background=hex_color)
-                            else:
-                                raise ValueError("RGB values must be between 0 and 255.")
-                        except ValueError as ve:
-                            print(f"Error parsing RF line: {ve}")
-                # Additional keys like Decimals, ND, Label can be handled here if needed
-
-    def parse_color_band(self, rest):
-        rest = rest.strip()
-        # Handle different color band definitions
-        if rest.lower().startswith('rgb('):
-            # SingleColor
-            color = self.parse_single_color(rest)
-            return {'type': 'single', 'start_color': color}
-        elif rest.lower().startswith('solid('):
-            # Solid color band
-            match = re.match(r'solid\(\s*(.*?)\s*\)', rest, re.IGNORECASE)
-            if match:
-                color_str = match.group(1)
-                color = self.parse_single_color(color_str)
-                return {'type': 'solid', 'start_color': color}
-        elif rest.lower().startswith('gradient('):
-            # Gradient color band
-            match = re.match(r'gradient\(\s*(.*?),\s*(.*?)\s*\)', rest, re.IGNORECASE)
-            if match:
-                color1_str = match.group(1)
-                color2_str = match.group(2)
-                color1 = self.parse_single_color(color1_str)
-                color2 = self.parse_single_color(color2_str)
-                return {'type': 'gradient', 'start_color': color1, 'end_color': color2}
-        else:
-            raise ValueError(f"Unknown color band definition: {rest}")
-
-    def parse_single_color(self, color_str):
-        color_str = color_str.strip()
-        if color_str.lower().startswith('rgb('):
-            match = re.match(r'rgb\(\s*(\d+),\s*(\d+),\s*(\d+)(?:,\s*(\d+))?\s*\)', color_str, re.IGNORECASE)
-            if match:
-                r, g, b = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                # Optionally handle alpha channel
-                return "#{:02x}{:02x}{:02x}".format(r, g, b)
-        elif color_str.lower().startswith('hsluv('):
-            # Parse HSLuv colors if needed
-            pass  # For simplicity, we skip HSLuv in this example
-        raise ValueError(f"Unknown color format: {color_str}")
-
-    def parse_legacy_format(self, lines):
-        for line in lines:
-            if ':' in line:
-                key, rest = line.split(':', 1)
-                key = key.strip().lower()
-                rest = rest.strip()
-
-                if key == 'product':
-                    # Set product
-                    self.product_entry.delete(0, tk.END)
-                    self.product_entry.insert(0, rest)
-                elif key == 'units':
-                    # Set units
-                    self.units_entry.delete(0, tk.END)
-                    self.units_entry.insert(0, rest)
-                elif key == 'scale':
-                    # Set scale
-                    self.scale_entry.delete(0, tk.END)
-                    self.scale_entry.insert(0, rest)
-                elif key == 'offset':
-                    # Set offset
-                    self.offset_entry.delete(0, tk.END)
-                    self.offset_entry.insert(0, rest)
-                elif key == 'step':
-                    # Set step
-                    self.step_entry.delete(0, tk.END)
-                    self.step_entry.insert(0, rest)
-                elif key in ('solidcolor', 'solidcolor4'):
-                    # Handle SolidColor and SolidColor4
-                    parts = rest.split()
-                    if not parts:
-                        continue
-                    value_num = parts[0]
-
-                    try:
-                        if key == 'solidcolor':
-                            # SolidColor: value R G B
-                            if len(parts) != 4:
-                                raise ValueError(f"Invalid SolidColor format: {rest}")
-                            r, g, b = map(int, parts[1:4])
-                            hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-                            color_band = {
-                                'type': 'solid',
-                                'start_color': hex_color,
-                                'format': 'rgb'
-                            }
-                        elif key == 'solidcolor4':
-                            # SolidColor4: value R G B A
-                            if len(parts) != 5:
-                                raise ValueError(f"Invalid SolidColor4 format: {rest}")
-                            r, g, b, a = map(int, parts[1:5])
-                            hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-                            color_band = {
-                                'type': 'solid',
-                                'start_color': hex_color,
-                                'start_alpha': a,
-                                'format': 'rgba'
-                            }
-                        else:
-                            continue  # Skip unknown keys
-
-                        self.create_color_entry(value=value_num, color_band=color_band)
-                    except ValueError as e:
-                        print(f"Error parsing line '{line}': {e}")
-                        continue
-                elif key in ('color', 'color4'):
-                    parts = rest.split()
-                    if not parts:
-                        continue
-                    value_num = parts[0]
-
-                    # Initialize default alpha values
-                    alpha1 = 255
-                    alpha2 = 255
-
-                    if len(parts) == 7:
-                        # Gradient without alpha values
-                        rgb1 = parts[1:4]
-                        rgb2 = parts[4:7]
-                    elif len(parts) == 9 and key == 'color4':
-                        # Gradient with alpha values
-                        rgb1 = parts[1:4]
-                        rgb2 = parts[4:7]
-                        alpha1 = int(parts[7])
-                        alpha2 = int(parts[8])
-                    elif len(parts) == 4:
-                        # Single color without alpha
-                        rgb1 = parts[1:4]
-                        rgb2 = None
-                    elif len(parts) == 5 and key == 'color4':
-                        # Single color with alpha
-                        rgb1 = parts[1:4]
-                        rgb2 = None
-                        alpha1 = int(parts[4])
-                    else:
-                        continue  # Skip invalid entries
-
-                    try:
-                        rgb1_ints = list(map(int, rgb1))
-                        hex_color1 = "#{:02x}{:02x}{:02x}".format(*rgb1_ints)
-                        if rgb2:
-                            rgb2_ints = list(map(int, rgb2))
-                            hex_color2 = "#{:02x}{:02x}{:02x}".format(*rgb2_ints)
-                            # Create color_band for gradient
-                            color_band = {
-                                'type': 'gradient',
-                                'start_color': hex_color1,
-                                'end_color': hex_color2,
-                                'start_alpha': alpha1,
-                                'end_alpha': alpha2,
-                                'format': 'rgba' if alpha1 != 255 or alpha2 != 255 else 'rgb'
-                            }
-                        else:
-                            # Create color_band for single color
-                            color_band = {
-                                'type': 'single',
-                                'start_color': hex_color1,
-                                'start_alpha': alpha1,
-                                'format': 'rgba' if alpha1 != 255 else 'rgb'
-                            }
-                        self.create_color_entry(value=value_num, color_band=color_band)
-                    except ValueError as e:
-                        print(f"Error parsing line '{line}': {e}")
-                        continue
-                elif key == 'rf':
-                    # Handle RF Field in Legacy Format
-                    rgb = rest.split()
-                    if len(rgb) == 3:
-                        try:
-                            r, g, b = map(int, rgb)
-                            # Validate RGB values
-                            if all(0 <= val <= 255 for val in (r, g, b)):
-                                hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-                                self.rf_color_preview.config(background=hex_color)
-                            else:
-                                raise ValueError("RGB values must be between 0 and 255.")
-                        except ValueError as ve:
-                            print(f"Error parsing RF line: {ve}")
-                else:
-                    continue
+    def clear_comparison(self):
+        self.compare_table = None
+        self.compare_name = ''
+        self.draw_analysis()
+
+    def draw_analysis(self):
+        """
+        Draw the analysis overlay, aligned with the preview bar: delta E per
+        unit (black) with banding hotspots shaded red, L* (gray) with its
+        reversals marked orange, and the delta E against the compared table
+        (blue).
+        """
+        if not self.analysis_var.get():
+            return
+        import numpy as np
+        from colortable.analysis import HOTSPOT_FACTOR, analyze, column_max, column_mean, diff
+
+        canvas = self.analysis_canvas
+        canvas.delete("all")
+        result = analyze(self.table)
+        if result is None:
+            canvas.create_text(self.PREVIEW_MARGIN, 5, text="Add two or more entries to analyze the table",
+                               anchor='nw', font=('Arial', 8))
+            return
+        margin = self.PREVIEW_MARGIN
+        width = max(int(self.preview_canvas.winfo_width() - 2 * margin), 1)
+        height = self.ANALYSIS_HEIGHT
+        domain = self.table.valid_stops()[0].value, self.table.valid_stops()[-1].value
+        x = margin + np.arange(width) + 0.5
+
+        def plot(data, top, color):
+            # One polyline per run of columns that have data
+            y = height - 2 - np.clip(data / top, 0, 1) * (height - 16)
+            valid = ~np.isnan(y)
+            for start, end in zip(*[iter(np.flatnonzero(np.diff(np.concatenate(([0], valid, [0])))))] * 2):
+                if end - start > 1:
+                    points = np.column_stack((x[start:end], y[start:end])).ravel().tolist()
+                    canvas.create_line(*points, fill=color)
+
+        # Hotspots are shaded per pixel column, so thousands of them stay a few items
+        hot = np.zeros(width + 1, dtype=np.int8)
+        for start, end, _ in result.hotspots:
+            hot[int((start - domain[0]) / (domain[1] - domain[0]) * width)] = 1
+            hot[min(int((end - domain[0]) / (domain[1] - domain[0]) * width) + 1, width)] = -1
+        hot = np.cumsum(hot[:-1]) > 0
+        for start, end in zip(*[iter(np.flatnonzero(np.diff(np.concatenate(([0], hot, [0])))))] * 2):
+            canvas.create_rectangle(margin + start, 14, margin + end, height, fill='#ffc8c8', outline='')
+        plot(column_max(result.values, result.lab[:, 0], domain, width), 100.0, 'gray')
+        plot(column_mean(result.values[:-1], result.delta_e_per_unit, domain, width),
+             2 * HOTSPOT_FACTOR * result.mean_delta_e, 'black')
+        for value in result.reversals:
+            rx = margin + (value - domain[0]) / (domain[1] - domain[0]) * width
+            canvas.create_line(rx, 14, rx, height, fill='orange')
+
+        lightness = "monotonic" if result.monotonic else f"{len(result.reversals)} reversal(s)"
+        summary = (f"\u0394E/unit mean {result.mean_delta_e:.2f}  |  {len(result.hotspots)} hotspot(s)  |  "
+                   f"L* {result.direction}, {lightness}")
+        if self.compare_table is not None:
+            changes = diff(self.table, self.compare_table, domain=domain)
+            delta = column_max(changes.values, changes.delta_e, domain, width)
+            worst = float(np.nanmax(delta)) if not np.isnan(delta).all() else 0.0
+            plot(delta, max(worst, 10.0), 'blue')
+            summary += f"  |  vs {self.compare_name}: max \u0394E {worst:.1f}, {len(changes.changed)} changed range(s)"
+        canvas.create_text(margin, 2, text=summary, anchor='nw', font=('Arial', 8))
+
+    def open_field_preview(self):
+        """
+        Open a .npy or raw grid and show it colored with the current table.
+        """
+        file_path = filedialog.askopenfilename(
+            filetypes=[("NumPy Grids", "*.npy"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            return
+        from colortable.colorize import open_grid
+
+        try:
+            if file_path.lower().endswith('.npy'):
+                grid = open_grid(file_path)
             else:
-                continue
+                layout = simpledialog.askstring(
+                    "Raw Grid", "Data type, rows and columns, and optionally header bytes\n"
+                                "(e.g. uint16 2000 2000 or float32 1000 1200 512):", parent=self.root
+                )
+                if not layout:
+                    return
+                parts = layout.split()
+                if len(parts) not in (3, 4):
+                    raise ValueError("Expected a data type, rows, columns and optionally header bytes")
+                grid = open_grid(file_path, parts[0], (int(parts[1]), int(parts[2])),
+                                 int(parts[3]) if len(parts) == 4 else 0)
+            if self.field_preview is not None:
+                self.field_preview.close()
+            self.field_preview = FieldPreview(self, grid, os.path.basename(file_path), self.field_preview_closed)
+        except (OSError, ValueError, TypeError) as e:
+            messagebox.showerror("Error", f"Failed to open sample field: {e}")
+
+    def field_preview_closed(self):
+        self.field_preview = None
+
+    def update_field_preview(self):
+        if self.field_preview is not None:
+            self.field_preview.table_changed()
+
+    def clear_table_cache(self):
+        cache = default_cache()
+        count, size = cache.usage()
+        cache.clear()
+        messagebox.showinfo("Table Cache Cleared", f"Removed {count} cached table(s), {size} bytes.")
+
+    def show_diagnostics(self, diagnostics, limit=20):
+        """
+        Tell the user which lines of a loaded file were skipped and why.
+        """
+        lines = [str(diagnostic) for diagnostic in diagnostics[:limit]]
+        if len(diagnostics) > limit:
+            lines.append(f"... and {len(diagnostics) - limit} more")
+        messagebox.showwarning(
+            "Color Table Loaded",
+            f"Color table loaded; {len(diagnostics)} line(s) were skipped:\n\n" + "\n".join(lines)
+        )
+
+    def load_table(self, table):
+        """
+        Replace the table shown in the editor and rebuild the rows from it.
+        """
+        # Tables without an RF line get the default RF color
+        if table.rf is None:
+            table.rf = WHITE
+
+        # Swapped before the batch starts, so the batch sorts the new table
+        self.table = table
+        with self.batch():
+            self.show_settings()
+            self.color_list.first = 0
+
+    def show_settings(self):
+        """
+        Show the table's Product, Units, Scale, Offset, Step, interpolation
+        and RF.
+        """
+        for name, value in self.table.settings().items():
+            setting_entry = getattr(self, f"{name}_entry")
+            if setting_entry.get() != value:
+                setting_entry.delete(0, tk.END)
+                setting_entry.insert(0, value)
+        self.interpolation_var.set(self.INTERPOLATION_LABELS[self.table.interpolation])
+        self.rf_color_preview.config(background=self.table.rf_color)
+
+    def commit_settings(self):
+        """
+        Copy the Product, Units, Scale, Offset and Step fields into the
+        table, recording any change for undo.
+        """
+        before = self.table.settings()
+        after = {name: getattr(self, f"{name}_entry").get() for name in before}
+        changed = [name for name in before if before[name] != after[name]]
+        if changed:
+            for name in changed:
+                setattr(self.table, name, after[name])
+            self.history.record(SettingsEdit(
+                self.table, {name: before[name] for name in changed}, {name: after[name] for name in changed}
+            ))
+            self.schedule_preview()  # Scale and Offset change the sample field
 
     def save_color_table(self):
         file_path = filedialog.asksaveasfilename(
@@ -774,115 +1770,52 @@ class ColorTableApp:
         )
         if file_path:
             try:
-                with open(file_path, 'w') as file:
-                    file.write(f"Product: {self.product_entry.get()}\n")
-                    file.write(f"Units: {self.units_entry.get()}\n")
-
-                    # Check if Scale field is not empty before writing
-                    scale_value = self.scale_entry.get()
-                    if scale_value.strip():
-                        file.write(f"Scale: {scale_value}\n")
-
-                    # Check if Offset field is not empty before writing
-                    offset_value = self.offset_entry.get()
-                    if offset_value.strip():
-                        file.write(f"Offset: {offset_value}\n")
-
-                    # Check if Step field is not empty before writing
-                    step_value = self.step_entry.get()
-                    if step_value.strip():
-                        file.write(f"Step: {step_value}\n")
-
-                    file.write("\n")
-
-                    entries = []
-                    for entry in self.color_entries:
-                        value_entry = entry['value_entry']
-                        color_info = entry['color_info']
-                        band_type = entry['band_type_var'].get().lower()
-                        color_format = entry['color_format_var'].get().lower()
-                        if (value_entry.get().lstrip('-').replace('.', '', 1).isdigit()):
-                            value = float(value_entry.get())
-                            entries.append({
-                                'value': value,
-                                'color_info': color_info,
-                                'band_type': band_type,
-                                'color_format': color_format
-                            })
-
-                    # Sort entries by value in descending order
-                    entries.sort(key=lambda x: x['value'], reverse=True)
-
-                    for i, entry in enumerate(entries):
-                        value = entry['value']
-                        color_info = entry['color_info']
-                        band_type = entry['band_type']
-                        color_format = entry['color_format']
-
-                        # Prepare RGB(A) strings
-                        start_rgb = self.rgb_list_from_hex(
-                            color_info['start_color'], color_info.get('start_alpha', 255)
-                        )
-                        end_rgb = None
-                        if color_info['type'] == 'gradient' and color_info['end_color']:
-                            end_rgb = self.rgb_list_from_hex(
-                                color_info['end_color'], color_info.get('end_alpha', 255)
-                            )
-
-                        # Determine the statement type
-                        if band_type == 'solid':
-                            if color_format == 'rgba':
-                                # SolidColor4
-                                rgb_str = ' '.join(map(str, start_rgb))
-                                file.write(f"SolidColor4: {value} {rgb_str}\n")
-                            else:
-                                # SolidColor
-                                rgb_str = ' '.join(map(str, start_rgb[:3]))
-                                file.write(f"SolidColor: {value} {rgb_str}\n")
-                        elif band_type == 'gradient':
-                            if color_format == 'rgba' and end_rgb:
-                                # Color4 with RGBA2
-                                start_rgb_str = ' '.join(map(str, start_rgb))
-                                end_rgb_str = ' '.join(map(str, end_rgb))
-                                file.write(f"Color4: {value} {start_rgb_str} {end_rgb_str}\n")
-                            else:
-                                # Color with RGB2
-                                start_rgb_str = ' '.join(map(str, start_rgb[:3]))
-                                end_rgb_str = ' '.join(map(str, end_rgb[:3])) if end_rgb else ' '.join(map(str, start_rgb[:3]))
-                                file.write(f"Color: {value} {start_rgb_str} {end_rgb_str}\n")
-                        else:
-                            if color_format == 'rgba':
-                                # Color4 without RGBA2
-                                rgb_str = ' '.join(map(str, start_rgb))
-                                file.write(f"Color4: {value} {rgb_str}\n")
-                            else:
-                                # Color without RGB2
-                                rgb_str = ' '.join(map(str, start_rgb[:3]))
-                                file.write(f"Color: {value} {rgb_str}\n")
-
-                    # Write RF Line at the End
-                    rf_hex = self.rf_color_preview['background']
-                    rf_rgb = self.hex_to_rgb(rf_hex)
-                    file.write(f"\nRF: {rf_rgb[0]} {rf_rgb[1]} {rf_rgb[2]}\n")
-
+                with span('save'):
+                    for row in self.color_list.rows:
+                        row.commit()
+                    self.commit_settings()
+                    dialect = self.save_dialect_var.get()
+                    dump(self.table, file_path, None if dialect == 'auto' else dialect)
+                self.set_file(file_path)  # Not a change to reload
                 messagebox.showinfo("Save Successful", "Color table saved successfully.")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save color table: {e}")
 
-    def hex_to_rgb(self, hex_color, alpha=255):
-        hex_color = hex_color.lstrip('#')
-        if len(hex_color) != 6:
-            raise ValueError(f"Invalid hex color: {hex_color}")
-        rgb = tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
-        return rgb + (alpha,)
+    def export_color_table(self):
+        """
+        Export the table as a .npy LUT, PNG legend, matplotlib spec or GMT
+        .cpt, chosen by the file extension.
+        """
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".cpt",
+            filetypes=[("GMT Palettes", "*.cpt"), ("Matplotlib Specs", "*.json"), ("PNG Legends", "*.png"),
+                       ("NumPy LUTs", "*.npy")]
+        )
+        if file_path:
+            from colortable.export import export
 
-    def rgb_list_from_hex(self, hex_color, alpha=255):
-        rgb = self.hex_to_rgb(hex_color, alpha)
-        return list(rgb)
+            try:
+                with span('export'):
+                    for row in self.color_list.rows:
+                        row.commit()
+                    self.commit_settings()
+                    export(self.table, [file_path])
+                messagebox.showinfo("Export Successful", f"Exported {os.path.basename(file_path)}.")
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Error", f"Failed to export color table: {e}")
 
 
-# Run the application
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Headless commands such as "colorize"
+        from colortable.cli import main
+        sys.exit(main())
+
+    set_dpi_aware()
     root = tk.Tk()
     app = ColorTableApp(root)
+    # Load NumPy for the preview in the background once the window is up
+    root.after_idle(lambda: threading.Thread(
+        target=importlib.import_module, args=('colortable.lut',), daemon=True
+    ).start())
     root.mainloop()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.analysis import JND, analyze, delta_e, diff, to_lab
+
+BLACK = pack_rgba(0, 0, 0)
+WHITE = pack_rgba(255, 255, 255)
+
+
+def ramp(*stops):
+    return ColorTable([ColorStop(float(value), 'gradient', 'rgb', start, end) for value, start, end in stops]
+                      + [ColorStop(100.0, 'single', 'rgb', WHITE)])
+
+
+def test_delta_e_of_identical_colors_is_zero():
+    lab = to_lab(np.array([[0, 0, 0, 255], [255, 255, 255, 255]], dtype=np.uint8))
+    assert np.allclose(delta_e(lab, lab), 0.0)
+    assert np.isclose(delta_e(lab[:1], lab[1:])[0], 100.0, atol=0.5)
+
+
+def test_monotonic_ramp():
+    result = analyze(ramp((0, BLACK, WHITE)), 1024)
+    assert result.direction == 'increasing' and result.monotonic
+    assert not result.hotspots
+
+
+def test_lightness_reversal_and_hotspot():
+    table = ramp((0, BLACK, WHITE), (50, BLACK, WHITE))
+    result = analyze(table, 1024)
+    assert not result.monotonic
+    assert np.isclose(result.reversals[0], 50.0, atol=0.2)
+    assert any(start <= 50.0 <= end for start, end, _ in result.hotspots)
+
+
+def test_single_stop_is_not_analyzed():
+    assert analyze(ColorTable([ColorStop(0.0)])) is None
+
+
+def test_diff_reports_changed_ranges_and_coverage():
+    before = ramp((0, BLACK, WHITE))
+    after = ramp((0, BLACK, WHITE))
+    after.stops[0].value = 20.0
+    changes = diff(before, after, 1000)
+    assert changes.coverage[changes.values < 20.0].all()
+    assert not changes.coverage[changes.values >= 20.0].any()
+    assert (changes.delta_e[changes.values > 20.0] >= 0).all()
+    assert changes.changed and changes.changed[0][0] < 0.1
+
+
+def test_identical_tables_do_not_differ():
+    changes = diff(ramp((0, BLACK, WHITE)), ramp((0, BLACK, WHITE)), 1000)
+    assert not changes.coverage.any()
+    assert np.nanmax(changes.delta_e) < JND
+    assert changes.changed == []
@@ -0,0 +1,108 @@
+import os
+
+from colortable import loads
+from colortable.cache import TableCache
+
+TEXT = "Product: BR\nUnits: dBZ\nColor: 0 1 2 3\nbogus\nSolidColor4: 10 4 5 6 7\nRF: 9 9 9\n"
+
+
+def write(path, text):
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+def counting_cache(tmp_path, monkeypatch, **kwargs):
+    cache = TableCache(str(tmp_path / 'cache'), enabled=True, **kwargs)
+    parses = []
+    parse = cache._parse
+
+    def counting_parse(data, diagnostics, progress=None):
+        parses.append(data)
+        return parse(data, diagnostics, progress)
+
+    monkeypatch.setattr(cache, '_parse', counting_parse)
+    return cache, parses
+
+
+def test_miss_then_hit(tmp_path, monkeypatch):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache, parses = counting_cache(tmp_path, monkeypatch)
+
+    first, second = [], []
+    table = cache.load(path, first)
+    assert len(parses) == 1
+    assert table == loads(TEXT)
+    assert cache.load(path, second) == table
+    assert len(parses) == 1
+    assert second == first and [diagnostic.line for diagnostic in second] == [4]
+    assert cache.usage()[0] == 1
+
+
+def test_touched_file_with_same_content_is_not_parsed(tmp_path, monkeypatch):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache, parses = counting_cache(tmp_path, monkeypatch)
+    cache.load(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.load(path)
+    assert len(parses) == 1
+
+
+def test_changed_file_is_parsed_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache, parses = counting_cache(tmp_path, monkeypatch)
+    cache.load(path)
+    write(path, TEXT + "Color: 20 1 1 1\n")
+    assert len(cache.load(path).stops) == 3
+    assert len(parses) == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache, _ = counting_cache(tmp_path, monkeypatch)
+    paths = []
+    for name in 'abc':
+        paths.append(str(tmp_path / f'{name}.pal'))
+        write(paths[-1], TEXT)
+        cache.load(paths[-1])
+    entry_size = cache.usage()[1] // 3
+    cache.max_bytes = 2 * entry_size + entry_size // 2
+    os.utime(cache.entry_path(paths[0]), ns=(1, 1))  # Oldest use
+    cache.evict()
+    assert cache.usage()[0] == 2
+    assert not os.path.exists(cache.entry_path(paths[0]))
+
+
+def test_corrupt_entry_is_reparsed(tmp_path, monkeypatch):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache, parses = counting_cache(tmp_path, monkeypatch)
+    cache.load(path)
+    with open(cache.entry_path(os.path.abspath(path)), 'r+b') as file:
+        file.seek(80)
+        file.write(b'\xff' * 16)
+    assert cache.load(path) == loads(TEXT)
+    assert len(parses) == 2
+
+
+def test_failed_writes_leave_no_temporary_files(tmp_path, monkeypatch):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache = TableCache(str(tmp_path / 'cache'), enabled=True)
+
+    def failing_replace(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, 'replace', failing_replace)
+    assert cache.load(path) == loads(TEXT)
+    assert os.listdir(cache.directory) == []
+
+
+def test_disabled_cache_writes_nothing(tmp_path):
+    path = str(tmp_path / 'table.pal')
+    write(path, TEXT)
+    cache = TableCache(str(tmp_path / 'cache'), enabled=False)
+    assert cache.load(path) == loads(TEXT)
+    assert cache.usage() == (0, 0)
@@ -0,0 +1,101 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from colortable import loads
+from colortable.colorize import adler32_combine, colorize_file
+from colortable.lut import colorize, colorize_values
+
+TEXT = "Product: BR\nScale: 0.5\nRF: 110 0 130\nColor: 0 255 0 0 0 0 255\nSolidColor: 50 0 255 0\n"
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = str(tmp_path / 'table.pal')
+    with open(path, 'w') as file:
+        file.write(TEXT)
+    return path
+
+
+def png_image(path, width, height):
+    """
+    Decode an 8-bit RGBA PNG with filter type 0 rows, checking the CRC of
+    every chunk and the adler32 of the zlib stream.
+    """
+    with open(path, 'rb') as file:
+        png = file.read()
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    data, offset = b'', 8
+    while offset < len(png):
+        length = int.from_bytes(png[offset:offset + 4], 'big')
+        kind, body = png[offset + 4:offset + 8], png[offset + 8:offset + 8 + length]
+        assert int.from_bytes(png[offset + 8 + length:offset + 12 + length], 'big') == zlib.crc32(kind + body)
+        if kind == b'IDAT':
+            data += body
+        offset += 12 + length
+    raw = zlib.decompress(data)  # Raises on a wrong adler32
+    assert int.from_bytes(data[-4:], 'big') == zlib.adler32(raw)
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(height, 1 + width * 4)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_adler32_combine():
+    first, second = b'color table' * 1000, bytes(range(256)) * 300
+    assert adler32_combine(zlib.adler32(first), zlib.adler32(second), len(second)) == zlib.adler32(first + second)
+    assert adler32_combine(zlib.adler32(first), 1, 0) == zlib.adler32(first)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+@pytest.mark.parametrize('ext', ['.png', '.npy', '.rgba'])
+def test_codes(tmp_path, table_path, workers, ext):
+    codes = np.random.default_rng(1).integers(0, 256, (53, 37), dtype=np.uint8)
+    np.save(str(tmp_path / 'codes.npy'), codes)
+    output = str(tmp_path / ('out' + ext))
+    stats = colorize_file(table_path, str(tmp_path / 'codes.npy'), output, rf_code=1, workers=workers, chunk_rows=5)
+    assert stats['pixels'] == 53 * 37
+
+    expected = colorize(loads(TEXT), codes, 1)
+    if ext == '.png':
+        rgba = png_image(output, 37, 53)
+    elif ext == '.npy':
+        rgba = np.load(output)
+    else:
+        rgba = np.fromfile(output, dtype=np.uint8).reshape(53, 37, 4)
+    assert (rgba == expected).all()
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_raw_float_input(tmp_path, table_path, workers):
+    values = np.linspace(-10, 120, 40 * 30, dtype=np.float32).reshape(40, 30)
+    values.tofile(str(tmp_path / 'values.bin'))
+    output = str(tmp_path / 'out.png')
+    colorize_file(table_path, str(tmp_path / 'values.bin'), output, dtype='float32', shape=(40, 30),
+                  workers=workers, chunk_rows=7)
+    assert (png_image(output, 30, 40) == colorize_values(loads(TEXT), values)).all()
+
+
+def test_worker_counts_write_the_same_png(tmp_path, table_path):
+    codes = np.arange(64 * 64, dtype=np.uint16).reshape(64, 64)
+    np.save(str(tmp_path / 'codes.npy'), codes)
+    outputs = []
+    for workers in (1, 3):
+        outputs.append(str(tmp_path / f'{workers}.png'))
+        colorize_file(table_path, str(tmp_path / 'codes.npy'), outputs[-1], workers=workers, chunk_rows=9)
+    images = [png_image(path, 64, 64) for path in outputs]
+    assert (images[0] == images[1]).all()
+
+
+def test_failed_runs_leave_no_output(tmp_path, table_path):
+    np.save(str(tmp_path / 'codes.npy'), np.zeros((4, 4), dtype=np.int32))
+    output = str(tmp_path / 'out.png')
+    with pytest.raises(ValueError):
+        colorize_file(table_path, str(tmp_path / 'codes.npy'), output, workers=1)
+    assert not (tmp_path / 'out.png').exists()
+
+
+def test_raw_input_needs_a_shape(tmp_path, table_path):
+    (tmp_path / 'values.bin').write_bytes(b'\0' * 16)
+    with pytest.raises(ValueError):
+        colorize_file(table_path, str(tmp_path / 'values.bin'), str(tmp_path / 'out.png'), dtype='uint8')
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, dumps, loads, pack_rgba
+from colortable.colorspace import from_space, interpolate, rgb_to_hsluv, rgb_to_lab, rgb_to_oklab, to_space
+from colortable.formats import parse_rgb
+from colortable.lut import colorize_values
+
+RED = pack_rgba(255, 0, 0)
+
+
+@pytest.mark.parametrize('convert, white, red', [
+    (rgb_to_hsluv, [0.0, 0.0, 100.0], [12.177, 100.0, 53.237]),
+    (rgb_to_lab, [100.0, 0.0, 0.0], [53.237, 80.090, 67.203]),
+    (rgb_to_oklab, [1.0, 0.0, 0.0], [0.62796, 0.22486, 0.12585]),
+])
+def test_reference_values(convert, white, red):
+    assert np.allclose(convert(np.array([1.0, 1.0, 1.0])), white, atol=1e-3)
+    assert np.allclose(convert(np.array([1.0, 0.0, 0.0])), red, atol=1e-3)
+
+
+@pytest.mark.parametrize('space', ['rgb', 'lab', 'oklab', 'hsluv'])
+def test_conversions_round_trip(space):
+    rgb = np.random.default_rng(0).integers(0, 256, (1000, 3))
+    assert (from_space(to_space(rgb, space), space) == rgb).all()
+
+
+def test_colors_outside_srgb_are_clipped():
+    assert from_space([[2.0, 0.0, 0.0], [-1.0, 0.0, 0.0]], 'oklab').tolist() == [[255, 255, 255], [0, 0, 0]]
+    assert from_space([[150.0, 0.0, 0.0]], 'lab').tolist() == [[255, 255, 255]]
+
+
+def test_hsluv_hues_take_the_shorter_way():
+    coords = interpolate(np.array([350.0, 100.0, 50.0]), np.array([10.0, 100.0, 50.0]), 0.25, 'hsluv')
+    assert np.allclose(coords, [355.0, 100.0, 50.0])
+    coords = interpolate(np.array([350.0, 100.0, 50.0]), np.array([10.0, 100.0, 50.0]), 0.75, 'hsluv')
+    assert np.allclose(coords, [5.0, 100.0, 50.0])
+
+
+@pytest.mark.parametrize('text, color, has_alpha', [
+    ('hsluv(12.177, 100, 53.237)', RED, False),
+    ('HSLuv( 0, 0, 100 , 64)', pack_rgba(255, 255, 255, 64), True),
+    ('lab(53.237, 80.09, 67.203)', RED, False),
+    ('lab(0, 0, 0, 0)', pack_rgba(0, 0, 0, 0), True),
+    ('oklab(0.62796, 0.22486, 0.12585)', RED, False),
+    ('oklab(1, 0, 0)', pack_rgba(255, 255, 255), False),
+])
+def test_parse_color_functions(text, color, has_alpha):
+    assert parse_rgb(text) == (color, has_alpha)
+
+
+@pytest.mark.parametrize('text', ['hsluv(1, 2)', 'lab(a, b, c)', 'oklab(1, 2, 3, 4, 5)', 'lch(1, 2, 3)'])
+def test_invalid_color_functions(text):
+    with pytest.raises(ValueError):
+        parse_rgb(text)
+
+
+@pytest.mark.parametrize('color, rgb', [
+    ('hsluv(12.177, 100, 53.237)', 'rgb(255, 0, 0)'),
+    ('lab(53.237, 80.09, 67.203, 128)', 'rgb(255, 0, 0, 128)'),
+    ('oklab(0.62796, 0.22486, 0.12585)', 'rgb(255, 0, 0)'),
+])
+def test_color_functions_parse_and_dump(color, rgb):
+    text = f'ColorTable {{\n  color[0] = {color}\n  color[10] = solid({color})\n  color[20] = gradient({color}, {color})\n}}\n'
+    table = loads(text)
+    dumped = dumps(table)
+    assert dumped == text.replace(color, rgb)
+    assert loads(dumped) == table
+
+
+def gray_ramp(interpolation):
+    black, white = pack_rgba(0, 0, 0), pack_rgba(255, 255, 255)
+    return ColorTable([ColorStop(0.0, 'gradient', 'rgb', black, white), ColorStop(10.0)], interpolation=interpolation)
+
+
+@pytest.mark.parametrize('interpolation, gray', [('rgb', 127), ('lab', 119), ('hsluv', 119), ('oklab', 99)])
+def test_gradient_midpoint_in_each_space(interpolation, gray):
+    rgba = colorize_values(gray_ramp(interpolation), [0.0, 5.0, 9.999])
+    assert rgba[1].tolist() == [gray, gray, gray, 255]
+    assert rgba[0].tolist() == [0, 0, 0, 255] and rgba[2, 0] >= 254
+
+
+def test_perceptual_gradient_is_even_in_its_space():
+    rgba = colorize_values(gray_ramp('lab'), np.linspace(0.0, 9.99, 64))
+    lightness = rgb_to_lab(rgba[:, :3] / 255.0)[:, 0]
+    assert np.allclose(np.diff(lightness), 100 / 64, atol=0.6)
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from colortable import loads
+from colortable.convert import REPORT_NAME, convert_tree
+
+PALETTE = "Product: BR\nUnits: dBZ\nColor: 0 1 2 3\nbogus line\nSolidColor: 10 4 5 6\n"
+NOTES = "Notes about these palettes.\nNothing to convert here.\n"
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'palettes'
+    write(str(root / 'a.pal'), PALETTE)
+    write(str(root / 'sub' / 'b.pal3'), PALETTE.replace('BR', 'BV'))
+    write(str(root / 'sub' / 'notes.txt'), NOTES)
+    return str(root)
+
+
+def test_mirror_into_output(tree, tmp_path):
+    output = str(tmp_path / 'out')
+    summary = convert_tree(tree, 'block', output, workers=1)
+    assert summary['converted'] == 2
+    assert read(os.path.join(tree, 'a.pal')) == PALETTE
+    converted = loads(read(os.path.join(output, 'sub', 'b.pal3')))
+    assert converted.dialect == 'block' and converted.product == 'BV'
+    assert converted == loads(PALETTE.replace('BR', 'BV'))
+
+
+def test_non_palette_text_is_failed_and_not_written(tree, tmp_path):
+    output = str(tmp_path / 'out')
+    summary = convert_tree(tree, 'block', output, workers=1)
+    assert list(summary['failed']) == [os.path.join('sub', 'notes.txt')]
+    assert not os.path.exists(os.path.join(output, 'sub', 'notes.txt'))
+
+    summary = convert_tree(tree, 'block', in_place=True, workers=1)
+    assert os.path.join('sub', 'notes.txt') in summary['failed']
+    assert read(os.path.join(tree, 'sub', 'notes.txt')) == NOTES
+
+
+def test_in_place_must_be_explicit(tree):
+    with pytest.raises(ValueError):
+        convert_tree(tree, 'block', workers=1)
+    assert read(os.path.join(tree, 'a.pal')) == PALETTE
+
+
+def test_in_place(tree):
+    summary = convert_tree(tree, 'legacy', in_place=True, workers=1)
+    assert summary['converted'] == 2
+    assert loads(read(os.path.join(tree, 'a.pal'))) == loads(PALETTE)
+
+
+def test_rerun_skips_unchanged_files_and_keeps_their_warnings(tree, tmp_path):
+    output = str(tmp_path / 'out')
+    first = convert_tree(tree, 'block', output, workers=1)
+    assert first['warnings'] == {'a.pal': ["line 4: Expected 'Key: value' (bogus line)"],
+                                 os.path.join('sub', 'b.pal3'): ["line 4: Expected 'Key: value' (bogus line)"]}
+    report = read(os.path.join(output, REPORT_NAME))
+
+    second = convert_tree(tree, 'block', output, workers=1)
+    assert (second['converted'], second['unchanged']) == (0, 2)
+    assert second['warnings'] == first['warnings']
+    assert read(os.path.join(output, REPORT_NAME)).replace('Unchanged: 2', 'Unchanged: 0') \
+        .replace('Converted: 0', 'Converted: 2') == report
+
+    write(os.path.join(tree, 'a.pal'), PALETTE + "Color: 20 7 8 9\n")
+    third = convert_tree(tree, 'block', output, workers=1)
+    assert (third['converted'], third['unchanged']) == (1, 1)
+
+
+def test_other_dialect_invalidates_the_manifest(tree, tmp_path):
+    output = str(tmp_path / 'out')
+    convert_tree(tree, 'block', output, workers=1)
+    summary = convert_tree(tree, 'legacy', output, workers=1)
+    assert summary['converted'] == 2
+    assert loads(read(os.path.join(output, 'a.pal'))).dialect == 'legacy'
+
+
+def test_unknown_dialect(tree, tmp_path):
+    with pytest.raises(ValueError):
+        convert_tree(tree, 'xml', str(tmp_path / 'out'))
@@ -0,0 +1,97 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.export import compile_sampling, dumps_cpt, export, matplotlib_spec
+from colortable.lut import compile_lut
+
+RED = pack_rgba(255, 0, 0)
+BLUE = pack_rgba(0, 0, 255)
+
+
+def make_table(interpolation='rgb'):
+    stops = [
+        ColorStop(0.0, 'solid', 'rgba', pack_rgba(100, 100, 100, 128)),
+        ColorStop(10.0, 'gradient', 'rgb', RED, BLUE),
+        ColorStop(20.0, 'single', 'rgb', pack_rgba(0, 255, 0)),
+    ]
+    return ColorTable(stops, product='BR', units='dBZ', scale='0.5', rf=pack_rgba(110, 0, 130),
+                      interpolation=interpolation)
+
+
+def test_segments():
+    sampling = compile_sampling(make_table(), steps=4)
+    assert len(sampling) == 5  # One solid segment and four gradient segments
+    assert sampling.edges.tolist() == [0.0, 10.0, 12.5, 15.0, 17.5, 20.0]
+    assert sampling.first.tolist() == [True, True, False, False, False]
+    assert sampling.low[1].tolist() == [255, 0, 0, 255]
+    assert sampling.over.tolist() == [0, 255, 0, 255]
+
+
+def test_lut_matches_compile_lut():
+    table = make_table()
+    assert (compile_sampling(table, rf_code=3).lut == compile_lut(table, rf_code=3)).all()
+
+
+def test_sampling_is_shared():
+    table = make_table()
+    assert compile_sampling(table) is compile_sampling(make_table())
+
+
+def test_rf_code_outside_the_lut():
+    with pytest.raises(ValueError):
+        compile_sampling(make_table(), rf_code=300)
+
+
+def test_matplotlib_spec():
+    spec = matplotlib_spec(compile_sampling(make_table(), steps=4), make_table())
+    assert spec['norm']['ncolors'] == len(spec['colormap']['colors']) == 5
+    assert spec['norm']['boundaries'][0] == 0.0 and spec['norm']['boundaries'][-1] == 20.0
+    assert spec['extremes']['under'] == [0.0, 0.0, 0.0, 0.0]
+    assert spec['colormap']['colors'][0] == [round(100 / 255, 6)] * 3 + [round(128 / 255, 6)]
+
+
+def test_cpt_keeps_srgb_gradients_as_one_slice():
+    table = make_table()
+    lines = dumps_cpt(compile_sampling(table, steps=4), table).splitlines()
+    slices = [line.split('\t') for line in lines if not line.startswith(('#', 'B', 'F', 'N'))]
+    assert slices == [['0', '100/100/100@50', '10', '100/100/100@50'], ['10', '255/0/0', '20', '0/0/254']]
+    assert 'F\t0/255/0' in lines
+
+
+def test_cpt_splits_perceptual_gradients():
+    table = make_table('oklab')
+    lines = dumps_cpt(compile_sampling(table, steps=4), table).splitlines()
+    assert len([line for line in lines if not line.startswith(('#', 'B', 'F', 'N'))]) == 5
+
+
+def png_data(png):
+    data, offset = b'', 8
+    while offset < len(png):
+        length = int.from_bytes(png[offset:offset + 4], 'big')
+        if png[offset + 4:offset + 8] == b'IDAT':
+            data += png[offset + 8:offset + 8 + length]
+        offset += 12 + length
+    return data
+
+
+def test_export_every_format(tmp_path):
+    paths = [str(tmp_path / name) for name in ('lut.npy', 'legend.png', 'spec.json', 'table.cpt')]
+    export(make_table(), paths, width=64, height=8)
+    assert np.load(paths[0]).shape == (256, 4)
+    with open(paths[1], 'rb') as file:
+        png = file.read()
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    assert len(zlib.decompress(png_data(png))) == 8 * (1 + 64 * 4)
+    with open(paths[2]) as file:
+        assert json.load(file)['units'] == 'dBZ'
+    with open(paths[3]) as file:
+        assert file.readline() == '# BR (dBZ)\n'
+
+
+def test_unknown_extension(tmp_path):
+    with pytest.raises(ValueError):
+        export(make_table(), [str(tmp_path / 'table.gpl')])
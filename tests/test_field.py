@@ -0,0 +1,141 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.field import FieldPyramid, FieldRenderer, RenderWorker, View, composite, render
+from colortable.lut import colorize
+
+
+def position_grid(rows=1024, cols=1024):
+    """
+    A grid whose cells hold their own position, row * cols + col.
+    """
+    return np.arange(rows * cols, dtype=np.int64).reshape(rows, cols)
+
+
+def test_pyramid_levels():
+    pyramid = FieldPyramid(position_grid(1024, 600))
+    assert [level.shape for level in pyramid.levels] == [(1024, 600), (512, 300), (256, 150)]
+    assert (pyramid.levels[2] == position_grid(1024, 600)[::4, ::4]).all()
+
+
+@pytest.mark.parametrize('scale, level', [(0.25, 0), (1.0, 0), (1.9, 0), (2.0, 1), (3.9, 1), (4.0, 2), (1000.0, 2)])
+def test_level_for(scale, level):
+    assert FieldPyramid(position_grid()).level_for(scale) == level
+
+
+def test_sample_one_cell_per_pixel():
+    grid = position_grid()
+    cells, inside, level = FieldPyramid(grid).sample(View(100, 200, 1.0), 8, 6)
+    assert level == 0 and inside.all()
+    assert (cells == grid[200:206, 100:108]).all()
+
+
+def test_sample_zoomed_out():
+    grid = position_grid()
+    cells, inside, level = FieldPyramid(grid).sample(View(0, 0, 4.0), 16, 16)
+    assert level == 2 and inside.all()
+    assert (cells == grid[:64:4, :64:4]).all()
+
+
+def test_sample_zoomed_in():
+    grid = position_grid()
+    cells, _, level = FieldPyramid(grid).sample(View(10, 20, 0.25), 8, 8)
+    assert level == 0
+    assert (cells == grid[20:22, 10:12].repeat(4, axis=0).repeat(4, axis=1)).all()
+
+
+def test_sample_outside_the_grid():
+    cells, inside, _ = FieldPyramid(position_grid(4, 4)).sample(View(-2, 1, 1.0), 8, 4)
+    assert inside[:3, 2:6].all()
+    assert not inside[:, :2].any() and not inside[:, 6:].any() and not inside[3].any()
+
+
+def test_view_fit_and_zoom():
+    view = View.fit((100, 400), 200, 200)
+    assert view == View(0.0, -150.0, 2.0)
+    zoomed = view.zoom(2.0, 50, 80)
+    assert zoomed.scale == 1.0
+    # The grid position under the cursor stays put
+    assert (view.left + 50 * view.scale, view.top + 80 * view.scale) == \
+        (zoomed.left + 50 * zoomed.scale, zoomed.top + 80 * zoomed.scale)
+    assert zoomed.pan(10, -5) == View(zoomed.left - 10, zoomed.top + 5, 1.0)
+
+
+def test_composite():
+    rgba = np.array([[[255, 0, 0, 255], [255, 0, 0, 0], [0, 0, 255, 128], [9, 9, 9, 255]]], dtype=np.uint8)
+    inside = np.array([[True, True, True, False]])
+    assert composite(rgba, inside, (0, 255, 0)).tolist() == [[[255, 0, 0], [0, 255, 0], [0, 127, 128], [0, 255, 0]]]
+
+
+def test_render_colors_raw_codes():
+    table = ColorTable([ColorStop(0.0, 'gradient', 'rgb', pack_rgba(0, 0, 0), pack_rgba(255, 255, 255)),
+                        ColorStop(255.0)], rf=pack_rgba(110, 0, 130))
+    codes = (position_grid(600, 600) % 251).astype(np.uint8)
+    codes[::2, ::2] = 1  # Every cell of level 1 and up is RF
+    pixels, level = render(FieldPyramid(codes), table, View(0, 0, 2.0), 10, 10, rf_code=1)
+    assert level == 1
+    assert (pixels == [110, 0, 130]).all()
+    pixels, level = render(FieldPyramid(codes), table, View(1, 1, 1.0), 10, 10, rf_code=1)
+    assert (pixels == colorize(table, codes[1:11, 1:11], 1)[..., :3]).all()
+
+
+def test_renderer_rejects_wide_codes():
+    with pytest.raises(ValueError):
+        FieldRenderer(np.zeros((4, 4), dtype=np.uint32))
+    with pytest.raises(ValueError):
+        FieldRenderer(np.zeros((4, 4), dtype=np.int16))
+
+
+def wait_for(worker, expected=None):
+    """
+    Poll a worker like the preview timer does until it has a result, or
+    until it has ``expected``.
+    """
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        result = worker.take()
+        if result is not None and expected in (None, result):
+            return result
+        time.sleep(0.01)
+    raise AssertionError("No result")
+
+
+def test_render_worker_drops_superseded_requests():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def function(value):
+        calls.append(value)
+        started.set()
+        release.wait(10)
+        return value * 10
+
+    worker = RenderWorker(function)
+    try:
+        worker.submit(1)
+        assert started.wait(10)
+        for value in (2, 3, 4):  # Submitted while 1 renders; only the newest runs
+            worker.submit(value)
+        release.set()
+        wait_for(worker, (40, None))
+        assert calls == [1, 4]
+        assert worker.take() is None
+    finally:
+        worker.close()
+
+
+def test_render_worker_returns_exceptions():
+    def function():
+        raise ValueError("bad view")
+
+    worker = RenderWorker(function)
+    try:
+        worker.submit()
+        value, error = wait_for(worker)
+        assert value is None and isinstance(error, ValueError)
+    finally:
+        worker.close()
@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from colortable import ColorStop, ColorTable, ParseError, dumps, loads, pack_rgba
+from colortable.formats import atomic_write
+
+
+def sample_table():
+    stops = [
+        ColorStop(-30.0, 'gradient', 'rgba', pack_rgba(150, 0, 0, 120), pack_rgba(100, 255, 255, 100)),
+        ColorStop(0.0, 'solid', 'rgb', pack_rgba(100, 100, 100)),
+        ColorStop(10.5, 'single', 'rgb', pack_rgba(0, 255, 0)),
+        ColorStop(20.0, 'single', 'rgba', pack_rgba(0, 0, 255, 128)),
+        ColorStop(60.0, 'gradient', 'rgb', pack_rgba(255, 0, 0), pack_rgba(255, 255, 0)),
+    ]
+    return ColorTable(stops, product='BV', units='KTS', scale='1.9426', offset='0', step='5',
+                      rf=pack_rgba(110, 0, 130))
+
+
+@pytest.mark.parametrize('dialect', ['legacy', 'block'])
+def test_round_trip(dialect):
+    table = sample_table()
+    text = dumps(table, dialect)
+    parsed = loads(text)
+    assert parsed == table
+    assert parsed.dialect == dialect
+    assert dumps(parsed) == text
+
+
+@pytest.mark.parametrize('dialect', ['legacy', 'block'])
+def test_round_trip_perceptual_interpolation(dialect):
+    table = sample_table()
+    table.interpolation = 'oklab'
+    assert loads(dumps(table, dialect)).interpolation == 'oklab'
+
+
+def test_block_dialect():
+    text = (
+        'ColorTable {\n  Category = "BV"\n  Units = "KTS"\n  Scale = 1.9426\n  Offset = 0\n  Step = 5\n'
+        '  color[-30] = gradient(rgb(150, 0, 0, 120), rgb(100, 255, 255, 100))\n'
+        '  color[0] = solid(rgb(100, 100, 100))\n  color[10.5] = rgb(0, 255, 0)\n'
+        '  color[20] = rgb(0, 0, 255, 128)\n  color[60] = gradient(rgb(255, 0, 0), rgb(255, 255, 0))\n'
+        '  RF = 110 0 130\n}\n'
+    )
+    assert loads(text) == sample_table()
+
+
+def test_legacy_stops_are_written_in_descending_order():
+    lines = [line for line in dumps(sample_table(), 'legacy').splitlines() if line.startswith(('Color', 'Solid'))]
+    values = [float(line.split()[1]) for line in lines]
+    assert values == sorted(values, reverse=True)
+
+
+def test_stops_without_a_value_are_not_written():
+    table = sample_table()
+    table.add(ColorStop(None))
+    assert loads(dumps(table, 'block')).stops == sample_table().stops
+
+
+def test_block_category_with_quotes_round_trips():
+    table = sample_table()
+    table.product = 'Velocity "storm relative"'
+    assert loads(dumps(table, 'block')).product == table.product
+
+
+def test_unknown_dialect():
+    with pytest.raises(ValueError):
+        dumps(sample_table(), 'xml')
+
+
+def test_diagnostics_carry_line_numbers():
+    text = "Product: BR\n\n; a comment\nColor: 0 1 2 3\nnot a setting\nColor: 10 300 0 0\nColor: 20 4 5 6\n"
+    diagnostics = []
+    table = loads(text, diagnostics)
+    assert [stop.value for stop in table.stops] == [0.0, 20.0]
+    assert [diagnostic.line for diagnostic in diagnostics] == [5, 6]
+    assert diagnostics[0].text == 'not a setting'
+    assert str(diagnostics[0]).startswith('line 5:')
+
+
+def test_block_diagnostics_carry_line_numbers():
+    text = 'ColorTable {\n  Category = "BR"\n  color[0] = rgb(1, 2)\n  color[10] = rgb(1, 2, 3)\n} trailing\n'
+    diagnostics = []
+    table = loads(text, diagnostics)
+    assert [stop.value for stop in table.stops] == [10.0]
+    assert [diagnostic.line for diagnostic in diagnostics] == [3, 5]
+
+
+def test_unterminated_block_raises_parse_error():
+    with pytest.raises(ParseError, match='line 2'):
+        loads('ColorTable {\n  color[0] = rgb(1, 2, 3)\n')
+
+
+def test_parse_error_is_a_value_error():
+    with pytest.raises(ValueError):
+        loads('ColorTable\nColor: 0 1 2 3\n')
+
+
+def test_progress_may_abandon_a_parse():
+    class Abandoned(Exception):
+        pass
+
+    def progress(done, total):
+        raise Abandoned
+
+    with pytest.raises(Abandoned):
+        loads(dumps(sample_table()), progress=progress)
+
+
+@pytest.fixture
+def umask():
+    old = os.umask(0o027)
+    yield 0o027
+    os.umask(old)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="POSIX permissions")
+def test_atomic_write_creates_files_with_the_umask(tmp_path, umask):
+    path = str(tmp_path / 'table.pal')
+    atomic_write(path, "Product: BR\n")
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+    assert os.listdir(str(tmp_path)) == ['table.pal']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="POSIX permissions")
+def test_atomic_write_replaces_and_keeps_the_mode(tmp_path, umask):
+    path = str(tmp_path / 'table.pal')
+    with open(path, 'w') as file:
+        file.write("Product: BR\n")
+    os.chmod(path, 0o604)
+    inode = os.stat(path).st_ino
+    atomic_write(path, "Product: BV\n")
+    with open(path) as file:
+        assert file.read() == "Product: BV\n"
+    assert os.stat(path).st_mode & 0o777 == 0o604
+    assert os.stat(path).st_ino != inode  # Renamed over, not rewritten
+    assert os.listdir(str(tmp_path)) == ['table.pal']
+
+
+def test_failed_atomic_write_keeps_the_file(tmp_path):
+    path = str(tmp_path / 'table.pal')
+    atomic_write(path, "Product: BR\n")
+    with pytest.raises(UnicodeEncodeError):
+        atomic_write(path, "Product: \ud800\n")
+    with open(path) as file:
+        assert file.read() == "Product: BR\n"
+    assert os.listdir(str(tmp_path)) == ['table.pal']
@@ -0,0 +1,128 @@
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.history import (
+    AddStops, History, RemoveStops, ReplaceTable, SettingsEdit, StopEdit, StopsEdit, STOP_BYTES
+)
+
+RED = pack_rgba(255, 0, 0)
+
+
+def make_table():
+    return ColorTable([ColorStop(float(value)) for value in (0, 10, 20)], product='BR')
+
+
+def values(table):
+    return [stop.value for stop in table.stops]
+
+
+def test_stop_edit_repositions():
+    table, history = make_table(), History()
+    stop = table.stops[0]
+    before = stop.snapshot()
+    stop.value, stop.start = 15.0, RED
+    table.reposition(stop)
+    history.record(StopEdit(table, stop, before, stop.snapshot()))
+
+    history.undo()
+    assert values(table) == [0, 10, 20] and table.stops[0].start != RED
+    history.redo()
+    assert values(table) == [10, 15, 20] and table.stops[1].start == RED
+
+
+def test_stops_edit():
+    table, history = make_table(), History()
+    before = [stop.snapshot() for stop in table.stops]
+    for stop in table.stops:
+        stop.value = -stop.value
+    table.sort()
+    history.record(StopsEdit(table, table.stops, before, [stop.snapshot() for stop in table.stops]))
+
+    history.undo()
+    assert values(table) == [0, 10, 20]
+    history.redo()
+    assert values(table) == [-20, -10, 0]
+
+
+def test_add_and_remove_stops():
+    table, history = make_table(), History()
+    added = [table.add(ColorStop(5.0)), table.add(ColorStop(25.0))]
+    history.record(AddStops(table, added))
+    removed = [table.stops[0]]
+    table.remove_many(removed)
+    history.record(RemoveStops(table, removed))
+
+    history.undo()
+    assert values(table) == [0, 5, 10, 20, 25]
+    history.undo()
+    assert values(table) == [0, 10, 20]
+    history.redo()
+    history.redo()
+    assert values(table) == [5, 10, 20, 25]
+
+
+def test_settings_edit():
+    table, history = make_table(), History()
+    table.product, table.rf = 'BV', RED
+    history.record(SettingsEdit(table, {'product': 'BR', 'rf': None}, {'product': 'BV', 'rf': RED}))
+
+    history.undo()
+    assert (table.product, table.rf) == ('BR', None)
+    history.redo()
+    assert (table.product, table.rf) == ('BV', RED)
+
+
+class Owner:
+    def __init__(self, table):
+        self.table = table
+        self.file_path = 'old.pal'
+        self.disk_state = {'product': 'BR'}
+
+
+def test_replace_table_restores_the_file():
+    old, new = make_table(), ColorTable([ColorStop(1.0)])
+    owner, history = Owner(old), History()
+    old_file = (owner.file_path, owner.disk_state)
+    owner.table, owner.file_path, owner.disk_state = new, 'new.pal', {'product': ''}
+    history.record(ReplaceTable(owner, old, new, old_file, ('new.pal', {'product': ''})))
+
+    history.undo()
+    assert owner.table is old
+    assert (owner.file_path, owner.disk_state) == ('old.pal', {'product': 'BR'})
+    history.redo()
+    assert owner.table is new and owner.file_path == 'new.pal'
+
+
+def test_group_is_one_entry_and_redo_is_cleared_by_new_edits():
+    table, history = make_table(), History()
+    with history.group('Paste'):
+        for value in (30.0, 40.0):
+            history.record(AddStops(table, [table.add(ColorStop(value))]))
+    assert len(history.undo_stack) == 1
+
+    history.undo()
+    assert values(table) == [0, 10, 20]
+    assert history.can_redo()
+    history.record(AddStops(table, [table.add(ColorStop(50.0))]))
+    assert not history.can_redo()
+
+
+def test_recording_is_ignored_while_undoing():
+    table, history = make_table(), History()
+
+    class Recording(AddStops):
+        def undo(self):
+            history.record(AddStops(table, []))
+            super().undo()
+
+    history.record(Recording(table, [table.add(ColorStop(5.0))]))
+    history.undo()
+    assert not history.can_undo()
+
+
+def test_history_is_capped_by_size():
+    table = make_table()
+    history = History(max_bytes=3 * STOP_BYTES)
+    for value in range(10):
+        history.record(AddStops(table, [table.add(ColorStop(100.0 + value))]))
+    assert 0 < len(history.undo_stack) < 10
+    assert history.size <= history.max_bytes
+    assert history.undo_stack[-1].stops[0].value == 109.0
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.lut import colorize, colorize_values, compile_lut, lut_size
+
+RED = pack_rgba(255, 0, 0)
+BLUE = pack_rgba(0, 0, 255)
+GREY = pack_rgba(100, 100, 100, 128)
+RF = pack_rgba(110, 0, 130)
+
+
+def make_table(**settings):
+    stops = [
+        ColorStop(10.0, 'solid', 'rgba', GREY),
+        ColorStop(20.0, 'gradient', 'rgb', RED, BLUE),
+        ColorStop(30.0, 'single', 'rgb', pack_rgba(0, 255, 0)),
+    ]
+    return ColorTable(stops, rf=RF, **settings)
+
+
+def test_band_semantics():
+    rgba = colorize_values(make_table(), [5.0, 10.0, 19.9, 20.0, 25.0, 30.0, 1000.0, np.nan])
+    assert rgba[0].tolist() == [0, 0, 0, 0]          # Below the first stop
+    assert rgba[1].tolist() == [100, 100, 100, 128]  # Solid, alpha included
+    assert rgba[2].tolist() == [100, 100, 100, 128]  # Up to the next stop
+    assert rgba[3].tolist() == [255, 0, 0, 255]      # Gradient start
+    assert rgba[4].tolist() == [127, 0, 127, 255]    # Halfway, truncated like the preview
+    assert rgba[5].tolist() == [0, 255, 0, 255]      # Last stop
+    assert rgba[6].tolist() == [0, 255, 0, 255]      # Above the domain
+    assert rgba[7].tolist() == [0, 0, 0, 0]          # NaN
+
+
+def test_lut_applies_scale_and_offset():
+    table = make_table(scale='0.5', offset='10')
+    lut = compile_lut(table)
+    assert lut.shape == (256, 4)
+    assert lut[0].tolist() == [100, 100, 100, 128]   # 10
+    assert lut[20].tolist() == [255, 0, 0, 255]      # 20
+    assert (lut == colorize_values(table, np.arange(256) * 0.5 + 10)).all()
+
+
+def test_rf_code():
+    table = make_table()
+    lut = compile_lut(table, rf_code=1)
+    assert lut[1].tolist() == [110, 0, 130, 255]
+    assert lut[0].tolist() == [0, 0, 0, 0]
+
+
+@pytest.mark.parametrize('rf_code', [-1, 256, 300])
+def test_rf_code_outside_the_lut(rf_code):
+    with pytest.raises(ValueError):
+        compile_lut(make_table(), rf_code=rf_code)
+
+
+def test_lut_is_memoized_by_content():
+    table = make_table()
+    lut = compile_lut(table)
+    assert compile_lut(make_table()) is lut
+    assert not lut.flags.writeable
+    table.stops[0].start = RED
+    assert compile_lut(table) is not lut
+
+
+def test_colorize_codes():
+    codes = np.array([[0, 10], [20, 255]], dtype=np.uint16)
+    rgba = colorize(make_table(), codes)
+    assert rgba.shape == (2, 2, 4)
+    assert (rgba == compile_lut(make_table(), 65536)[codes]).all()
+
+
+def test_lut_size():
+    assert lut_size(np.uint8) == 256
+    assert lut_size(np.uint16) == 65536
+    with pytest.raises(ValueError):
+        lut_size(np.int16)
+
+
+def test_empty_table_is_transparent():
+    assert not colorize_values(ColorTable(), [0.0, 1.0]).any()
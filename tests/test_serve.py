@@ -0,0 +1,169 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from colortable import loads
+from colortable.lut import colorize, colorize_values
+from colortable.serve import ColorizeService, ServiceClient, ServiceError, TableLRU, check_loopback
+
+TEXT = "Product: BV\nScale: 0.5\nRF: 110 0 130\nColor: 0 255 0 0 0 0 255\nSolidColor: 50 0 255 0\n"
+
+
+def write(path, text):
+    with open(path, 'w') as file:
+        file.write(text)
+
+
+def test_lru_is_keyed_by_content(tmp_path):
+    for name in ('a.pal', 'b.pal', 'c.pal'):
+        write(str(tmp_path / name), TEXT if name != 'c.pal' else TEXT + "SolidColor: 90 1 1 1\n")
+    tables = TableLRU(max_entries=1)
+    first = tables.get(str(tmp_path / 'a.pal'))
+    assert tables.get(str(tmp_path / 'b.pal')) is first  # Same content
+    tables.get(str(tmp_path / 'c.pal'))
+    assert tables.stats() == {'entries': 1, 'hits': 1, 'misses': 2, 'evictions': 1}
+    assert list(tables.digests) == [str(tmp_path / 'c.pal')]
+
+
+def test_lru_picks_up_edits(tmp_path):
+    path = str(tmp_path / 'a.pal')
+    write(path, TEXT)
+    tables = TableLRU()
+    tables.get(path)
+    write(path, TEXT + "SolidColor: 90 1 1 1\n")
+    assert len(tables.get(path).table.stops) == 3
+
+
+def test_lru_rejects_files_without_entries(tmp_path):
+    path = str(tmp_path / 'notes.txt')
+    write(path, "Just some notes.\n")
+    tables = TableLRU()
+    with pytest.raises(ValueError):
+        tables.get(path)
+    assert not tables.digests
+
+
+def test_only_loopback_hosts():
+    check_loopback('127.0.0.1')
+    check_loopback('::1')
+    check_loopback('localhost')
+    with pytest.raises(ValueError):
+        check_loopback('0.0.0.0')
+
+
+@pytest.fixture
+def service(tmp_path):
+    write(str(tmp_path / 'velocity.pal'), TEXT)
+    service = ColorizeService(str(tmp_path), threads=2)
+    started = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        holder['loop'] = loop
+        holder['task'] = loop.create_task(service.run('127.0.0.1', 0, ready=ready))
+        try:
+            loop.run_until_complete(holder['task'])
+        except asyncio.CancelledError:
+            pass
+        loop.close()
+
+    def ready(server):
+        holder['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield service, holder['port']
+    holder['loop'].call_soon_threadsafe(holder['task'].cancel)
+    thread.join(10)
+
+
+def test_colorize_codes_and_values(service):
+    _, port = service
+    table = loads(TEXT)
+    client = ServiceClient(port=port)
+    try:
+        codes = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        assert (client.colorize('velocity.pal', codes, rf_code=1) == colorize(table, codes, 1)).all()
+        wide = np.arange(0, 65536, 97, dtype='>u2')
+        assert (client.colorize('velocity.pal', wide) == colorize(table, wide.astype(np.uint16))).all()
+        values = np.linspace(-10, 100, 333, dtype=np.float32)
+        assert (client.colorize('velocity.pal', values) == colorize_values(table, values)).all()
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('table, values, rf_code, status', [
+    ('../velocity.pal', np.zeros(4, np.uint8), None, 403),
+    ('missing.pal', np.zeros(4, np.uint8), None, 404),
+    ('velocity.pal', np.zeros(4, np.int32), None, 400),
+    ('velocity.pal', np.zeros(4, np.uint8), 256, 400),
+])
+def test_rejected_requests(service, table, values, rf_code, status):
+    _, port = service
+    client = ServiceClient(port=port)
+    try:
+        with pytest.raises(ServiceError) as error:
+            client.colorize(table, values, rf_code)
+        assert error.value.status == status
+    finally:
+        client.close()
+
+
+def test_unexpected_errors_answer_500(service, monkeypatch, caplog):
+    colorize_service, port = service
+
+    def broken(path):
+        raise RuntimeError("table store is broken")
+
+    monkeypatch.setattr(colorize_service.tables, 'get', broken)
+    client = ServiceClient(port=port)
+    try:
+        with pytest.raises(ServiceError) as error:
+            client.colorize('velocity.pal', np.zeros(4, np.uint8))
+        assert error.value.status == 500
+        monkeypatch.undo()
+        # The connection is still usable
+        assert client.colorize('velocity.pal', np.zeros(4, np.uint8)).shape == (4, 4)
+        assert client.metrics()['errors'] == 1
+    finally:
+        client.close()
+    assert 'table store is broken' in caplog.text
+
+
+def test_concurrent_requests_are_batched_and_measured(service):
+    colorize_service, port = service
+    codes = np.arange(256, dtype=np.uint8)
+    errors = []
+
+    def work():
+        client = ServiceClient(port=port)
+        try:
+            for _ in range(20):
+                client.colorize('velocity.pal', codes)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    client = ServiceClient(port=port)
+    try:
+        metrics = client.metrics()
+    finally:
+        client.close()
+    assert metrics['requests'] == 80 and metrics['pixels'] == 80 * 256
+    assert metrics['batches'] <= 80
+    assert metrics['latency_ms']['p50'] <= metrics['latency_ms']['max']
+    assert metrics['tables']['misses'] == 1
+    assert colorize_service.metrics.requests == 80
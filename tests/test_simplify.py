@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.analysis import diff
+from colortable.lut import value_domain
+from colortable.simplify import simplify
+
+
+def dense_gradient_table(count=101, interpolation='rgb'):
+    """
+    A red-to-blue ramp written as many single entries, plus a solid band.
+    """
+    stops = []
+    for i in range(count):
+        ratio = i / (count - 1)
+        stops.append(ColorStop(float(i), 'single', 'rgb',
+                               pack_rgba(int(255 * (1 - ratio)), 0, int(255 * ratio))))
+    stops.append(ColorStop(float(count), 'solid', 'rgb', pack_rgba(0, 200, 0)))
+    stops.append(ColorStop(float(count + 20), 'solid', 'rgb', pack_rgba(250, 250, 250)))
+    return ColorTable(stops, product='BR', interpolation=interpolation)
+
+
+def measured_max(table, other):
+    return float(np.nanmax(diff(table, other, None, value_domain(table)).delta_e))
+
+
+@pytest.mark.parametrize('max_delta_e', [0.5, 2.0, 5.0])
+def test_result_stays_within_the_tolerance(max_delta_e):
+    table = dense_gradient_table()
+    result = simplify(table, max_delta_e)
+    assert result.stops_before == len(table.stops)
+    assert result.stops_after == len(result.table.stops) < result.stops_before
+    assert result.max_delta_e <= max_delta_e
+    assert measured_max(table, result.table) <= max_delta_e
+
+
+def test_larger_tolerance_keeps_fewer_stops():
+    table = dense_gradient_table()
+    counts = [simplify(table, max_delta_e).stops_after for max_delta_e in (0.5, 2.0, 8.0)]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_breaks_only_at_original_values():
+    table = dense_gradient_table()
+    result = simplify(table, 2.0)
+    original = {stop.value for stop in table.stops}
+    assert {stop.value for stop in result.table.stops} <= original
+    # The solid edges stay where they were
+    assert {101.0, 121.0} <= {stop.value for stop in result.table.stops}
+
+
+def test_settings_are_kept_and_the_input_is_unchanged():
+    table = dense_gradient_table(interpolation='oklab')
+    before = table.copy()
+    result = simplify(table, 1.0)
+    assert table == before
+    assert result.table.settings() == table.settings()
+    assert result.table.interpolation == 'oklab'
+
+
+def test_incompressible_table_is_returned_as_is():
+    colors = [pack_rgba(255, 0, 0), pack_rgba(0, 255, 0), pack_rgba(0, 0, 255), pack_rgba(255, 255, 0)]
+    table = ColorTable([ColorStop(float(i * 10), 'solid', 'rgb', color) for i, color in enumerate(colors)])
+    result = simplify(table, 1.0)
+    assert result.stops_after == result.stops_before == 4
+    assert result.max_delta_e == 0.0
+    assert result.table == table
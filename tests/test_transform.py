@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba, unpack_rgba
+from colortable.colorspace import to_space
+from colortable.history import History, StopsEdit
+from colortable.lut import colorize_values, unpack_colors
+from colortable.transform import adjust_colors, remap_values, resample, select, transform_bands
+
+RED = pack_rgba(255, 0, 0)
+BLUE = pack_rgba(0, 0, 255)
+GREEN = pack_rgba(0, 200, 0)
+
+
+def make_table():
+    return ColorTable([
+        ColorStop(0.0, 'gradient', 'rgb', RED, BLUE),
+        ColorStop(40.0, 'solid', 'rgb', GREEN),
+        ColorStop(80.0, 'single', 'rgba', pack_rgba(250, 250, 250, 200)),
+    ])
+
+
+def values(table):
+    return [stop.value for stop in table.stops]
+
+
+def test_select_is_inclusive():
+    table = make_table()
+    assert select(table, 0.0, 40.0) == table.stops[:2]
+    assert select(table, 10.0) == table.stops[1:]
+
+
+def test_remap_values():
+    table = make_table()
+    changed = remap_values(table, scale=2.0, offset=5.0)
+    assert len(changed) == 3
+    assert values(table) == [5.0, 85.0, 165.0]
+
+
+def test_negative_scale_resorts():
+    table = make_table()
+    remap_values(table, scale=-1.0)
+    assert values(table) == [-80.0, -40.0, 0.0]
+    assert table.stops[0].type == 'single'
+
+
+def test_remap_a_range():
+    table = make_table()
+    remap_values(table, offset=50.0, stops=select(table, 30.0, 50.0))
+    assert values(table) == [0.0, 80.0, 90.0]
+
+
+def test_resample_follows_the_rendered_colors():
+    table = make_table()
+    expected = colorize_values(table, [0.0, 10.0, 20.0, 30.0, 40.0, 60.0])
+    removed, added = resample(table, 9)
+    assert len(removed) == 2 and len(added) == 8
+    assert values(table) == [0.0, 10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0]
+    starts = unpack_colors([stop.start for stop in table.stops[:8]])
+    assert (starts[[0, 1, 2, 3, 4, 6]] == expected).all()
+    assert [stop.type for stop in table.stops[:4]] == ['gradient'] * 4
+    assert [stop.type for stop in table.stops[4:8]] == ['solid'] * 4  # Inside the green band
+    assert table.stops[-1].value == 80.0 and table.stops[-1].start_alpha == 200
+
+
+def test_resample_needs_two_stops():
+    table = make_table()
+    with pytest.raises(ValueError):
+        resample(table, 1)
+    assert resample(table, 4, stops=table.stops[:1]) == ([], [])
+
+
+def test_adjust_alpha():
+    table = make_table()
+    adjust_colors(table, alpha=0.5)
+    assert [stop.start_alpha for stop in table.stops] == [128, 128, 100]
+    assert table.stops[0].end_alpha == 128
+    assert {stop.format for stop in table.stops} == {'rgba'}
+
+
+def test_full_hue_turn_keeps_the_colors():
+    table = make_table()
+    adjust_colors(table, hue=360.0)
+    assert table == make_table()
+
+
+def test_hue_rotation_keeps_hsluv_lightness():
+    table = make_table()
+    adjust_colors(table, hue=120.0)
+    before = to_space([unpack_rgba(RED)[:3], unpack_rgba(GREEN)[:3]], 'hsluv')
+    after = to_space([unpack_rgba(table.stops[0].start)[:3], unpack_rgba(table.stops[1].start)[:3]], 'hsluv')
+    assert table.stops[0].start != RED
+    assert np.allclose(after[:, 2], before[:, 2], atol=1.0)
+    assert np.allclose((after[:, 0] - before[:, 0]) % 360, 120.0, atol=2.0)
+
+
+def test_lightness_is_clipped():
+    table = make_table()
+    adjust_colors(table, lightness=100.0, stops=table.stops[:1])
+    assert unpack_rgba(table.stops[0].start) == (255, 255, 255, 255)
+    assert table.stops[1].start == GREEN
+
+
+def test_transform_bands():
+    bands = [(stop.value, stop.to_band()) for stop in make_table().stops]
+    result = transform_bands(bands, remap_values, offset=5.0, low=30.0)
+    assert [value for value, _ in result] == [0.0, 45.0, 85.0]
+    assert result[1][1] == make_table().stops[1].to_band()
+
+
+@pytest.mark.parametrize('transform, kwargs', [
+    (remap_values, {'scale': -2.0, 'offset': 1.0}),
+    (adjust_colors, {'hue': 90.0, 'lightness': -10.0, 'alpha': 0.5}),
+])
+def test_transforms_undo_through_history(transform, kwargs):
+    table, history = make_table(), History()
+    stops = list(table.stops)
+    before = [stop.snapshot() for stop in stops]
+    transform(table, stops=stops, **kwargs)
+    transformed = table.copy()
+    history.record(StopsEdit(table, stops, before, [stop.snapshot() for stop in stops]))
+
+    history.undo()
+    assert table == make_table()
+    history.redo()
+    assert table == transformed
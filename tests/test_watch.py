@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from colortable import ColorStop, ColorTable, pack_rgba
+from colortable.formats import atomic_write
+from colortable.watch import FileWatcher, diff_stops, open_watcher, table_state
+
+RED = pack_rgba(255, 0, 0)
+BLUE = pack_rgba(0, 0, 255)
+
+
+def make_table(*values):
+    return ColorTable([ColorStop(float(value)) for value in values])
+
+
+def test_identical_tables_have_no_diff():
+    diff = diff_stops(make_table(0, 10, 20), make_table(0, 10, 20))
+    assert not diff and len(diff) == 0
+
+
+def test_removed_added_and_changed_stops():
+    old, new = make_table(0, 10, 20), make_table(0, 15, 20)
+    new.stops[2].start = RED
+    diff = diff_stops(old, new)
+    assert diff.removed == [old.stops[1]]
+    assert diff.added == [new.stops[1]]
+    assert diff.changed == [(old.stops[2], new.stops[2].snapshot())]
+    assert len(diff) == 3
+
+
+def test_stops_sharing_a_value_are_matched_in_order():
+    old, new = make_table(0, 10, 10), make_table(0, 10, 10, 10)
+    new.stops[2].start = BLUE
+    diff = diff_stops(old, new)
+    assert diff.removed == []
+    assert diff.changed == [(old.stops[2], new.stops[2].snapshot())]
+    assert diff.added == [new.stops[3]]
+
+
+def test_stops_without_a_value_are_left_alone():
+    old = make_table(0, 10)
+    old.add(ColorStop(None))
+    assert not diff_stops(old, make_table(0, 10))
+
+
+def test_applying_a_diff_reproduces_the_new_table():
+    old, new = make_table(0, 10, 20, 30), make_table(5, 10, 20, 40)
+    new.stops[1].type = 'solid'
+    diff = diff_stops(old, new)
+    old.remove_many(diff.removed)
+    for stop in diff.added:
+        old.add(stop.copy())
+    for stop, snapshot in diff.changed:
+        stop.restore(snapshot)
+    assert old.stops == new.stops
+
+
+def test_table_state():
+    table = make_table(0)
+    table.product, table.rf, table.interpolation = 'BR', RED, 'oklab'
+    state = table_state(table)
+    assert state['product'] == 'BR' and state['rf'] == RED and state['interpolation'] == 'oklab'
+
+
+@pytest.mark.parametrize('factory', [FileWatcher, open_watcher])
+def test_watchers_notice_writes_and_replacements(tmp_path, factory):
+    path = str(tmp_path / 'table.pal')
+    atomic_write(path, "Product: BR\n")
+    watcher = factory(path)
+    try:
+        assert not watcher.changed()
+        atomic_write(path, "Product: BV\nUnits: KTS\n")  # Replaced by a rename
+        assert watcher.changed()
+        assert not watcher.changed()
+        with open(path, 'a') as file:
+            file.write("Color: 0 1 2 3\n")
+        os.utime(path, ns=(1, 1))
+        assert watcher.changed()
+    finally:
+        watcher.close()